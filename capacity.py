@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+温度帯別（常温・冷蔵・冷凍）の保管・荷役能力計画
+拠点×温度帯の出荷量見通し（成長率・季節変動）から、週ごとのパレット保管位置とバースの使用率を求め、
+実用上限を超える週（能力不足）を検出する。不足分は自動倉庫による保管位置の増設と
+荷役の自動化（AGV・自動荷積み）で補うものとして投資額を見積もる。
+拠点×温度帯×156週×シナリオを配列で一括計算し、シナリオ数が多い場合は分割して処理する
+"""
+
+import time
+
+import numpy as np
+
+from cash_timeline import SCENARIOS
+
+ZONES = ("常温", "冷蔵", "冷凍")
+WEEKS = 156
+
+# 出荷量の年成長率（保守・基準・楽観。楽観ほど物量が増え能力が逼迫する）
+SCENARIO_GROWTH = (0.015, 0.025, 0.035)
+
+# 温度帯別の保管条件：1パレットあたりケース数、在庫日数
+CASES_PER_PALLET = np.array([60, 48, 40])
+STOCK_DAYS = np.array([14, 5, 21])
+
+# 温度帯別の季節変動（ピーク週・振幅）：常温・冷蔵は年末、冷凍は夏
+SEASON_PEAK_WEEK = np.array([38, 38, 16])
+SEASON_AMPLITUDE = np.array([0.15, 0.12, 0.25])
+
+# 実用上限の使用率（保管は入出庫効率が落ち始める水準、バースは待機が発生し始める水準）
+POSITION_LIMIT = 0.90
+DOCK_LIMIT = 0.85
+
+# バース：1バース1時間あたりの処理パレット数（冷凍は前室経由で遅い）と週稼働時間
+DOCK_PALLETS_PER_HOUR = np.array([20, 16, 12])
+DOCK_HOURS_PER_WEEK = 6 * 16
+
+# 自動化投資：自動倉庫の1パレット位置あたり投資額（円）、
+# 荷役自動化による1バースあたり処理能力の倍率と1バースあたり投資額（円）
+ASRS_COST_PER_POSITION = np.array([0.15e6, 0.25e6, 0.4e6])
+DOCK_AUTOMATION_GAIN = 1.4
+DOCK_AUTOMATION_COST = np.array([15e6, 20e6, 30e6])
+
+# 一括計算するセル数の上限（シナリオ×拠点×温度帯×週、float32で約200MB）
+CHUNK_CELLS = 50_000_000
+
+SITE_COUNT = 24
+
+
+def seasonality(weeks=WEEKS):
+    """温度帯×週の季節係数（週0は4月第1週）"""
+    w = np.arange(weeks)
+    phase = 2 * np.pi * (w[None, :] - SEASON_PEAK_WEEK[:, None]) / 52
+    return 1 + SEASON_AMPLITUDE[:, None] * np.cos(phase)
+
+
+def project(sites, growth, weeks=WEEKS):
+    """出荷量見通しから保管パレット数・入出庫パレット数（シナリオ×拠点×温度帯×週）を計算"""
+    growth = np.asarray(growth, dtype=np.float32)
+    growth = growth.reshape(len(growth), 1, -1, 1)
+    years = (np.arange(weeks, dtype=np.float32) / 52)
+    trend = (1 + growth) ** years
+    outbound = sites["outbound"].astype(np.float32)[None, :, :, None] * trend * seasonality(weeks).astype(np.float32)
+    pallets_out = outbound / CASES_PER_PALLET[:, None].astype(np.float32)
+    stored = pallets_out * (STOCK_DAYS[:, None] / 7).astype(np.float32)
+    # 入庫は出庫と同量とし、バースの処理量は入出庫の合計
+    return stored, 2 * pallets_out
+
+
+def dock_capacity(docks):
+    """拠点×温度帯の週あたりバース処理能力（パレット）"""
+    return docks * DOCK_PALLETS_PER_HOUR * DOCK_HOURS_PER_WEEK
+
+
+def _evaluate(sites, growth, weeks):
+    """シナリオの一部について使用率を計算し、週方向に集約"""
+    stored, moves = project(sites, growth, weeks)
+    positions = sites["positions"][None, :, :, None]
+    docks = dock_capacity(sites["docks"])[None, :, :, None]
+    position_util = stored / positions
+    dock_util = moves / docks
+
+    position_over = position_util > POSITION_LIMIT
+    dock_over = dock_util > DOCK_LIMIT
+    over = position_over | dock_over
+    return {
+        "position_peak": position_util.max(axis=3),
+        "dock_peak": dock_util.max(axis=3),
+        "position_weeks": position_over.sum(axis=3),
+        "dock_weeks": dock_over.sum(axis=3),
+        "first_overflow": np.where(over.any(axis=3), over.argmax(axis=3), -1),
+        "overflow_calendar": over.any(axis=(1, 2)),
+        "peak_stored": stored.max(axis=3),
+        "peak_moves": moves.max(axis=3),
+    }
+
+
+def plan(sites, growth=SCENARIO_GROWTH, weeks=WEEKS, chunk_cells=CHUNK_CELLS):
+    """シナリオ別（growth: シナリオ数 または シナリオ×温度帯）の能力計画と自動化投資の見積り"""
+    growth = np.asarray(growth, dtype=float)
+    growth = growth.reshape(len(growth), -1)
+    n_sites = len(sites["positions"])
+    step = max(1, chunk_cells // (n_sites * len(ZONES) * weeks))
+    parts = [_evaluate(sites, growth[i:i + step], weeks) for i in range(0, len(growth), step)]
+    result = {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+    result.update(size_automation(sites, result["peak_stored"], result["peak_moves"]))
+    result["growth"] = growth
+    result["weeks"] = weeks
+    return result
+
+
+def size_automation(sites, peak_stored, peak_moves):
+    """ピーク週を実用上限内に収めるための自動倉庫の位置数と自動化バース数・投資額"""
+    positions = sites["positions"]
+    docks = sites["docks"]
+    extra_positions = np.ceil(np.clip(peak_stored / POSITION_LIMIT - positions, 0, None))
+
+    # 不足するバース数（換算）を既存バースの自動化で補う。補いきれない分はバース増設が必要
+    required_docks = peak_moves / (DOCK_LIMIT * dock_capacity(1))
+    shortfall = np.clip(required_docks - docks, 0, None)
+    automated = np.minimum(np.ceil(shortfall / (DOCK_AUTOMATION_GAIN - 1)), docks)
+    unresolved = np.clip(shortfall - automated * (DOCK_AUTOMATION_GAIN - 1), 0, None)
+
+    position_cost = extra_positions * ASRS_COST_PER_POSITION
+    dock_cost = automated * DOCK_AUTOMATION_COST
+    return {
+        "extra_positions": extra_positions,
+        "automated_docks": automated,
+        "unresolved_docks": np.ceil(unresolved),
+        "position_cost": position_cost,
+        "dock_cost": dock_cost,
+        "investment": position_cost + dock_cost,
+    }
+
+
+def summarize(result):
+    """シナリオ別・温度帯別の能力不足拠点数と自動化投資額（百万円）"""
+    position_short = result["position_weeks"] > 0
+    dock_short = result["dock_weeks"] > 0
+    first = np.where(result["first_overflow"] >= 0, result["first_overflow"], result["weeks"])
+    return {
+        "position_sites": position_short.sum(axis=1),
+        "dock_sites": dock_short.sum(axis=1),
+        "first_overflow": first.min(axis=1),
+        "overflow_week_share": result["overflow_calendar"].mean(axis=1),
+        "investment": result["investment"].sum(axis=1) / 1e6,
+        "total_investment": result["investment"].sum(axis=(1, 2)) / 1e6,
+        "unresolved_docks": result["unresolved_docks"].sum(axis=(1, 2)),
+    }
+
+
+def format_week(week, weeks=WEEKS):
+    """週番号（0始まり、4月第1週起点）を「2年目（Week 70）」の形式に整形"""
+    if week >= weeks:
+        return "期間内不足なし"
+    return f"{week // 52 + 1}年目（Week {week + 1}）"
+
+
+def format_zone_shortage(summary, scenario="base"):
+    """指定シナリオで保管能力が不足する拠点数を温度帯別に列挙"""
+    s = SCENARIOS.index(scenario)
+    parts = [f"{zone}{int(n)}拠点" for zone, n in zip(ZONES, summary["position_sites"][s]) if n]
+    return "・".join(parts) + "で保管能力不足" if parts else "保管能力不足なし"
+
+
+def format_investment(summary, rounding=10):
+    """保守〜楽観の自動化投資額（百万円）を「200-320百万円」の形式に整形"""
+    totals = summary["total_investment"]
+    low = int(np.round(totals.min() / rounding) * rounding)
+    high = int(np.round(totals.max() / rounding) * rounding)
+    return f"{low:,}-{high:,}百万円"
+
+
+def sample_sites(n_sites=SITE_COUNT, seed=0):
+    """合成データの拠点（週出荷ケース数・パレット保管位置・バース数、温度帯別）"""
+    rng = np.random.default_rng(seed)
+    scale = rng.lognormal(0.0, 0.5, n_sites)[:, None]
+    outbound = np.round(scale * np.array([60_000, 15_000, 9_000]) * rng.lognormal(0.0, 0.3, (n_sites, len(ZONES))))
+    # 現状の季節ピークでの使用率（冷凍ほど逼迫している）
+    season_peak = 1 + SEASON_AMPLITUDE
+    stored = outbound / CASES_PER_PALLET * STOCK_DAYS / 7 * season_peak
+    position_util = rng.uniform(0.55, 0.88, (n_sites, len(ZONES))) + np.array([0.0, 0.02, 0.05])
+    moves = 2 * outbound / CASES_PER_PALLET * season_peak
+    dock_util = rng.uniform(0.45, 0.85, (n_sites, len(ZONES)))
+    return {
+        "outbound": outbound,
+        "positions": np.ceil(stored / position_util),
+        "docks": np.maximum(np.ceil(moves / (dock_util * dock_capacity(1))), 1),
+    }
+
+
+def _reference(sites, growth, weeks):
+    """検証用：拠点・温度帯・週ごとの逐次計算（ピーク使用率と能力不足の週数）"""
+    season = seasonality(weeks)
+    n_sites = len(sites["positions"])
+    shape = (len(growth), n_sites, len(ZONES))
+    peak = np.zeros(shape)
+    count = np.zeros(shape, dtype=int)
+    for s, g in enumerate(growth):
+        for n in range(n_sites):
+            for z in range(len(ZONES)):
+                capacity = sites["positions"][n, z]
+                for w in range(weeks):
+                    cases = sites["outbound"][n, z] * (1 + g) ** (w / 52) * season[z, w]
+                    util = cases / CASES_PER_PALLET[z] * STOCK_DAYS[z] / 7 / capacity
+                    peak[s, n, z] = max(peak[s, n, z], util)
+                    count[s, n, z] += util > POSITION_LIMIT
+    return peak, count
+
+
+def verify(sites, weeks=WEEKS):
+    """名前付きシナリオで配列版と逐次計算のピーク使用率・不足週数が一致するか確認"""
+    result = plan(sites, SCENARIO_GROWTH, weeks)
+    peak, count = _reference(sites, SCENARIO_GROWTH, weeks)
+    return bool(np.allclose(result["position_peak"], peak, rtol=1e-4)
+                and np.abs(result["position_weeks"] - count).max() <= 1)
+
+
+def benchmark(n_sites=500, scenarios=1000, weeks=WEEKS, seed=0):
+    """500拠点×3温度帯×156週×1,000シナリオ（成長率のモンテカルロ）の所要時間"""
+    sites = sample_sites(n_sites, seed)
+    rng = np.random.default_rng(seed)
+    growth = rng.normal(0.03, 0.02, (scenarios, len(ZONES)))
+    start = time.perf_counter()
+    result = plan(sites, growth, weeks)
+    elapsed = time.perf_counter() - start
+
+    # 逐次計算の所要時間は一部の拠点で測って全体に換算
+    subset = {key: value[:5] for key, value in sites.items()}
+    start = time.perf_counter()
+    _reference(subset, growth[:2, 0], weeks)
+    loop = (time.perf_counter() - start) * (n_sites / 5) * (scenarios / 2)
+    return {
+        "sites": n_sites,
+        "scenarios": scenarios,
+        "cells": n_sites * len(ZONES) * weeks * scenarios,
+        "seconds": elapsed,
+        "loop_seconds": loop,
+        "overflow_probability": (result["position_weeks"] > 0).mean(axis=(0, 1)),
+    }
+
+
+if __name__ == "__main__":
+    sites = sample_sites()
+    summary = summarize(plan(sites))
+    print(f"拠点 {SITE_COUNT} × 温度帯 {len(ZONES)} × {WEEKS}週  検証: {verify(sites)}")
+    for s, name in enumerate(SCENARIOS):
+        shortage = "  ".join(
+            f"{zone} 保管{summary['position_sites'][s, z]}・バース{summary['dock_sites'][s, z]}拠点"
+            f" {summary['investment'][s, z]:,.0f}百万円"
+            for z, zone in enumerate(ZONES)
+        )
+        print(f"{name:12s} 最初の不足 {format_week(int(summary['first_overflow'][s].min()))}  {shortage}  "
+              f"合計 {summary['total_investment'][s]:,.0f}百万円")
+    print(f"{format_zone_shortage(summary)}  自動化投資 {format_investment(summary)}")
+
+    r = benchmark()
+    print(f"{r['sites']}拠点 × {r['scenarios']:,}シナリオ（{r['cells']:,}セル）: {r['seconds']:.1f}秒"
+          f"（逐次計算の推定 {r['loop_seconds'] / 60:,.0f}分）")
+    print("3年内に保管能力が不足する確率（温度帯別の拠点平均）: "
+          + " / ".join(f"{zone} {p * 100:.0f}%" for zone, p in zip(ZONES, r["overflow_probability"])))
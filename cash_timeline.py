@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+月次の投資キャッシュアウト・効果創出タイムライン
+ソリューション別に初期投資（構築期間で按分）、運用コスト（稼働後）、
+効果の立ち上がりカーブを月単位で展開し、累積キャッシュポジションと投資回収月を計算する。
+複数の段階投資案（ソリューション別の着手月）を配列で一括評価し、最短回収の案を選ぶ
+"""
+
+import itertools
+
+import numpy as np
+
+from ranges import RangeArray
+
+MONTHS = 36
+SCENARIOS = ("conservative", "base", "optimistic")
+
+# 段階投資案の比較で守る年間の投資額の上限（百万円、仮定の予算枠）
+MAX_ANNUAL_CAPEX = 600
+
+# ソリューション別の前提（単位：百万円、期間：月）
+# capex/opex/effect は (下限, 上限)、start は着手月（0始まり。標準案 standard_plan と同じ、年間投資上限内の最短回収案）
+SOLUTION_SCHEDULES = [
+    {
+        "name": "① 高度在庫管理",
+        "capex": (220, 280),
+        "opex": (40, 50),
+        "effect": (330, 470),
+        "start": 0,
+        "build": 6,
+        "ramp": 12,
+        "curve": "s_curve",
+    },
+    {
+        "name": "② 統合物流PF",
+        "capex": (350, 430),
+        "opex": (60, 80),
+        "effect": (330, 450),
+        "start": 3,
+        "build": 12,
+        "ramp": 12,
+        "curve": "s_curve",
+    },
+    {
+        "name": "③ 物流自動化",
+        "capex": (400, 550),
+        "opex": (50, 70),
+        "effect": (210, 320),
+        "start": 12,
+        "build": 15,
+        "ramp": 9,
+        "curve": "linear",
+    },
+]
+
+
+def ramp_curve(progress, curve="linear"):
+    """立ち上がり率（progress: 稼働後の経過率 0-1）"""
+    x = np.clip(progress, 0.0, 1.0)
+    if curve == "linear":
+        return x
+    if curve == "s_curve":
+        return x * x * (3 - 2 * x)
+    if curve == "step":
+        return (x > 0).astype(float)
+    raise ValueError(f"未定義の立ち上がりカーブです: {curve}")
+
+
+def scenario_values(schedules, key):
+    """(下限, 上限) を シナリオ×ソリューション の配列に展開
+
+    費用（capex/opex）は保守シナリオで上限、効果は保守シナリオで下限を取る。
+    """
+    r = np.array([s[key] for s in schedules], dtype=float)
+    low, high = r[:, 0], r[:, 1]
+    mid = (low + high) / 2
+    if key == "effect":
+        return np.vstack([low, mid, high])
+    return np.vstack([high, mid, low])
+
+
+def simulate(starts=None, schedules=SOLUTION_SCHEDULES, months=MONTHS):
+    """段階投資案（案×ソリューションの着手月）を一括評価
+
+    戻り値の各配列は 案×シナリオ×月 の形状。
+    break_even は累積キャッシュが以後マイナスに戻らなくなる月（1始まり、未回収は-1）。
+    """
+    if starts is None:
+        starts = [[s["start"] for s in schedules]]
+    starts = np.atleast_2d(np.asarray(starts, dtype=float))
+
+    capex = scenario_values(schedules, "capex")
+    opex = scenario_values(schedules, "opex")
+    effect = scenario_values(schedules, "effect")
+    build = np.array([s["build"] for s in schedules], dtype=float)
+    ramp = np.array([s["ramp"] for s in schedules], dtype=float)
+
+    # 形状：案(P)×シナリオ(C)×ソリューション(S)×月(M)
+    t = np.arange(months, dtype=float)
+    start = starts[:, None, :, None]
+    live = start + build[None, None, :, None]
+    building = (t >= start) & (t < live)
+    running = t >= live
+
+    cash_out = building * (capex / build)[None, :, :, None]
+    run_cost = running * (opex / 12)[None, :, :, None]
+
+    benefit = np.zeros(starts.shape[:1] + capex.shape + (months,))
+    for s, schedule in enumerate(schedules):
+        progress = (t - live[:, :, s] + 1) / ramp[s]
+        benefit[:, :, s] = ramp_curve(progress, schedule["curve"]) * (effect[:, s] / 12)[None, :, None]
+
+    net = (benefit - run_cost - cash_out).sum(axis=2)
+    cumulative = np.cumsum(net, axis=-1)
+
+    return {
+        "starts": starts,
+        "capex": cash_out.sum(axis=2),
+        "opex": run_cost.sum(axis=2),
+        "benefit": benefit.sum(axis=2),
+        "net": net,
+        "cumulative": cumulative,
+        "break_even": break_even_month(cumulative),
+    }
+
+
+def break_even_month(cumulative):
+    """累積キャッシュが最後にマイナスだった月の翌月（1始まり、期間内未回収は-1）"""
+    negative = cumulative < 0
+    months = cumulative.shape[-1]
+    # 末尾から見て最初のマイナス月
+    last_negative = months - 1 - np.argmax(negative[..., ::-1], axis=-1)
+    month = np.where(negative.any(axis=-1), last_negative + 2, 1)
+    return np.where(negative[..., -1], -1, month)
+
+
+def phasing_alternatives(schedules=SOLUTION_SCHEDULES, max_start=12, step=3, first_start=0):
+    """着手月の組み合わせ（先頭ソリューションは first_start 固定）"""
+    offsets = range(0, max_start + 1, step)
+    combos = itertools.product(offsets, repeat=len(schedules) - 1)
+    return np.array([(first_start,) + combo for combo in combos], dtype=float)
+
+
+def annual_totals(monthly):
+    """月次配列（…×月）を年次合計（…×年）に集計"""
+    months = monthly.shape[-1]
+    years = -(-months // 12)
+    padded = np.zeros(monthly.shape[:-1] + (years * 12,))
+    padded[..., :months] = monthly
+    return padded.reshape(monthly.shape[:-1] + (years, 12)).sum(axis=-1)
+
+
+def annual_summary(result, plan=0, rounding=10):
+    """年次の投資・運用費・効果・ネットCF・累積CFをレンジ（保守〜楽観）で集計"""
+    c_low, c_high = SCENARIOS.index("conservative"), SCENARIOS.index("optimistic")
+
+    def _range(key, sign=1):
+        yearly = sign * annual_totals(result[key][plan])
+        lo = np.round(yearly[c_low] / rounding) * rounding
+        hi = np.round(yearly[c_high] / rounding) * rounding
+        return RangeArray(lo, hi, "百万円")
+
+    net = _range("net")
+    return {
+        "capex": _range("capex", -1),
+        "opex": _range("opex", -1),
+        "benefit": _range("benefit"),
+        "net": net,
+        "cumulative": RangeArray(np.cumsum(net.lo), np.cumsum(net.hi), "百万円"),
+        "break_even": result["break_even"][plan],
+    }
+
+
+def earliest_payback(result, scenario="conservative", max_annual_capex=None):
+    """指定シナリオで最短回収となる案のインデックス（年間投資上限を満たす案のみ）"""
+    c = SCENARIOS.index(scenario)
+    months = result["net"].shape[-1]
+    break_even = np.where(result["break_even"][:, c] < 0, months + 1, result["break_even"][:, c])
+
+    feasible = np.ones(len(break_even), dtype=bool)
+    if max_annual_capex is not None:
+        feasible = annual_totals(result["capex"][:, c]).max(axis=-1) <= max_annual_capex
+    if not feasible.any():
+        raise ValueError("年間投資上限を満たす段階投資案がありません")
+
+    # 同じ回収月なら3年後の累積キャッシュが大きい案を優先
+    order = np.lexsort((-result["cumulative"][:, c, -1], break_even))
+    return int(next(i for i in order if feasible[i]))
+
+
+def standard_plan(schedules=SOLUTION_SCHEDULES, max_annual_capex=MAX_ANNUAL_CAPEX, scenario="base"):
+    """標準の段階投資案：年間投資上限を満たす案のうち最短回収の案（simulate と同じ形式、案は1つ）"""
+    alternatives = simulate(phasing_alternatives(schedules), schedules)
+    best = earliest_payback(alternatives, scenario, max_annual_capex)
+    return simulate(alternatives["starts"][best:best + 1], schedules)
+
+
+def format_month(month):
+    """回収月を「2年目後半（Month 20）」の形式に整形"""
+    if month < 0:
+        return "期間内未回収"
+    year = (month - 1) // 12 + 1
+    half = "前半" if (month - 1) % 12 < 6 else "後半"
+    return f"{year}年目{half}（Month {month}）"
+
+
+def format_break_even(break_even, months=MONTHS):
+    """シナリオ別の回収月を「基準（楽観-保守）」の表記に整形"""
+    conservative, base, optimistic = (int(m) for m in break_even)
+    latest = f"Month {conservative}" if conservative > 0 else f"{months}ヶ月超"
+    earliest = f"Month {optimistic}" if optimistic > 0 else f"{months}ヶ月超"
+    return f"{format_month(base)}、楽観{earliest}〜保守{latest}"
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+ネイティブPowerPointグラフ生成
+レンジバー・積み上げ面・ウォーターフォール・折れ線・トルネードを数値系列から作成する
+埋め込みワークブックはXlsxWriterのconstant_memoryモードで行単位にストリーム書き出し
+"""
+
+import io
+from datetime import datetime
+
+from pptx.chart.data import CategoryChartData
+from pptx.chart.xlsx import CategoryWorkbookWriter
+from pptx.dml.color import RGBColor
+from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION, XL_LABEL_POSITION, XL_TICK_LABEL_POSITION
+from pptx.util import Pt, lazyproperty
+from xlsxwriter import Workbook
+
+# 色定義（create_pptx_improved.pyのパレットと同じ）
+COLOR_PRIMARY = RGBColor(26, 84, 144)
+COLOR_SECONDARY = RGBColor(192, 57, 43)
+COLOR_ACCENT = RGBColor(40, 116, 166)
+COLOR_POSITIVE = RGBColor(39, 174, 96)
+COLOR_TEXT = RGBColor(52, 73, 94)
+
+# 埋め込みワークブックの作成日時（再現可能な出力のため固定）
+WORKBOOK_CREATED = datetime(2025, 1, 1)
+
+SERIES_COLORS = [
+    COLOR_PRIMARY,
+    COLOR_SECONDARY,
+    COLOR_POSITIVE,
+    RGBColor(230, 126, 34),
+    RGBColor(142, 68, 173),
+    COLOR_ACCENT,
+]
+
+
+class StreamingWorkbookWriter(CategoryWorkbookWriter):
+    """埋め込みワークブックを行単位で書き出すライター（単一階層カテゴリ用）"""
+
+    @property
+    def xlsx_blob(self):
+        chart_data = self._chart_data
+        if chart_data.categories.depth != 1:
+            return super().xlsx_blob
+
+        xlsx_file = io.BytesIO()
+        workbook = Workbook(xlsx_file, {"constant_memory": True})
+        # 作成日時を固定し、同じデータからは同じバイト列を生成する
+        workbook.set_properties({"created": WORKBOOK_CREATED})
+        worksheet = workbook.add_worksheet()
+
+        # 1行目：系列名（constant_memoryでは行順に書く必要がある）
+        for series in chart_data:
+            worksheet.write(0, 1 + series.index, series.name)
+
+        # 2行目以降：カテゴリ＋各系列の値
+        number_formats = [workbook.add_format({"num_format": s.number_format}) for s in chart_data]
+        labels = (c.label for c in chart_data.categories)
+        columns = [s.values for s in chart_data]
+        for r, (label, *values) in enumerate(zip(labels, *columns), start=1):
+            worksheet.write(r, 0, label)
+            for c, (value, fmt) in enumerate(zip(values, number_formats), start=1):
+                if value is not None:
+                    worksheet.write_number(r, c, value, fmt)
+
+        workbook.close()
+        return xlsx_file.getvalue()
+
+
+class StreamingChartData(CategoryChartData):
+    """ストリーミングライターを使うカテゴリグラフデータ"""
+
+    @lazyproperty
+    def _workbook_writer(self):
+        return StreamingWorkbookWriter(self)
+
+
+def add_range_bar_chart(slide, rect, categories, lows, highs, unit="", color=COLOR_PRIMARY, horizontal=False):
+    """下限〜上限のレンジバー（透明な基底系列＋レンジ系列の積み上げ）"""
+    chart_data = StreamingChartData()
+    chart_data.categories = categories
+    chart_data.add_series("下限", lows)
+    chart_data.add_series("レンジ", [h - l for l, h in zip(lows, highs)])
+
+    chart_type = XL_CHART_TYPE.BAR_STACKED if horizontal else XL_CHART_TYPE.COLUMN_STACKED
+    chart = slide.shapes.add_chart(chart_type, *rect, chart_data).chart
+    _style_chart(chart, legend=False)
+    chart.plots[0].gap_width = 60
+
+    base, band = chart.series
+    base.format.fill.background()
+    base.format.line.fill.background()
+    band.format.fill.solid()
+    band.format.fill.fore_color.rgb = color
+
+    # レンジ上端に「下限-上限」ラベル
+    for point, low, high in zip(band.points, lows, highs):
+        label = point.data_label
+        label.position = XL_LABEL_POSITION.INSIDE_END
+        label.text_frame.text = f"{_fmt(low)}-{_fmt(high)}{unit}"
+        font = label.text_frame.paragraphs[0].font
+        font.size = Pt(12)
+        font.bold = True
+        font.color.rgb = RGBColor(255, 255, 255)
+
+    return chart
+
+
+def add_stacked_area_chart(slide, rect, categories, series, colors=SERIES_COLORS):
+    """積み上げ面グラフ（series: {系列名: 値リスト}）"""
+    chart_data = StreamingChartData()
+    chart_data.categories = categories
+    for name, values in series.items():
+        chart_data.add_series(name, values)
+
+    chart = slide.shapes.add_chart(XL_CHART_TYPE.AREA_STACKED, *rect, chart_data).chart
+    _style_chart(chart)
+    _color_series(chart, colors)
+    return chart
+
+
+def add_line_chart(slide, rect, categories, series, number_format="General", colors=SERIES_COLORS):
+    """折れ線グラフ（KPI推移など）"""
+    chart_data = StreamingChartData(number_format=number_format)
+    chart_data.categories = categories
+    for name, values in series.items():
+        chart_data.add_series(name, values)
+
+    chart = slide.shapes.add_chart(XL_CHART_TYPE.LINE_MARKERS, *rect, chart_data).chart
+    _style_chart(chart)
+    for s, color in zip(chart.series, colors):
+        s.smooth = False
+        s.format.line.color.rgb = color
+        s.format.line.width = Pt(2.25)
+        s.marker.format.fill.solid()
+        s.marker.format.fill.fore_color.rgb = color
+    chart.value_axis.tick_labels.number_format = number_format
+    chart.value_axis.tick_labels.number_format_is_linked = False
+    return chart
+
+
+def waterfall_series(deltas, start=None):
+    """ウォーターフォールの基底・増加・減少・合計の各系列を計算"""
+    base, up, down, total = [], [], [], []
+    running = 0
+
+    if start is not None:
+        base.append(0)
+        up.append(0)
+        down.append(0)
+        total.append(start)
+        running = start
+
+    for delta in deltas:
+        base.append(min(running, running + delta))
+        up.append(max(delta, 0))
+        down.append(max(-delta, 0))
+        total.append(0)
+        running += delta
+
+    base.append(0)
+    up.append(0)
+    down.append(0)
+    total.append(running)
+
+    return base, up, down, total
+
+
+def add_waterfall_chart(slide, rect, labels, deltas, start=None, start_label="現状", end_label="合計", unit=""):
+    """ウォーターフォール（ブリッジ）グラフ"""
+    base, up, down, total = waterfall_series(deltas, start)
+    categories = ([start_label] if start is not None else []) + list(labels) + [end_label]
+
+    chart_data = StreamingChartData()
+    chart_data.categories = categories
+    chart_data.add_series("基底", base)
+    chart_data.add_series("増加", up)
+    chart_data.add_series("減少", down)
+    chart_data.add_series(end_label, total)
+
+    chart = slide.shapes.add_chart(XL_CHART_TYPE.COLUMN_STACKED, *rect, chart_data).chart
+    _style_chart(chart, legend=False)
+    chart.plots[0].gap_width = 50
+
+    s_base, s_up, s_down, s_total = chart.series
+    s_base.format.fill.background()
+    s_base.format.line.fill.background()
+    for s, color in ((s_up, COLOR_POSITIVE), (s_down, COLOR_SECONDARY), (s_total, COLOR_PRIMARY)):
+        s.format.fill.solid()
+        s.format.fill.fore_color.rgb = color
+
+    # 各棒に値ラベル（0の点はラベルなし）
+    for s, values, sign in ((s_up, up, "+"), (s_down, down, "△"), (s_total, total, "")):
+        for point, value in zip(s.points, values):
+            if not value:
+                continue
+            label = point.data_label
+            label.position = XL_LABEL_POSITION.INSIDE_END
+            label.text_frame.text = f"{sign}{_fmt(value)}{unit}"
+            font = label.text_frame.paragraphs[0].font
+            font.size = Pt(11)
+            font.bold = True
+            font.color.rgb = RGBColor(255, 255, 255)
+
+    return chart
+
+
+def add_tornado_chart(slide, rect, labels, lows, highs, base, unit=""):
+    """トルネードグラフ（各前提の下限・上限時の出力を基準値からの差で横棒表示）"""
+    chart_data = StreamingChartData()
+    # 横棒は下から描画されるため、影響の大きい順に上から並ぶよう反転
+    chart_data.categories = list(reversed(labels))
+    chart_data.add_series("前提下限", [low - base for low in reversed(lows)])
+    chart_data.add_series("前提上限", [high - base for high in reversed(highs)])
+
+    chart = slide.shapes.add_chart(XL_CHART_TYPE.BAR_CLUSTERED, *rect, chart_data).chart
+    _style_chart(chart)
+    plot = chart.plots[0]
+    plot.overlap = 100
+    plot.gap_width = 40
+    _color_series(chart, [COLOR_SECONDARY, COLOR_POSITIVE])
+
+    # 軸ラベルはグラフの左端に寄せ、棒と重ならないようにする
+    chart.category_axis.tick_label_position = XL_TICK_LABEL_POSITION.LOW
+    chart.value_axis.has_major_gridlines = False
+
+    for s in chart.series:
+        for point, value in zip(s.points, s.values):
+            if not value:
+                continue
+            label = point.data_label
+            label.position = XL_LABEL_POSITION.OUTSIDE_END
+            label.text_frame.text = f"{'+' if value > 0 else '△'}{_fmt(round(abs(value), 2))}{unit}"
+            label.text_frame.paragraphs[0].font.size = Pt(10)
+
+    return chart
+
+
+def _style_chart(chart, legend=True):
+    """グラフ共通の書式（フォント・凡例）"""
+    chart.font.size = Pt(11)
+    chart.font.color.rgb = COLOR_TEXT
+    chart.has_legend = legend
+    if legend:
+        chart.legend.position = XL_LEGEND_POSITION.BOTTOM
+        chart.legend.include_in_layout = False
+
+
+def _color_series(chart, colors):
+    """系列を塗りつぶし色で着色"""
+    for s, color in zip(chart.series, colors):
+        s.format.fill.solid()
+        s.format.fill.fore_color.rgb = color
+
+
+def _fmt(value):
+    """ラベル用の数値表記（整数は桁区切り、小数は最大2桁）"""
+    if float(value).is_integer():
+        return f"{int(value):,}"
+    return f"{value:,.2f}".rstrip("0")
@@ -10,11 +10,15 @@ from pptx.enum.text import PP_ALIGN
 from pptx.dml.color import RGBColor
 from pptx.enum.shapes import MSO_SHAPE
 
+from deck_theme import LAYOUT_SECTION, apply_theme, add_themed_slide
+from pptx_optimizer import optimize_package, format_report
+
 def add_collaboration_slides():
     """既存のプレゼンテーションに協業計画スライドを追加"""
 
     # 既存のプレゼンテーションを読み込み
     prs = Presentation("物流ソリューション提案書_ヤマエ久野.pptx")
+    apply_theme(prs)
 
     # スライド追加
     add_divider_slide(prs, "協業プロジェクト計画")
@@ -34,34 +38,8 @@ def add_collaboration_slides():
 
 
 def add_divider_slide(prs, title_text):
-    """セクション区切りスライド"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    # 背景色的な効果
-    left = Inches(0)
-    top = Inches(0)
-    width = Inches(10)
-    height = Inches(7.5)
-    shape = slide.shapes.add_shape(1, left, top, width, height)
-    shape.fill.solid()
-    shape.fill.fore_color.rgb = RGBColor(26, 84, 144)
-    shape.line.fill.background()
-
-    # タイトル
-    left = Inches(1)
-    top = Inches(3)
-    width = Inches(8)
-    height = Inches(1.5)
-    txBox = slide.shapes.add_textbox(left, top, width, height)
-    tf = txBox.text_frame
-    tf.text = title_text
-    p = tf.paragraphs[0]
-    p.alignment = PP_ALIGN.CENTER
-    p.font.size = Pt(48)
-    p.font.bold = True
-    p.font.color.rgb = RGBColor(255, 255, 255)
-
-    return slide
+    """セクション区切りスライド（背景はレイアウトで定義）"""
+    return add_themed_slide(prs, LAYOUT_SECTION, title_text, Pt(48))
 
 
 def add_collaboration_approach(prs):
@@ -746,6 +724,8 @@ def add_next_steps_detail(prs):
 
 if __name__ == "__main__":
     prs = add_collaboration_slides()
+    report = optimize_package(prs, recompress_png=True, target_dpi=150)
+    print(format_report(report, "パッケージ最適化"))
     prs.save("物流ソリューション提案書_ヤマエ久野_完全版.pptx")
     print("協業プロジェクト計画スライドを追加しました")
     print(f"総スライド数: {len(prs.slides)}")
@@ -4,75 +4,138 @@
 ヤマエ久野株式会社 物流ソリューション提案書 PowerPoint生成スクリプト
 """
 
+from functools import lru_cache
+
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.enum.text import PP_ALIGN
 from pptx.dml.color import RGBColor
 
-def create_presentation():
-    """プレゼンテーションを作成"""
-    prs = Presentation()
-    prs.slide_width = Inches(10)
-    prs.slide_height = Inches(7.5)
+from profit_bridge import ORDINARY_MARGIN, GROSS_MARGIN, margin_bridge, format_total, format_headline, add_bridge_chart
+from pptx_optimizer import optimize_package, format_report
+from ranges import RangeArray
+from sensitivity import tornado, sobol_indices
+from charts import add_tornado_chart
+from cash_timeline import (
+    MAX_ANNUAL_CAPEX, standard_plan, annual_summary, format_break_even,
+)
+from rebalance import estimate as estimate_rebalance, format_freed_capital
+from working_capital import liquidity_summary, format_ratio, format_ratio_range, format_point_change, format_days
+from fefo import estimate as estimate_disposal, gross_margin_definition, bridge_effect, format_disposal
+from loading import estimate as estimate_loading, format_fill, format_reduction
+from network import estimate as estimate_network, format_network
+from financial_model import build_default_model, format_amount, format_margin, format_margin_change
+
+# ソリューション別の投資額・年間効果（合計・投資回収年数はここから計算）
+SOLUTIONS = [
+    ("① 高度在庫管理", "220-280百万円", "330-470百万円"),
+    ("② 統合物流PF", "350-430百万円", "330-450百万円"),
+    ("③ 物流自動化", "400-550百万円", "210-320百万円"),
+]
+INVESTMENT = RangeArray.parse([s[1] for s in SOLUTIONS])
+ANNUAL_EFFECT = RangeArray.parse([s[2] for s in SOLUTIONS])
 
-    # スライド1: タイトル
-    slide = add_title_slide(prs)
+# 月次キャッシュタイムライン（標準の段階投資案）
+CASH_PLAN = standard_plan()
+PAYBACK = format_break_even(CASH_PLAN["break_even"][0])
 
-    # スライド2: 目次
-    slide = add_agenda_slide(prs)
+# 流動比率・CCC（運転資金シミュレーションの現状と3年後の保守〜楽観。元帳の入手までは債権・債務が仮定値）
+LIQUIDITY = liquidity_summary()
+CURRENT_RATIO = format_ratio(LIQUIDITY["current_ratio"])
+TARGET_RATIO = format_ratio_range(*LIQUIDITY["target_ratio"])
+RATIO_CHANGE = format_point_change(LIQUIDITY["current_ratio"], *LIQUIDITY["target_ratio"])
 
-    # スライド3: エグゼクティブサマリー
-    slide = add_executive_summary_slide(prs)
+# 総利益率（ブリッジの定義から。FEFOの効果は在庫ロス削減の内数のため見出しは同じ）
+GROSS_NOW, GROSS_TARGET, GROSS_CHANGE = format_headline(GROSS_MARGIN)
 
-    # スライド4-6: 現状分析（財務指標）
-    slide = add_financial_analysis_1(prs)
-    slide = add_financial_analysis_2(prs)
-    slide = add_financial_analysis_3(prs)
 
-    # スライド7-10: 課題分析
-    slide = add_issue_1(prs)
-    slide = add_issue_2(prs)
-    slide = add_issue_3(prs)
-    slide = add_issue_4(prs)
+# 以下の試算は数秒かかるため、モジュールの読み込み時ではなく使用するスライドの構築時に1回だけ計算する
 
-    # スライド11: ソリューション全体像
-    slide = add_solution_overview(prs)
+@lru_cache(maxsize=None)
+def financial_model():
+    """営業CF・CFマージン・物流コスト・経常利益率の財務モデル（改善要因は保守〜楽観のレンジ）
 
-    # スライド12-14: 各ソリューション詳細
-    slide = add_solution_1(prs)
-    slide = add_solution_2(prs)
-    slide = add_solution_3(prs)
+    前提値を変えた後は refresh_slides で影響を受けるスライドだけを作り直す
+    """
+    return build_default_model(ranges=True)
 
-    # スライド15: 投資対効果サマリー
-    slide = add_roi_summary(prs)
 
-    # スライド16: 財務改善シミュレーション
-    slide = add_financial_simulation(prs)
+@lru_cache(maxsize=None)
+def network_estimate():
+    """拠点網の再編（需要・輸送単価のシナリオ別に統廃合・新設を評価した現状維持との費用差）
 
-    # スライド17-18: 収益性改善の内訳
-    slide = add_profitability_improvement_1(prs)
-    slide = add_profitability_improvement_2(prs)
+    合成データによる試算で、②の配送コスト削減と重なるため②の投資額・年間効果には加えない
+    """
+    return estimate_network()
 
-    # スライド19: 投資計画
-    slide = add_investment_plan(prs)
 
-    # スライド20-22: 実行ロードマップ
-    slide = add_roadmap_phase1(prs)
-    slide = add_roadmap_phase2(prs)
-    slide = add_roadmap_phase3(prs)
+@lru_cache(maxsize=None)
+def rebalance_estimate():
+    """拠点間在庫再配置（余剰拠点からの移動で不足拠点の仕入を置き換え、運転資金を解放。合成データによる試算）"""
+    return estimate_rebalance()
 
-    # スライド23: 期待効果まとめ
-    slide = add_expected_benefits(prs)
 
-    # スライド24: 次のステップ
-    slide = add_next_steps(prs)
+@lru_cache(maxsize=None)
+def disposal_estimate():
+    """期限切れ廃棄（ロット別FEFO引当と現状の入荷順の比較、合成データによる試算）"""
+    return estimate_disposal()
 
-    # スライド25: Thank you
-    slide = add_thank_you_slide(prs)
 
+@lru_cache(maxsize=None)
+def gross_margin_fefo():
+    """FEFOの効果を総利益率ブリッジの在庫ロス削減の内数として切り出した定義"""
+    return gross_margin_definition(disposal_estimate())
+
+
+@lru_cache(maxsize=None)
+def loading_estimate():
+    """配送コース別の積付け（現状の固定仕切り・段積みなしと、可動仕切り・車格選択・段積みありの比較）
+
+    試算では積載率・台数は現状並みで、車格の見直しによる積載容量の削減だけが出るため、
+    提案書の積載率80-85%は目標として示し、試算結果はその根拠とせず別に示す
+    """
+    return estimate_loading()
+
+
+def create_presentation():
+    """プレゼンテーションを作成"""
+    prs = Presentation()
+    prs.slide_width = Inches(10)
+    prs.slide_height = Inches(7.5)
+
+    for builder in SLIDE_BUILDERS:
+        builder(prs)
+
+    # 構築時点の前提値で描画済みのため、以降の前提値変更分だけを refresh_slides で作り直す
+    financial_model().pop_dirty_slides()
     return prs
 
 
+def refresh_slides(prs):
+    """財務モデルの前提値変更で値の変わったスライドだけを作り直し、作り直したスライド番号を返す
+
+    例: financial_model().set_input("在庫削減額", (1200, 1800)) の後に呼ぶ
+    """
+    refreshed = []
+    dirty = financial_model().pop_dirty_slides()
+    for index, builder in enumerate(SLIDE_BUILDERS):
+        if builder.__name__ in dirty:
+            builder(prs)
+            _replace_slide(prs, index)
+            refreshed.append(index + 1)
+    return refreshed
+
+
+def _replace_slide(prs, index):
+    """末尾に追加したスライドを index 番目のスライドと差し替える（パーツ名は表示順に振り直す）"""
+    sldIdLst = prs.slides._sldIdLst
+    new, old = sldIdLst[-1], sldIdLst[index]
+    old.addprevious(new)
+    prs.part.drop_rel(old.rId)
+    sldIdLst.remove(old)
+    prs.part.rename_slide_parts([sldId.rId for sldId in sldIdLst])
+
+
 def add_title_slide(prs):
     """タイトルスライド"""
     slide = prs.slides.add_slide(prs.slide_layouts[6])  # 空白レイアウト
@@ -169,17 +232,18 @@ def add_executive_summary_slide(prs):
     p.font.color.rgb = RGBColor(192, 57, 43)
     p.space_after = Pt(12)
 
+    values = financial_model().values()
     items = [
-        "キャッシュフロー悪化：営業CFマージン -3.12%",
-        "収益性の低迷：経常利益率 1.73%、総利益率 7.38%",
-        "財務健全性の問題：流動比率 91.06%",
-        "根本原因：在庫14,000百万円、物流コスト推定35,000百万円",
+        f"キャッシュフロー悪化：営業CFマージン {format_margin(values['CFマージン'])}",
+        f"収益性の低迷：経常利益率 {format_margin(values['経常利益率'])}、総利益率 {GROSS_NOW}",
+        f"財務健全性の問題：流動比率 {CURRENT_RATIO}",
+        f"根本原因：在庫{format_amount(values['棚卸資産'])}百万円、物流コスト推定{format_amount(values['物流コスト'])}百万円",
         "",
         "提案：3つの物流システムソリューション",
-        "投資額：970-1,260百万円",
-        "年間効果：870-1,240百万円",
-        "投資回収：約1.1-1.4年",
-        "経常利益率改善：1.73% → 3.0-3.5%"
+        f"投資額：{INVESTMENT.sum().format()}",
+        f"年間効果：{ANNUAL_EFFECT.sum().format()}",
+        f"投資回収：約{INVESTMENT.sum().payback(ANNUAL_EFFECT.sum()).format(decimals=1)}",
+        f"経常利益率改善：{format_margin(values['経常利益率'])} → {format_margin(values['改善後経常利益率'])}"
     ]
 
     for item in items:
@@ -233,10 +297,13 @@ def add_financial_analysis_1(prs):
         "150億円レベルの変動",
         "",
         "営業CFマージン",
-        "-3.12%（マイナス）",
+        f"{format_margin(financial_model().value('CFマージン'))}（マイナス）",
         "",
         "主因：棚卸資産増減",
-        "△1,429百万円"
+        "△1,429百万円",
+        "",
+        "拠点間在庫再配置の効果（合成データ試算）",
+        f"運転資金 {format_freed_capital(rebalance_estimate())}",
     ]
 
     for item in items:
@@ -267,9 +334,9 @@ def add_financial_analysis_2(prs):
     # テーブル風にテキストで表現
     metrics = [
         ("指標", "現状", "業界標準", "評価"),
-        ("売上高総利益率", "7.38%", "10-15%", "❌ 著しく低い"),
+        ("売上高総利益率", GROSS_NOW, "10-15%", "❌ 著しく低い"),
         ("売上高経常利益率", "1.73%", "3-5%", "❌ 大幅に低い"),
-        ("流動比率", "91.06%", "150%以上", "❌ 低水準"),
+        ("流動比率", CURRENT_RATIO, "150%以上", "❌ 低水準"),
     ]
 
     for row in metrics:
@@ -292,9 +359,9 @@ def add_financial_analysis_2(prs):
     p.space_before = Pt(20)
 
     causes = [
-        "調達・物流コストの高さ → 総利益率7.38%",
+        f"調達・物流コストの高さ → 総利益率{GROSS_NOW}",
         "物流コスト推定7-9% → 経常利益率1.73%",
-        "在庫14,000百万円 → 流動比率91.06%"
+        f"在庫14,000百万円 → 流動比率{CURRENT_RATIO}"
     ]
 
     for cause in causes:
@@ -317,22 +384,26 @@ def add_financial_analysis_3(prs):
     tf.clear()
 
     # 構造図（テキストで表現）
+    values = financial_model().values()
     structure = [
         "物流課題",
         "  ↓",
         "① 在庫管理の非効率",
-        "  → 在庫14,000百万円（過剰・長期滞留）",
+        f"  → 在庫{format_amount(values['棚卸資産'])}百万円（過剰・長期滞留）",
         "  → 棚卸資産増減 △1,429百万円",
-        "  → 営業CFマージン -3.12%",
-        "  → 流動比率 91.06%",
+        f"  → 営業CFマージン {format_margin(values['CFマージン'])}",
+        f"  → 流動比率 {CURRENT_RATIO}",
+        f"  → CCC {format_days(LIQUIDITY['ccc'])}（在庫{LIQUIDITY['days']['dio']:.1f}日"
+        f"＋債権{LIQUIDITY['days']['dso']:.1f}日−債務{LIQUIDITY['days']['dpo']:.1f}日"
+        f"{'、債権・債務は仮定値' if 'ccc' in LIQUIDITY['assumed'] else ''}）",
         "",
         "② 物流コストの増大",
-        "  → 推定35,000百万円（売上比7-9%）",
-        "  → 経常利益率 1.73%",
+        f"  → 推定{format_amount(values['物流コスト'])}百万円（売上比7-9%）",
+        f"  → 経常利益率 {format_margin(values['経常利益率'])}",
         "",
         "③ 調達・在庫ロスの発生",
         "  → FIFO管理不徹底、品質劣化",
-        "  → 総利益率 7.38%",
+        f"  → 総利益率 {GROSS_NOW}",
     ]
 
     for line in structure:
@@ -508,7 +579,7 @@ def add_issue_4(prs):
     p.space_after = Pt(12)
 
     structure = [
-        "総利益率 7.38%（業界10-15%）",
+        f"総利益率 {GROSS_NOW}（業界10-15%）",
         "  原因1：調達物流コスト高（VMI未導入）",
         "  原因2：在庫ロス・品質劣化による値引き",
         "",
@@ -516,14 +587,14 @@ def add_issue_4(prs):
         "  原因：物流コスト推定35,000百万円",
         "  売上比7-9%（効率的企業は5-6%）",
         "",
-        "流動比率 91.06%（健全水準150%以上）",
+        f"流動比率 {CURRENT_RATIO}（健全水準150%以上）",
         "  原因：在庫14,000百万円の固定化",
         "  運転資金の圧迫",
         "",
         "改善ポテンシャル",
-        "• 総利益率：7.38% → 9.0-10.0%（+1.6-2.6pt）",
+        f"• 総利益率：{GROSS_NOW} → {GROSS_TARGET}（{GROSS_CHANGE}）",
         "• 経常利益率：1.73% → 3.0-3.5%（+1.3-1.8pt）",
-        "• 流動比率：91.06% → 120-130%（+29-39pt）"
+        f"• 流動比率：{CURRENT_RATIO} → {TARGET_RATIO}（{RATIO_CHANGE}）"
     ]
 
     for line in structure:
@@ -646,19 +717,21 @@ def add_solution_2(prs):
         "主要機能",
         "• TMS（配送ルート最適化・動的配車）",
         "• SCM可視化（サプライチェーン全体）",
-        "• IoT活用（車両・貨物追跡）",
-        "• KPI自動集計・分析",
+        "• 拠点網最適化（統廃合・新設の評価）",
+        "• IoT活用（車両・貨物追跡）・KPI自動集計",
         "",
         "導入効果",
         "• 配送コスト：15-20%削減",
-        "• 積載効率：65-70% → 80-85%",
-        "• リードタイム：20-30%短縮",
-        "• 配車計画時間：80%削減",
+        "• 積載効率：65-70% → 80-85%（目標）",
+        f"• 積付け試算（合成データ）：車格見直しで{format_reduction(loading_estimate())}、"
+        f"積載率{format_fill(loading_estimate())}",
+        f"• 拠点再編（試算・効果に未算入）：{format_network(network_estimate())}",
+        "• リードタイム：20-30%短縮・配車計画時間：80%削減",
         "",
         "投資対効果",
-        "• 初期投資：350-430百万円",
-        "• 年間効果：330-450百万円",
-        "• ROI：0.8-1.3年",
+        f"• 初期投資：{SOLUTIONS[1][1]}",
+        f"• 年間効果：{SOLUTIONS[1][2]}",
+        f"• ROI：{INVESTMENT[1].payback(ANNUAL_EFFECT[1]).format(decimals=1)}",
     ]
 
     for item in details:
@@ -737,14 +810,15 @@ def add_roi_summary(prs):
     p.font.bold = True
     p.space_after = Pt(12)
 
-    table_data = [
-        ("ソリューション", "初期投資", "年間効果", "ROI"),
-        ("① 高度在庫管理", "220-280百万円", "330-470百万円", "0.5-0.8年"),
-        ("② 統合物流PF", "350-430百万円", "330-450百万円", "0.8-1.3年"),
-        ("③ 物流自動化", "400-550百万円", "210-320百万円", "1.3-2.6年"),
-        ("", "", "", ""),
-        ("合計", "970-1,260百万円", "870-1,240百万円", "1.1-1.4年"),
-    ]
+    # 合計・ROI（投資回収年数）はレンジ演算で算出
+    payback = INVESTMENT.payback(ANNUAL_EFFECT).format(decimals=1)
+    total_payback = INVESTMENT.sum().payback(ANNUAL_EFFECT.sum()).format(decimals=1)
+
+    table_data = [("ソリューション", "初期投資", "年間効果", "ROI")]
+    for (name, investment, effect), roi in zip(SOLUTIONS, payback):
+        table_data.append((name, investment, effect, roi))
+    table_data.append(("", "", "", ""))
+    table_data.append(("合計", INVESTMENT.sum().format(), ANNUAL_EFFECT.sum().format(), total_payback))
 
     for row in table_data:
         if row[0] == "":
@@ -763,7 +837,7 @@ def add_roi_summary(prs):
     p = tf.add_paragraph()
     p.text = ""
     p = tf.add_paragraph()
-    p.text = "投資回収：2年目後半には完全回収"
+    p.text = f"累積CFベースの投資回収：{PAYBACK}"
     p.font.size = Pt(18)
     p.font.bold = True
     p.font.color.rgb = RGBColor(192, 57, 43)
@@ -788,16 +862,21 @@ def add_financial_simulation(prs):
     p.font.bold = True
     p.space_after = Pt(12)
 
-    # テーブル
+    # テーブル（営業CF・CFマージン・物流コスト・経常利益率は財務モデルから）
+    values = financial_model().values()
     table_data = [
         ("財務指標", "現状", "改善後", "改善幅"),
-        ("営業CF", "4,653百万円", "18,000-20,000", "+13,000-15,000"),
-        ("CFマージン", "-3.12%", "3.5-4.0%", "+6.5-7.0pt"),
-        ("物流コスト", "35,000百万円", "31,000-32,000", "△3,000-4,000"),
+        ("営業CF", f"{format_amount(values['営業CF'])}百万円", format_amount(values['改善後営業CF']),
+         format_amount(values['改善後営業CF'] - values['営業CF'], signed=True)),
+        ("CFマージン", format_margin(values['CFマージン']), format_margin(values['改善後CFマージン']),
+         format_margin_change(values['CFマージン'], values['改善後CFマージン'])),
+        ("物流コスト", f"{format_amount(values['物流コスト'])}百万円", format_amount(values['改善後物流コスト']),
+         format_amount(-values['物流コスト削減額'], signed=True)),
         ("", "", "", ""),
-        ("総利益率", "7.38%", "9.0-10.0%", "+1.6-2.6pt"),
-        ("経常利益率", "1.73%", "3.0-3.5%", "+1.3-1.8pt"),
-        ("流動比率", "91.06%", "120-130%", "+29-39pt"),
+        ("総利益率", GROSS_NOW, GROSS_TARGET, GROSS_CHANGE),
+        ("経常利益率", format_margin(values['経常利益率']), format_margin(values['改善後経常利益率']),
+         format_margin_change(values['経常利益率'], values['改善後経常利益率'])),
+        ("流動比率", CURRENT_RATIO, TARGET_RATIO, RATIO_CHANGE),
     ]
 
     for row in table_data:
@@ -818,6 +897,72 @@ def add_financial_simulation(prs):
     return slide
 
 
+def add_sensitivity_analysis(prs):
+    """経常利益率の感度分析（トルネード・Sobol指数）"""
+    slide = prs.slides.add_slide(prs.slide_layouts[6])  # 空白レイアウト
+
+    # タイトル
+    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.6))
+    tf = txBox.text_frame
+    tf.text = "感度分析：改善後経常利益率を動かす前提"
+    p = tf.paragraphs[0]
+    p.font.size = Pt(28)
+    p.font.bold = True
+    p.font.color.rgb = RGBColor(26, 84, 144)
+
+    output = "改善後経常利益率"
+    result = tornado(output)
+    rows = [r for r in result["rows"] if r[1] != r[2]]
+    base = result["base"] * 100
+
+    add_tornado_chart(
+        slide, (Inches(0.3), Inches(1.1), Inches(5.9), Inches(5.2)),
+        [name for name, _, _ in rows],
+        [low * 100 for _, low, _ in rows],
+        [high * 100 for _, _, high in rows],
+        base,
+        unit="pt",
+    )
+
+    # Sobol指数（全前提を同時に変動させた時の寄与度）
+    sobol = sobol_indices(output, n=10000)
+    ranking = sorted(
+        zip(sobol["names"], sobol["first_order"], sobol["total_order"]),
+        key=lambda r: r[2], reverse=True,
+    )
+
+    txBox = slide.shapes.add_textbox(Inches(6.4), Inches(1.1), Inches(3.3), Inches(5.2))
+    tf = txBox.text_frame
+    tf.word_wrap = True
+    tf.text = f"基準値：{base:.2f}%"
+    p = tf.paragraphs[0]
+    p.font.size = Pt(16)
+    p.font.bold = True
+    p.font.color.rgb = RGBColor(192, 57, 43)
+
+    p = tf.add_paragraph()
+    p.text = "Sobol指数（1次 / 全次）"
+    p.font.size = Pt(15)
+    p.font.bold = True
+    p.space_before = Pt(12)
+
+    for name, first, total in ranking:
+        if total < 0.005:
+            continue
+        p = tf.add_paragraph()
+        p.text = f"{name}：{max(first, 0):.0%} / {total:.0%}"
+        p.font.size = Pt(13)
+        p.space_before = Pt(4)
+
+    p = tf.add_paragraph()
+    p.text = f"（{sobol['evaluations']:,}ケースの一括評価）"
+    p.font.size = Pt(11)
+    p.font.color.rgb = RGBColor(127, 140, 141)
+    p.space_before = Pt(10)
+
+    return slide
+
+
 def add_profitability_improvement_1(prs):
     """収益性改善の内訳1"""
     slide = prs.slides.add_slide(prs.slide_layouts[1])
@@ -828,38 +973,40 @@ def add_profitability_improvement_1(prs):
     tf = content.text_frame
     tf.clear()
 
+    bridge = margin_bridge(gross_margin_fefo())
+    effect = bridge_effect(disposal_estimate())
     p = tf.add_paragraph()
-    p.text = "総利益率：7.38% → 9.0-10.0%"
+    p.text = f"総利益率：{GROSS_NOW} → {GROSS_TARGET}"
     p.font.size = Pt(24)
     p.font.bold = True
     p.font.color.rgb = RGBColor(192, 57, 43)
-    p.space_after = Pt(16)
+    p.space_after = Pt(8)
 
     breakdown = [
         "改善要因1：調達物流最適化",
         "  VMI・共同調達によるコスト削減",
         "  効果：+0.8-1.2ポイント",
-        "",
         "改善要因2：在庫ロス削減",
-        "  FIFO徹底・品質管理による値引き・廃棄削減",
+        "  期限管理（FEFO引当）・品質管理による値引き・廃棄削減",
         "  効果：+0.5-0.8ポイント",
-        "",
+        f"  うちFEFO：{format_disposal(disposal_estimate())}（入荷順比・合成データ試算）",
+        f"  　→ +{effect[0]:.2f}-{effect[-1]:.2f}ポイント（在庫ロス削減の内数）",
         "改善要因3：物流効率化",
         "  欠品削減、配送品質向上による付加価値向上",
         "  効果：+0.3-0.6ポイント",
-        "",
-        "合計改善幅：+1.6-2.6ポイント",
+        f"合計改善幅：{format_total(bridge)}",
     ]
 
     for line in breakdown:
         p = tf.add_paragraph()
         p.text = line
         if line.startswith("改善要因") or line.startswith("合計"):
-            p.font.size = Pt(18)
+            p.font.size = Pt(17)
             p.font.bold = True
+            p.space_before = Pt(6)
         else:
-            p.font.size = Pt(15)
-        p.space_before = Pt(6)
+            p.font.size = Pt(14)
+            p.space_before = Pt(2)
 
     return slide
 
@@ -885,7 +1032,7 @@ def add_profitability_improvement_2(prs):
         "• 物流コスト削減：+0.6-0.8pt",
         "• 総利益率改善効果：+0.4-0.6pt",
         "• オペレーション効率化：+0.3-0.4pt",
-        "合計：+1.3-1.8ポイント",
+        f"合計：{format_total(margin_bridge(ORDINARY_MARGIN))}",
     ]
 
     for line in breakdown1:
@@ -903,7 +1050,7 @@ def add_profitability_improvement_2(prs):
     p.space_before = Pt(12)
 
     p = tf.add_paragraph()
-    p.text = "流動比率：91.06% → 120-130%"
+    p.text = f"流動比率：{CURRENT_RATIO} → {TARGET_RATIO}"
     p.font.size = Pt(20)
     p.font.bold = True
     p.font.color.rgb = RGBColor(192, 57, 43)
@@ -914,7 +1061,7 @@ def add_profitability_improvement_2(prs):
         "• 過剰在庫削減：1,000-2,000百万円",
         "• 運転資金サイクル改善",
         "• 営業CF改善による手元流動性向上",
-        "合計：+29-39ポイント",
+        f"合計：{format_point_change(LIQUIDITY['current_ratio'], *LIQUIDITY['target_ratio'], unit='ポイント')}",
     ]
 
     for line in breakdown2:
@@ -930,6 +1077,51 @@ def add_profitability_improvement_2(prs):
     return slide
 
 
+def add_profitability_bridge(prs):
+    """収益性改善ブリッジ（ウォーターフォール）"""
+    slide = prs.slides.add_slide(prs.slide_layouts[6])  # 空白レイアウト
+
+    # タイトル
+    left = Inches(0.5)
+    top = Inches(0.3)
+    width = Inches(9)
+    height = Inches(0.6)
+    txBox = slide.shapes.add_textbox(left, top, width, height)
+    tf = txBox.text_frame
+    tf.text = "収益性改善ブリッジ（基準シナリオ）"
+    p = tf.paragraphs[0]
+    p.font.size = Pt(28)
+    p.font.bold = True
+    p.font.color.rgb = RGBColor(26, 84, 144)
+
+    bridges = [
+        ("総利益率", margin_bridge(gross_margin_fefo()), Inches(0.3)),
+        ("経常利益率", margin_bridge(ORDINARY_MARGIN), Inches(5.1)),
+    ]
+
+    for label, bridge, left in bridges:
+        txBox = slide.shapes.add_textbox(left, Inches(1.1), Inches(4.6), Inches(0.5))
+        tf = txBox.text_frame
+        tf.text = f"{label}：{bridge['start']}% → {bridge['ends'][0]:.1f}-{bridge['ends'][-1]:.1f}%"
+        p = tf.paragraphs[0]
+        p.alignment = PP_ALIGN.CENTER
+        p.font.size = Pt(16)
+        p.font.bold = True
+        p.font.color.rgb = RGBColor(192, 57, 43)
+
+        add_bridge_chart(slide, (left, Inches(1.7), Inches(4.6), Inches(4.6)), bridge)
+
+        txBox = slide.shapes.add_textbox(left, Inches(6.4), Inches(4.6), Inches(0.5))
+        tf = txBox.text_frame
+        tf.text = f"合計改善幅：{format_total(bridge)}（low-high）"
+        p = tf.paragraphs[0]
+        p.alignment = PP_ALIGN.CENTER
+        p.font.size = Pt(14)
+        p.font.color.rgb = RGBColor(52, 73, 94)
+
+    return slide
+
+
 def add_investment_plan(prs):
     """投資計画"""
     slide = prs.slides.add_slide(prs.slide_layouts[1])
@@ -946,14 +1138,19 @@ def add_investment_plan(prs):
     p.font.bold = True
     p.space_after = Pt(12)
 
-    table_data = [
-        ("期間", "投資額", "効果創出", "ネットCF"),
-        ("1年目", "△500-600百万円", "+150-250百万円", "△300-400百万円"),
-        ("2年目", "△400-500百万円", "+500-700百万円", "+50-200百万円"),
-        ("3年目", "△100-150百万円", "+870-1,240百万円", "+720-1,090百万円"),
-        ("", "", "", ""),
-        ("累計", "△1,000-1,250", "+1,520-2,190", "+470-940百万円"),
-    ]
+    # 年次の値は月次タイムラインを集計（保守〜楽観シナリオのレンジ）
+    summary = annual_summary(CASH_PLAN)
+    spend = summary["capex"] + summary["opex"]
+    table_data = [("期間", "投資・運用費", "効果創出", "ネットCF")]
+    for year, (cost, benefit, net) in enumerate(zip(spend, summary["benefit"], summary["net"]), start=1):
+        table_data.append((f"{year}年目", cost.format(), benefit.format(signed=True), net.format(signed=True)))
+    table_data.append(("", "", "", ""))
+    table_data.append((
+        "累計",
+        spend.sum().format(unit=""),
+        summary["benefit"].sum().format(unit="", signed=True),
+        summary["cumulative"][-1].format(signed=True),
+    ))
 
     for row in table_data:
         if row[0] == "":
@@ -969,15 +1166,22 @@ def add_investment_plan(prs):
             p.font.size = Pt(15)
         p.space_before = Pt(6)
 
+    starts = "Month " + "・".join(str(int(m) + 1) for m in CASH_PLAN["starts"][0])
+
     p = tf.add_paragraph()
     p.text = ""
     p = tf.add_paragraph()
-    p.text = "投資回収：2年目後半に完了"
+    p.text = f"累積CFベースの投資回収：{PAYBACK}"
     p.font.size = Pt(20)
     p.font.bold = True
     p.font.color.rgb = RGBColor(192, 57, 43)
     p.space_before = Pt(20)
 
+    p = tf.add_paragraph()
+    p.text = f"着手時期：①②③を{starts}（投資{MAX_ANNUAL_CAPEX}百万円/年以内で最短回収となる案）"
+    p.font.size = Pt(14)
+    p.space_before = Pt(6)
+
     p = tf.add_paragraph()
     p.text = "3年目以降：フルベネフィット創出"
     p.font.size = Pt(18)
@@ -1157,15 +1361,16 @@ def add_expected_benefits(prs):
     p.font.color.rgb = RGBColor(192, 57, 43)
     p.space_after = Pt(12)
 
+    values = financial_model().values()
     benefits = [
-        "CFマージン：-3.12% → 3.5-4.0%",
-        "経常利益率：1.73% → 3.0-3.5%",
-        "総利益率：7.38% → 9.0-10.0%",
-        "流動比率：91.06% → 120-130%",
+        f"CFマージン：{format_margin(values['CFマージン'])} → {format_margin(values['改善後CFマージン'])}",
+        f"経常利益率：{format_margin(values['経常利益率'])} → {format_margin(values['改善後経常利益率'])}",
+        f"総利益率：{GROSS_NOW} → {GROSS_TARGET}",
+        f"流動比率：{CURRENT_RATIO} → {TARGET_RATIO}",
         "",
         "業務改善効果",
-        "• 在庫削減：1,000-2,000百万円",
-        "• 物流コスト削減：3,000-4,000百万円/年",
+        f"• 在庫削減：{format_amount(values['在庫削減額'])}百万円",
+        f"• 物流コスト削減：{format_amount(values['物流コスト削減額'])}百万円/年",
         "• 運転資金解放：5-7億円",
         "• 倉庫生産性向上：30-40%",
         "• 配送効率向上：積載率80-85%",
@@ -1276,8 +1481,60 @@ def add_thank_you_slide(prs):
     return slide
 
 
+SLIDE_BUILDERS = [
+    # タイトル・目次・エグゼクティブサマリー
+    add_title_slide,
+    add_agenda_slide,
+    add_executive_summary_slide,
+
+    # 現状分析（財務指標）
+    add_financial_analysis_1,
+    add_financial_analysis_2,
+    add_financial_analysis_3,
+
+    # 課題分析
+    add_issue_1,
+    add_issue_2,
+    add_issue_3,
+    add_issue_4,
+
+    # ソリューション全体像・各ソリューション詳細
+    add_solution_overview,
+    add_solution_1,
+    add_solution_2,
+    add_solution_3,
+
+    # 投資対効果サマリー
+    add_roi_summary,
+
+    # 財務改善シミュレーション・感度分析
+    add_financial_simulation,
+    add_sensitivity_analysis,
+
+    # 収益性改善の内訳
+    add_profitability_improvement_1,
+    add_profitability_improvement_2,
+    add_profitability_bridge,
+
+    # 投資計画
+    add_investment_plan,
+
+    # 実行ロードマップ
+    add_roadmap_phase1,
+    add_roadmap_phase2,
+    add_roadmap_phase3,
+
+    # 期待効果まとめ・次のステップ・Thank you
+    add_expected_benefits,
+    add_next_steps,
+    add_thank_you_slide,
+]
+
+
 if __name__ == "__main__":
     prs = create_presentation()
+    report = optimize_package(prs, recompress_png=True, target_dpi=150)
+    print(format_report(report, "パッケージ最適化"))
     prs.save("物流ソリューション提案書_ヤマエ久野.pptx")
     print("PowerPointプレゼンテーションを作成しました: 物流ソリューション提案書_ヤマエ久野.pptx")
     print(f"総スライド数: {len(prs.slides)}")
@@ -5,6 +5,8 @@
 見栄えを大幅に改善：レイアウト最適化、視覚要素追加、フォントサイズ調整
 """
 
+from functools import lru_cache
+
 from pptx import Presentation
 from pptx.util import Inches, Pt, Cm
 from pptx.enum.text import PP_ALIGN, PP_PARAGRAPH_ALIGNMENT
@@ -12,6 +14,28 @@ from pptx.dml.color import RGBColor
 from pptx.enum.shapes import MSO_SHAPE
 from pptx.enum.dml import MSO_LINE
 
+from capacity import (
+    plan as plan_capacity, sample_sites, summarize as summarize_capacity, format_zone_shortage, format_investment,
+)
+from cash_timeline import standard_plan, format_break_even
+from charts import add_range_bar_chart, add_line_chart
+from deck_parallel import build_parallel, build_sequential
+from deck_theme import LAYOUT_TITLE, LAYOUT_SECTION, LAYOUT_CONTENT, DATE_IDX, apply_theme, add_themed_slide
+from financial_model import build_default_model, format_amount, format_margin, format_margin_change
+from layout_grid import grid, stack, box, solve_layout
+from network import estimate as estimate_network, format_network
+from profit_bridge import GROSS_MARGIN, format_headline
+from ranges import RangeArray
+from reconcile import reconcile, sample_inventory, summarize, format_accuracy
+from schedule import plan, format_period
+from shape_templates import CardStyle, ParagraphStyle, add_cards
+from text_fit import fit_presentation
+from waves import estimate as estimate_waves, format_claim_check, format_uplift
+from working_capital import (
+    liquidity_summary, current_ratio_path, format_ratio, format_ratio_range, format_point_change,
+    format_days, format_days_change,
+)
+
 # 色定義
 COLOR_PRIMARY = RGBColor(26, 84, 144)  # ブルー
 COLOR_SECONDARY = RGBColor(192, 57, 43)  # レッド
@@ -20,113 +44,90 @@ COLOR_BG_LIGHT = RGBColor(245, 248, 252)  # 薄いブルー背景
 COLOR_BG_LIGHT2 = RGBColor(252, 245, 245)  # 薄いレッド背景
 COLOR_TEXT = RGBColor(52, 73, 94)  # グレー系
 
-def create_presentation():
-    """完全版プレゼンテーション作成"""
-    prs = Presentation()
-    prs.slide_width = Inches(10)
-    prs.slide_height = Inches(7.5)
+# 角丸カード（テーマ・成功要因・次のステップ）の書式
+CARD_STYLE = CardStyle(
+    MSO_SHAPE.ROUNDED_RECTANGLE, fill=COLOR_BG_LIGHT, line=COLOR_PRIMARY, line_width=Pt(1.5),
+    word_wrap=True, margin_left=Inches(0.15), margin_top=Inches(0.08),
+)
+CARD_TITLE = ParagraphStyle(size=Pt(16), bold=True, color=COLOR_PRIMARY, space_after=Pt(6))
+THEME_TITLE = CARD_TITLE._replace(color=COLOR_SECONDARY)
+CARD_BODY = ParagraphStyle(size=Pt(13), space_before=Pt(3))
+NUMBER_CIRCLE_STYLE = CardStyle(MSO_SHAPE.OVAL, fill=COLOR_SECONDARY)
+NUMBER_CIRCLE_TEXT = ParagraphStyle(size=Pt(24), bold=True, color=RGBColor(255, 255, 255), alignment=PP_ALIGN.CENTER)
 
-    # 元のスライド（1-25）
-    add_title_slide(prs)
-    add_agenda_slide(prs)
-    add_executive_summary_slide(prs)
-    add_section_divider(prs, "現状分析")
-    add_financial_analysis_compact(prs)
-    add_issues_summary(prs)
-
-    add_section_divider(prs, "提案ソリューション")
-    add_solution_overview(prs)
-    add_solutions_detail(prs)  # 3ソリューション を1スライドに
-    add_roi_summary(prs)
-    add_financial_simulation(prs)
-
-    add_section_divider(prs, "実行計画")
-    add_roadmap_overview(prs)
-    add_expected_benefits(prs)
+# ソリューション別の投資額・年間効果（合計・投資回収年数はここから計算）
+SOLUTIONS = [
+    ("① 高度在庫管理", "220-280百万円", "330-470百万円"),
+    ("② 統合物流PF", "350-430百万円", "330-450百万円"),
+    ("③ 物流自動化", "400-550百万円", "210-320百万円"),
+]
+INVESTMENT = RangeArray.parse([s[1] for s in SOLUTIONS])
+ANNUAL_EFFECT = RangeArray.parse([s[2] for s in SOLUTIONS])
 
-    # 協業プロジェクト計画（新規）
-    add_section_divider(prs, "協業プロジェクト計画")
-    add_collaboration_approach(prs)
-    add_10_themes_visual(prs)
-    add_project_timeline_visual(prs)
-    add_standard_process_visual(prs)
-    add_project_structure_visual(prs)
-    add_cumulative_effects_visual(prs)
-    add_success_factors_visual(prs)
-    add_next_steps_visual(prs)
+# 月次キャッシュタイムライン（標準の段階投資案）
+CASH_PLAN = standard_plan()
+PAYBACK = format_break_even(CASH_PLAN["break_even"][0])
 
-    add_thank_you_slide(prs)
+# 流動比率・CCC（運転資金シミュレーションの現状と3年後の保守〜楽観。元帳の入手までは債権・債務が仮定値）
+LIQUIDITY = liquidity_summary()
+CURRENT_RATIO = format_ratio(LIQUIDITY["current_ratio"])
+TARGET_RATIO = format_ratio_range(*LIQUIDITY["target_ratio"])
+RATIO_CHANGE = format_point_change(LIQUIDITY["current_ratio"], *LIQUIDITY["target_ratio"])
 
-    return prs
+# 営業CF・CFマージン・物流コスト・経常利益率（財務モデルの保守〜楽観）
+FINANCIAL = build_default_model(ranges=True).values()
 
+# 生産性向上の想定（下限, 上限）：テーマ5（倉庫改善）と③物流自動化。ウェーブ・バッチ計画の試算と突き合わせる
+WAREHOUSE_UPLIFT = (0.20, 0.30)
+AUTOMATION_UPLIFT = (0.30, 0.40)
 
-def add_section_divider(prs, title_text):
-    """セクション区切りスライド"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
+# 総利益率（ブリッジの定義から。FEFOの効果は在庫ロス削減の内数のため見出しは同じ）
+GROSS_NOW, GROSS_TARGET, GROSS_CHANGE = format_headline(GROSS_MARGIN)
 
-    # 背景グラデーション風（2色の矩形を重ねる）
-    shape1 = slide.shapes.add_shape(
-        MSO_SHAPE.RECTANGLE,
-        Inches(0), Inches(0), Inches(10), Inches(7.5)
-    )
-    shape1.fill.solid()
-    shape1.fill.fore_color.rgb = COLOR_PRIMARY
-    shape1.line.fill.background()
 
-    # タイトル
-    txBox = slide.shapes.add_textbox(Inches(1), Inches(3), Inches(8), Inches(1.5))
-    tf = txBox.text_frame
-    tf.text = title_text
-    p = tf.paragraphs[0]
-    p.alignment = PP_ALIGN.CENTER
-    p.font.size = Pt(56)
-    p.font.bold = True
-    p.font.color.rgb = RGBColor(255, 255, 255)
+# 以下の試算はモジュールの読み込み時ではなく使用するスライドの構築時に計算する
+# （並列構築ではワーカーごとに読み込み直すため、該当スライドを担当するワーカーだけが1回計算する）
 
-    return slide
+@lru_cache(maxsize=None)
+def network_estimate():
+    """拠点網の再編（需要・輸送単価のシナリオ別に統廃合・新設を評価した現状維持との費用差）
 
+    合成データによる試算で、②の配送コスト削減と重なるため②の投資額・年間効果には加えない
+    """
+    return estimate_network()
 
-def add_title_slide(prs):
-    """タイトルスライド（改善版）"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
 
-    # 背景装飾
-    shape = slide.shapes.add_shape(
-        MSO_SHAPE.RECTANGLE,
-        Inches(0), Inches(2), Inches(10), Inches(3.5)
-    )
-    shape.fill.solid()
-    shape.fill.fore_color.rgb = RGBColor(240, 245, 250)
-    shape.line.fill.background()
+@lru_cache(maxsize=None)
+def inventory_accuracy():
+    """在庫精度（循環棚卸と帳簿在庫の突合。実データの取り込みまでは合成データで試算し、スライドにも試算と明記）"""
+    return summarize(reconcile(*sample_inventory()))
 
-    # タイトル
-    txBox = slide.shapes.add_textbox(Inches(1), Inches(2.5), Inches(8), Inches(1.2))
-    tf = txBox.text_frame
-    tf.text = "物流システムソリューション提案書"
-    p = tf.paragraphs[0]
-    p.alignment = PP_ALIGN.CENTER
-    p.font.size = Pt(40)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
 
-    # サブタイトル
-    txBox = slide.shapes.add_textbox(Inches(1), Inches(3.9), Inches(8), Inches(0.7))
-    tf = txBox.text_frame
-    tf.text = "株式会社ヤマエ久野 御中"
-    p = tf.paragraphs[0]
-    p.alignment = PP_ALIGN.CENTER
-    p.font.size = Pt(28)
-    p.font.color.rgb = COLOR_TEXT
+@lru_cache(maxsize=None)
+def zone_capacity():
+    """温度帯別の保管・荷役能力（拠点×温度帯×156週、保守〜楽観の物量成長）
+
+    拠点の能力・物量は合成データによる試算。自動倉庫・荷役自動化の投資額は③の投資額に含まない追加分
+    """
+    return summarize_capacity(plan_capacity(sample_sites()))
+
+
+@lru_cache(maxsize=None)
+def wave_plan():
+    """出荷ウェーブ・バッチ計画（1日分の注文明細で現状の到着順バッチと比較）"""
+    return estimate_waves()
+
+
+def add_section_divider(prs, title_text):
+    """セクション区切りスライド（背景・文字色はレイアウトで定義）"""
+    return add_themed_slide(prs, LAYOUT_SECTION, title_text)
 
-    # 日付
-    txBox = slide.shapes.add_textbox(Inches(1), Inches(6.2), Inches(8), Inches(0.4))
-    tf = txBox.text_frame
-    tf.text = "2026年2月"
-    p = tf.paragraphs[0]
-    p.alignment = PP_ALIGN.CENTER
-    p.font.size = Pt(18)
-    p.font.color.rgb = RGBColor(127, 140, 141)
 
+def add_title_slide(prs):
+    """タイトルスライド（改善版、帯・文字書式はレイアウトで定義）"""
+    slide = add_themed_slide(prs, LAYOUT_TITLE, "物流システムソリューション提案書")
+    slide.placeholders[1].text = "株式会社ヤマエ久野 御中"
+    slide.placeholders[DATE_IDX].text = "2026年2月"
     return slide
 
 
@@ -193,16 +194,7 @@ def add_agenda_slide(prs):
 
 def add_executive_summary_slide(prs):
     """エグゼクティブサマリー（改善版）"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    # タイトル
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
-    tf = txBox.text_frame
-    tf.text = "エグゼクティブサマリー"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(32)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "エグゼクティブサマリー")
 
     # 経営課題ボックス
     left = Inches(0.5)
@@ -230,7 +222,7 @@ def add_executive_summary_slide(prs):
     issues = [
         "• CFマージン -3.12%",
         "• 経常利益率 1.73%（低い）",
-        "• 流動比率 91.06%（低い）",
+        f"• 流動比率 {CURRENT_RATIO}（低い）",
         "• 在庫14,000百万円（過剰）",
         "• 物流コスト推定35,000百万円",
     ]
@@ -305,13 +297,16 @@ def add_executive_summary_slide(prs):
     # 3列で表示
     roi_text = [
         "【投資額】             【年間効果】           【投資回収期間】",
-        "970-1,260百万円      870-1,240百万円       約1.1-1.4年",
+        f"{INVESTMENT.sum().format()}      {ANNUAL_EFFECT.sum().format()}       "
+        f"約{INVESTMENT.sum().payback(ANNUAL_EFFECT.sum()).format(decimals=1)}",
         "",
         "【財務改善目標】",
-        "• 営業CFマージン：-3.12% → 3.5-4.0%（+6.5-7.0pt）",
-        "• 経常利益率：1.73% → 3.0-3.5%（+1.3-1.8pt）",
-        "• 総利益率：7.38% → 9.0-10.0%（+1.6-2.6pt）",
-        "• 流動比率：91.06% → 120-130%（+29-39pt）",
+        f"• 営業CFマージン：{format_margin(FINANCIAL['CFマージン'])} → {format_margin(FINANCIAL['改善後CFマージン'])}"
+        f"（{format_margin_change(FINANCIAL['CFマージン'], FINANCIAL['改善後CFマージン'])}）",
+        f"• 経常利益率：{format_margin(FINANCIAL['経常利益率'])} → {format_margin(FINANCIAL['改善後経常利益率'])}"
+        f"（{format_margin_change(FINANCIAL['経常利益率'], FINANCIAL['改善後経常利益率'])}）",
+        f"• 総利益率：{GROSS_NOW} → {GROSS_TARGET}（{GROSS_CHANGE}）",
+        f"• 流動比率：{CURRENT_RATIO} → {TARGET_RATIO}（{RATIO_CHANGE}）",
     ]
 
     for text in roi_text:
@@ -330,16 +325,7 @@ def add_executive_summary_slide(prs):
 
 def add_financial_analysis_compact(prs):
     """財務分析（コンパクト版）"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    # タイトル
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
-    tf = txBox.text_frame
-    tf.text = "現状分析：財務指標から見た経営課題"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(30)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "現状分析：財務指標から見た経営課題", Pt(30))
 
     # 3つのボックスを横に配置
     boxes_data = [
@@ -362,7 +348,7 @@ def add_financial_analysis_compact(prs):
             "title": "収益性の低迷",
             "items": [
                 "総利益率",
-                "7.38%（低い）",
+                f"{GROSS_NOW}（低い）",
                 "",
                 "経常利益率",
                 "1.73%（低い）",
@@ -377,7 +363,7 @@ def add_financial_analysis_compact(prs):
             "title": "財務健全性の問題",
             "items": [
                 "流動比率",
-                "91.06%（低い）",
+                f"{CURRENT_RATIO}（低い）",
                 "",
                 "在庫",
                 "14,000百万円",
@@ -438,23 +424,14 @@ def add_financial_analysis_compact(prs):
 
 def add_issues_summary(prs):
     """課題サマリー"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    # タイトル
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
-    tf = txBox.text_frame
-    tf.text = "根本原因：4つの物流課題"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(32)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "根本原因：4つの物流課題")
 
     # 4つの課題を2x2レイアウト
     issues = [
         {
             "num": "1",
             "title": "在庫管理の非効率",
-            "detail": "在庫14,000百万円、回転日数+7-10日、予測システム未導入",
+            "detail": f"在庫14,000百万円、{format_accuracy(inventory_accuracy(), basis='合成データ試算')}、回転日数+7-10日、予測システム未導入",
             "effect": "運転資金圧迫、CF悪化"
         },
         {
@@ -472,23 +449,16 @@ def add_issues_summary(prs):
         {
             "num": "4",
             "title": "収益性・財務健全性",
-            "detail": "総利益率7.38%、流動比率91.06%、調達コスト高",
+            "detail": f"総利益率{GROSS_NOW}、流動比率{CURRENT_RATIO}、調達コスト高",
             "effect": "競争力低下、財務リスク"
         }
     ]
 
-    positions = [
-        (Inches(0.5), Inches(1.2)),
-        (Inches(5.2), Inches(1.2)),
-        (Inches(0.5), Inches(4.2)),
-        (Inches(5.2), Inches(4.2))
-    ]
-
-    width = Inches(4.3)
-    height = Inches(2.6)
+    layout = grid(2, 2, gap=Inches(0.4))
+    rects = solve_layout(layout, Inches(0.5), Inches(1.2), Inches(9), Inches(5.6))
 
-    for i, (issue, pos) in enumerate(zip(issues, positions)):
-        shape = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, pos[0], pos[1], width, height)
+    for i, (issue, rect) in enumerate(zip(issues, rects)):
+        shape = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, *rect)
         shape.fill.solid()
         shape.fill.fore_color.rgb = COLOR_BG_LIGHT
         shape.line.color.rgb = COLOR_SECONDARY
@@ -526,16 +496,7 @@ def add_issues_summary(prs):
 
 def add_solution_overview(prs):
     """ソリューション全体像"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    # タイトル
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
-    tf = txBox.text_frame
-    tf.text = "提案ソリューション全体像"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(32)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "提案ソリューション全体像")
 
     # リード文
     txBox = slide.shapes.add_textbox(Inches(0.8), Inches(1.0), Inches(8.4), Inches(0.5))
@@ -562,9 +523,9 @@ def add_solution_overview(prs):
             "num": "②",
             "title": "統合物流プラットフォーム",
             "subtitle": "TMS × SCM × リアルタイム可視化",
-            "investment": "350-430百万円",
-            "effect": "330-450百万円/年",
-            "roi": "0.8-1.3年",
+            "investment": SOLUTIONS[1][1],
+            "effect": f"{SOLUTIONS[1][2]}/年",
+            "roi": INVESTMENT[1].payback(ANNUAL_EFFECT[1]).format(decimals=1),
             "target": "物流コスト削減・経常利益率改善"
         },
         {
@@ -626,16 +587,7 @@ def add_solution_overview(prs):
 
 def add_solutions_detail(prs):
     """3ソリューション詳細（1スライドに統合）"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    # タイトル
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.4))
-    tf = txBox.text_frame
-    tf.text = "3つのソリューション詳細"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(28)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "3つのソリューション詳細", Pt(28))
 
     solutions = [
         {
@@ -647,14 +599,17 @@ def add_solutions_detail(prs):
         {
             "num": "②",
             "title": "統合物流PF",
-            "functions": "TMS配送最適化、SCM可視化、IoT追跡",
+            "functions": f"TMS配送最適化、SCM可視化、拠点網最適化（試算：{format_network(network_estimate())}）",
             "effects": "配送コスト15-20%削減、積載率80-85%"
         },
         {
             "num": "③",
             "title": "物流自動化",
             "functions": "次世代WMS、AGV、デジタルピッキング",
-            "effects": "生産性30-40%向上、人件費20-30%削減"
+            "effects": f"生産性30-40%向上（ウェーブ・バッチ計画の試算{format_claim_check(wave_plan(), AUTOMATION_UPLIFT)}）、"
+                       "人件費20-30%削減",
+            "capacity": f"{format_zone_shortage(zone_capacity())}（3年内）→ 自動倉庫・荷役自動化 "
+                        f"{format_investment(zone_capacity())}（③の投資{SOLUTIONS[2][1]}とは別枠）",
         }
     ]
 
@@ -693,6 +648,12 @@ def add_solutions_detail(prs):
         p.font.color.rgb = RGBColor(39, 174, 96)
         p.space_before = Pt(5)
 
+        if "capacity" in sol:
+            p = tf.add_paragraph()
+            p.text = f"温度帯別能力（合成データ試算）：{sol['capacity']}"
+            p.font.size = Pt(13)
+            p.space_before = Pt(3)
+
         top += Inches(2.05)
 
     return slide
@@ -700,25 +661,22 @@ def add_solutions_detail(prs):
 
 def add_roi_summary(prs):
     """投資対効果サマリー"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    # タイトル
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
-    tf = txBox.text_frame
-    tf.text = "全体投資対効果サマリー"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(32)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "全体投資対効果サマリー")
 
     # テーブル風の表示
     headers = ["ソリューション", "初期投資", "年間効果", "ROI"]
+    # 合計・ROI（投資回収年数）はレンジ演算で算出
+    payback = INVESTMENT.payback(ANNUAL_EFFECT).format(decimals=1)
     rows = [
-        ["① 高度在庫管理", "220-280百万円", "330-470百万円", "0.5-0.8年"],
-        ["② 統合物流PF", "350-430百万円", "330-450百万円", "0.8-1.3年"],
-        ["③ 物流自動化", "400-550百万円", "210-320百万円", "1.3-2.6年"],
+        [name, investment, effect, roi]
+        for (name, investment, effect), roi in zip(SOLUTIONS, payback)
+    ]
+    total = [
+        "合計",
+        INVESTMENT.sum().format(),
+        ANNUAL_EFFECT.sum().format(),
+        INVESTMENT.sum().payback(ANNUAL_EFFECT.sum()).format(decimals=1),
     ]
-    total = ["合計", "970-1,260百万円", "870-1,240百万円", "1.1-1.4年"]
 
     # ヘッダー
     left_start = Inches(0.8)
@@ -802,7 +760,7 @@ def add_roi_summary(prs):
     p.space_after = Pt(10)
 
     points = [
-        "✓ Year 2後半には投資回収完了",
+        f"✓ 累積CF回収：{PAYBACK}",
         "✓ Year 3以降はフルベネフィット創出",
         "✓ 早期のクイックウィンで投資の正当性を実証",
         "✓ 段階的投資でリスクを最小化",
@@ -820,28 +778,25 @@ def add_roi_summary(prs):
 
 def add_financial_simulation(prs):
     """財務改善シミュレーション"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    # タイトル
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
-    tf = txBox.text_frame
-    tf.text = "財務指標改善シミュレーション（3年後）"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(30)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "財務指標改善シミュレーション（3年後）", Pt(30))
 
-    # テーブル
+    # テーブル（営業CF・CFマージン・経常利益率・物流コストは財務モデルから）
     headers = ["財務指標", "現状", "改善後", "改善幅"]
     data = [
-        ["営業CF", "4,653百万円", "18,000-20,000", "+13,000-15,000"],
-        ["CFマージン", "-3.12%", "3.5-4.0%", "+6.5-7.0pt"],
+        ["営業CF", f"{format_amount(FINANCIAL['営業CF'])}百万円", format_amount(FINANCIAL['改善後営業CF']),
+         format_amount(FINANCIAL['改善後営業CF'] - FINANCIAL['営業CF'], signed=True)],
+        ["CFマージン", format_margin(FINANCIAL['CFマージン']), format_margin(FINANCIAL['改善後CFマージン']),
+         format_margin_change(FINANCIAL['CFマージン'], FINANCIAL['改善後CFマージン'])],
         ["", "", "", ""],  # 空行
-        ["総利益率", "7.38%", "9.0-10.0%", "+1.6-2.6pt"],
-        ["経常利益率", "1.73%", "3.0-3.5%", "+1.3-1.8pt"],
-        ["流動比率", "91.06%", "120-130%", "+29-39pt"],
+        ["総利益率", GROSS_NOW, GROSS_TARGET, GROSS_CHANGE],
+        ["経常利益率", format_margin(FINANCIAL['経常利益率']), format_margin(FINANCIAL['改善後経常利益率']),
+         format_margin_change(FINANCIAL['経常利益率'], FINANCIAL['改善後経常利益率'])],
+        ["流動比率", CURRENT_RATIO, TARGET_RATIO, RATIO_CHANGE],
+        ["CCC（仮定）" if "ccc" in LIQUIDITY["assumed"] else "CCC", format_days(LIQUIDITY["ccc"]), format_days(*LIQUIDITY["target_ccc"]),
+         format_days_change(LIQUIDITY["ccc"], *LIQUIDITY["target_ccc"])],
         ["", "", "", ""],  # 空行
-        ["物流コスト", "35,000百万円", "31,000-32,000", "△3,000-4,000"],
+        ["物流コスト", f"{format_amount(FINANCIAL['物流コスト'])}百万円", format_amount(FINANCIAL['改善後物流コスト']),
+         format_amount(-FINANCIAL['物流コスト削減額'], signed=True)],
     ]
 
     left_start = Inches(1.2)
@@ -903,16 +858,7 @@ def add_financial_simulation(prs):
 
 def add_roadmap_overview(prs):
     """実行ロードマップ概要"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    # タイトル
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
-    tf = txBox.text_frame
-    tf.text = "実行ロードマップ（36ヶ月）"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(32)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "実行ロードマップ（36ヶ月）")
 
     phases = [
         {
@@ -995,34 +941,25 @@ def add_roadmap_overview(prs):
 
 def add_expected_benefits(prs):
     """期待効果まとめ"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    # タイトル
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
-    tf = txBox.text_frame
-    tf.text = "期待効果まとめ"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(36)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "期待効果まとめ", Pt(36))
 
     # 3つのカテゴリー
     categories = [
         {
             "title": "財務指標の改善",
             "items": [
-                "CFマージン：-3.12% → 3.5-4.0%",
-                "経常利益率：1.73% → 3.0-3.5%",
-                "総利益率：7.38% → 9.0-10.0%",
-                "流動比率：91.06% → 120-130%",
+                f"CFマージン：{format_margin(FINANCIAL['CFマージン'])} → {format_margin(FINANCIAL['改善後CFマージン'])}",
+                f"経常利益率：{format_margin(FINANCIAL['経常利益率'])} → {format_margin(FINANCIAL['改善後経常利益率'])}",
+                f"総利益率：{GROSS_NOW} → {GROSS_TARGET}",
+                f"流動比率：{CURRENT_RATIO} → {TARGET_RATIO}",
             ],
             "color": RGBColor(240, 255, 240)
         },
         {
             "title": "業務改善効果",
             "items": [
-                "在庫削減：1,000-2,000百万円",
-                "物流コスト削減：3,000-4,000百万円/年",
+                f"在庫削減：{format_amount(FINANCIAL['在庫削減額'])}百万円",
+                f"物流コスト削減：{format_amount(FINANCIAL['物流コスト削減額'])}百万円/年",
                 "運転資金解放：5-7億円",
                 "倉庫生産性向上：30-40%",
             ],
@@ -1079,16 +1016,7 @@ def add_expected_benefits(prs):
 
 def add_collaboration_approach(prs):
     """協業アプローチ（改善版）"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    # タイトル
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
-    tf = txBox.text_frame
-    tf.text = "協業アプローチ：テーマ別段階的実現"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(30)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "協業アプローチ：テーマ別段階的実現", Pt(30))
 
     # リード文
     shape = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, Inches(0.5), Inches(0.95), Inches(9), Inches(0.65))
@@ -1190,15 +1118,7 @@ def add_collaboration_approach(prs):
 def add_10_themes_visual(prs):
     """10テーマビジュアル（2スライドに分割）"""
     # スライド1：テーマ1-5
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
-    tf = txBox.text_frame
-    tf.text = "10の重点テーマ（1/2）"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(30)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "10の重点テーマ（1/2）", Pt(30))
 
     themes_1 = [
         ("1", "在庫可視化", "滞留在庫特定、即時削減200-500百万円"),
@@ -1208,43 +1128,18 @@ def add_10_themes_visual(prs):
         ("5", "倉庫改善", "生産性20-30%向上、人件費50-100百万円削減"),
     ]
 
-    top = Inches(1.1)
-    for num, title, effect in themes_1:
-        shape = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, Inches(0.5), top, Inches(9), Inches(1.15))
-        shape.fill.solid()
-        shape.fill.fore_color.rgb = COLOR_BG_LIGHT
-        shape.line.color.rgb = COLOR_PRIMARY
-        shape.line.width = Pt(1.5)
-
-        tf = shape.text_frame
-        tf.word_wrap = True
-        tf.margin_left = Inches(0.15)
-        tf.margin_top = Inches(0.08)
-
-        p = tf.paragraphs[0]
-        p.text = f"テーマ{num}：{title}"
-        p.font.size = Pt(16)
-        p.font.bold = True
-        p.font.color.rgb = COLOR_SECONDARY
-        p.space_after = Pt(6)
-
-        p = tf.add_paragraph()
-        p.text = f"効果：{effect}"
-        p.font.size = Pt(13)
-        p.space_before = Pt(3)
-
-        top += Inches(1.25)
+    # テーマ5はウェーブ・バッチ計画の試算を根拠として添え、効果欄の想定（生産性20-30%）と突き合わせる
+    evidence = {"5": format_uplift(wave_plan(), WAREHOUSE_UPLIFT)}
+    add_cards(slide, [
+        (CARD_STYLE, (Inches(0.5), Inches(1.1 + i * 1.25), Inches(9), Inches(1.15)), [
+            (f"テーマ{num}：{title}", THEME_TITLE),
+            (f"効果：{effect}", CARD_BODY),
+        ] + ([(f"根拠：{evidence[num]}", CARD_BODY)] if num in evidence else []))
+        for i, (num, title, effect) in enumerate(themes_1)
+    ])
 
     # スライド2：テーマ6-10
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
-    tf = txBox.text_frame
-    tf.text = "10の重点テーマ（2/2）"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(30)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "10の重点テーマ（2/2）", Pt(30))
 
     themes_2 = [
         ("6", "物流コスト可視化", "コスト構造把握、改善ターゲット特定"),
@@ -1254,47 +1149,20 @@ def add_10_themes_visual(prs):
         ("10", "KPIダッシュボード", "経営可視化、データドリブン経営実現"),
     ]
 
-    top = Inches(1.1)
-    for num, title, effect in themes_2:
-        shape = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, Inches(0.5), top, Inches(9), Inches(1.15))
-        shape.fill.solid()
-        shape.fill.fore_color.rgb = COLOR_BG_LIGHT
-        shape.line.color.rgb = COLOR_PRIMARY
-        shape.line.width = Pt(1.5)
-
-        tf = shape.text_frame
-        tf.word_wrap = True
-        tf.margin_left = Inches(0.15)
-        tf.margin_top = Inches(0.08)
-
-        p = tf.paragraphs[0]
-        p.text = f"テーマ{num}：{title}"
-        p.font.size = Pt(16)
-        p.font.bold = True
-        p.font.color.rgb = COLOR_SECONDARY
-        p.space_after = Pt(6)
-
-        p = tf.add_paragraph()
-        p.text = f"効果：{effect}"
-        p.font.size = Pt(13)
-        p.space_before = Pt(3)
-
-        top += Inches(1.25)
+    add_cards(slide, [
+        (CARD_STYLE, (Inches(0.5), Inches(1.1 + i * 1.25), Inches(9), Inches(1.15)), [
+            (f"テーマ{num}：{title}", THEME_TITLE),
+            (f"効果：{effect}", CARD_BODY),
+        ])
+        for i, (num, title, effect) in enumerate(themes_2)
+    ])
 
     return slide
 
 
 def add_project_timeline_visual(prs):
     """プロジェクトタイムライン（視覚的）"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
-    tf = txBox.text_frame
-    tf.text = "プロジェクト全体タイムライン（36ヶ月）"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(28)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "プロジェクト全体タイムライン（36ヶ月）", Pt(28))
 
     phases = [
         {
@@ -1357,17 +1225,93 @@ def add_project_timeline_visual(prs):
     return slide
 
 
-def add_standard_process_visual(prs):
-    """標準プロセス（フロー形式）"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
+def add_project_gantt(prs):
+    """プロジェクト工程表（クリティカルパス・要員平準化後のガントチャート）"""
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "プロジェクト工程表（要員平準化後）", Pt(28))
+
+    result = plan()
+    rows = result["rows"]
+    months = max(result["makespan"], 36)
+
+    label_left = Inches(0.3)
+    label_width = Inches(2.9)
+    chart_left = Inches(3.3)
+    chart_width = Inches(6.3)
+    top = Inches(1.05)
+    header_height = Inches(0.3)
+    row_height = Inches(5.5) / len(rows)
+    month_width = chart_width / months
+
+    # フェーズ帯（ヘッダー）
+    phases = [
+        ("Phase 1", 0, 6, RGBColor(255, 235, 235)),
+        ("Phase 2", 6, 18, RGBColor(255, 248, 220)),
+        ("Phase 3", 18, months, RGBColor(235, 255, 235)),
+    ]
+    for name, start, end, color in phases:
+        shape = slide.shapes.add_shape(
+            MSO_SHAPE.RECTANGLE,
+            int(chart_left + month_width * start), top,
+            int(month_width * (end - start)), header_height,
+        )
+        shape.fill.solid()
+        shape.fill.fore_color.rgb = color
+        shape.line.color.rgb = RGBColor(200, 200, 200)
+        p = shape.text_frame.paragraphs[0]
+        # 狭い帯はフェーズ名のみ
+        p.text = name if end - start < 12 else f"{name}（Month {start}-{end}）"
+        p.font.size = Pt(10)
+        p.font.bold = True
+        p.font.color.rgb = COLOR_TEXT
+        p.alignment = PP_ALIGN.CENTER
+
+    # 活動ごとのバー
+    top += header_height + Inches(0.05)
+    for row in rows:
+        txBox = slide.shapes.add_textbox(label_left, int(top), label_width, int(row_height))
+        tf = txBox.text_frame
+        tf.margin_top = tf.margin_bottom = 0
+        p = tf.paragraphs[0]
+        p.text = row["name"]
+        p.font.size = Pt(9)
+        p.font.bold = row["critical"]
+        p.font.color.rgb = COLOR_SECONDARY if row["critical"] else COLOR_TEXT
+
+        shape = slide.shapes.add_shape(
+            MSO_SHAPE.RECTANGLE,
+            int(chart_left + month_width * row["start"]), int(top + row_height * 0.15),
+            int(month_width * (row["finish"] - row["start"])), int(row_height * 0.7),
+        )
+        shape.fill.solid()
+        shape.fill.fore_color.rgb = COLOR_SECONDARY if row["critical"] else COLOR_ACCENT
+        shape.line.fill.background()
+        tf = shape.text_frame
+        tf.margin_top = tf.margin_bottom = 0
+        p = tf.paragraphs[0]
+        p.text = format_period(row["start"], row["finish"]).replace("Month ", "")
+        p.font.size = Pt(8)
+        p.font.color.rgb = RGBColor(255, 255, 255)
+        p.alignment = PP_ALIGN.CENTER
+
+        top += row_height
 
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
+    # 凡例
+    txBox = slide.shapes.add_textbox(Inches(0.3), Inches(6.95), Inches(9.3), Inches(0.4))
     tf = txBox.text_frame
-    tf.text = "標準活動プロセス（8ステップ）"
     p = tf.paragraphs[0]
-    p.font.size = Pt(30)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    p.text = (
+        f"赤：クリティカルパス（{len(result['critical'])}活動）　"
+        f"全体期間：{result['makespan']}ヶ月（要員制約なし：{result['unconstrained_makespan']:.0f}ヶ月）"
+    )
+    p.font.size = Pt(11)
+    p.font.color.rgb = COLOR_TEXT
+
+    return slide
+
+
+def add_standard_process_visual(prs):
+    """標準プロセス（フロー形式）"""
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "標準活動プロセス（8ステップ）", Pt(30))
 
     steps = [
         "1. キックオフ・計画",
@@ -1381,23 +1325,12 @@ def add_standard_process_visual(prs):
     ]
 
     # 4x2グリッド
-    positions = [
-        (Inches(0.6), Inches(1.2)),
-        (Inches(2.75), Inches(1.2)),
-        (Inches(4.9), Inches(1.2)),
-        (Inches(7.05), Inches(1.2)),
-        (Inches(0.6), Inches(4.0)),
-        (Inches(2.75), Inches(4.0)),
-        (Inches(4.9), Inches(4.0)),
-        (Inches(7.05), Inches(4.0))
-    ]
-
-    width = Inches(1.9)
-    height = Inches(2.5)
+    layout = grid(2, 4, gap=Inches(0.25), row_gap=Inches(0.3))
+    rects = solve_layout(layout, Inches(0.6), Inches(1.2), Inches(8.35), Inches(5.3))
 
-    for i, (step, pos) in enumerate(zip(steps, positions)):
+    for i, (step, rect) in enumerate(zip(steps, rects)):
         # ボックス
-        shape = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, pos[0], pos[1], width, height)
+        shape = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, *rect)
         shape.fill.solid()
         if "【" in step:
             shape.fill.fore_color.rgb = RGBColor(255, 240, 240)
@@ -1427,7 +1360,7 @@ def add_standard_process_visual(prs):
         if i < 3 or (i >= 4 and i < 7):
             arrow = slide.shapes.add_shape(
                 MSO_SHAPE.RIGHT_ARROW,
-                pos[0] + width, pos[1] + height/2 - Inches(0.15),
+                rect.left + rect.width, rect.top + rect.height/2 - Inches(0.15),
                 Inches(0.25), Inches(0.3)
             )
             arrow.fill.solid()
@@ -1439,15 +1372,7 @@ def add_standard_process_visual(prs):
 
 def add_project_structure_visual(prs):
     """プロジェクト推進体制"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
-    tf = txBox.text_frame
-    tf.text = "プロジェクト推進体制"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(32)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "プロジェクト推進体制")
 
     # 3階層
     layers = [
@@ -1474,9 +1399,12 @@ def add_project_structure_visual(prs):
         }
     ]
 
-    top = Inches(1.2)
-    for layer in layers:
-        shape = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, Inches(1), top, Inches(8), layer["height"])
+    gap = Inches(0.2)
+    layout = stack(*(box(height=layer["height"]) for layer in layers), gap=gap)
+    rects = solve_layout(layout, Inches(1), Inches(1.2), Inches(8), Inches(5.6))
+
+    for layer, rect in zip(layers, rects):
+        shape = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, *rect)
         shape.fill.solid()
         shape.fill.fore_color.rgb = layer["color"]
         shape.line.color.rgb = COLOR_PRIMARY
@@ -1505,7 +1433,7 @@ def add_project_structure_visual(prs):
         p.font.size = Pt(13)
         p.space_before = Pt(4)
 
-        top += layer["height"] + Inches(0.2)
+        top = rect.top + rect.height + gap
 
         # 矢印
         if top < Inches(6.5):
@@ -1523,15 +1451,7 @@ def add_project_structure_visual(prs):
 
 def add_cumulative_effects_visual(prs):
     """累積効果の推移（視覚的）"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
-    tf = txBox.text_frame
-    tf.text = "累積効果の推移"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(32)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "累積効果の推移")
 
     years = [
         {
@@ -1610,17 +1530,70 @@ def add_cumulative_effects_visual(prs):
     return slide
 
 
-def add_success_factors_visual(prs):
-    """成功の5つの鍵"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
+def add_cumulative_effects_chart(prs):
+    """累積効果の推移（レンジバーグラフ）"""
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "累積効果の推移（年間効果レンジ）", Pt(30))
+
+    years = ["Year 1", "Year 2", "Year 3"]
+    lows = [150, 500, 870]
+    highs = [300, 700, 1240]
 
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
+    chart = add_range_bar_chart(
+        slide, (Inches(0.7), Inches(1.2), Inches(8.6), Inches(5.0)),
+        years, lows, highs,
+    )
+    chart.value_axis.has_title = True
+    chart.value_axis.axis_title.text_frame.text = "百万円/年"
+
+    txBox = slide.shapes.add_textbox(Inches(0.7), Inches(6.4), Inches(8.6), Inches(0.5))
     tf = txBox.text_frame
-    tf.text = "成功の5つの鍵"
     p = tf.paragraphs[0]
-    p.font.size = Pt(36)
+    p.text = "Year 3でフル効果 870-1,240百万円/年を達成"
+    p.font.size = Pt(16)
     p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    p.font.color.rgb = COLOR_SECONDARY
+    p.alignment = PP_ALIGN.CENTER
+
+    return slide
+
+
+def add_kpi_trend_chart(prs):
+    """KPI推移目標（折れ線グラフ）"""
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "KPI推移目標")
+
+    months = ["現状", "6ヶ月後", "12ヶ月後", "18ヶ月後", "36ヶ月後"]
+    elapsed = [0, 6, 12, 18, 36]
+
+    # 比率系KPI（%）
+    add_line_chart(
+        slide, (Inches(0.4), Inches(1.1), Inches(4.7), Inches(5.6)),
+        months,
+        {
+            "営業CFマージン": [-0.0312, -0.020, -0.010, 0.015, 0.035],
+            "物流コスト率": [0.073, 0.071, 0.069, 0.065, 0.062],
+            "経常利益率": [0.0173, 0.019, 0.022, 0.027, 0.032],
+        },
+        number_format="0.0%",
+    )
+
+    # 指数・日数系KPI
+    add_line_chart(
+        slide, (Inches(5.1), Inches(1.1), Inches(4.5), Inches(5.6)),
+        months,
+        {
+            "在庫回転日数（日）": [42, 41, 40, 38, 35],
+            "倉庫生産性（指数）": [100, 110, 120, 130, 140],
+            "積載効率（%）": [68, 72, 75, 80, 83],
+            "流動比率（%）": current_ratio_path(LIQUIDITY, elapsed),
+        },
+    )
+
+    return slide
+
+
+def add_success_factors_visual(prs):
+    """成功の5つの鍵"""
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "成功の5つの鍵", Pt(36))
 
     factors = [
         ("1", "経営層の強いコミットメント", "トップダウン推進、明確な目標、リソース確保"),
@@ -1630,65 +1603,27 @@ def add_success_factors_visual(prs):
         ("5", "人材育成とノウハウ移転", "貴社メンバー成長、内製化、自走体制"),
     ]
 
+    cards = []
     top = Inches(1.2)
     for num, title, desc in factors:
         # 番号円
-        circle = slide.shapes.add_shape(
-            MSO_SHAPE.OVAL,
-            Inches(0.7), top + Inches(0.25), Inches(0.5), Inches(0.5)
-        )
-        circle.fill.solid()
-        circle.fill.fore_color.rgb = COLOR_SECONDARY
-        circle.line.fill.background()
-
-        circle_tf = circle.text_frame
-        circle_p = circle_tf.paragraphs[0]
-        circle_p.text = num
-        circle_p.alignment = PP_ALIGN.CENTER
-        circle_p.font.size = Pt(24)
-        circle_p.font.bold = True
-        circle_p.font.color.rgb = RGBColor(255, 255, 255)
-
+        cards.append((NUMBER_CIRCLE_STYLE, (Inches(0.7), top + Inches(0.25), Inches(0.5), Inches(0.5)), [
+            (num, NUMBER_CIRCLE_TEXT),
+        ]))
         # コンテンツボックス
-        shape = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, Inches(1.4), top, Inches(8.1), Inches(1.0))
-        shape.fill.solid()
-        shape.fill.fore_color.rgb = COLOR_BG_LIGHT
-        shape.line.color.rgb = COLOR_PRIMARY
-        shape.line.width = Pt(1.5)
-
-        tf = shape.text_frame
-        tf.word_wrap = True
-        tf.margin_left = Inches(0.15)
-        tf.margin_top = Inches(0.08)
-
-        p = tf.paragraphs[0]
-        p.text = title
-        p.font.size = Pt(16)
-        p.font.bold = True
-        p.font.color.rgb = COLOR_PRIMARY
-        p.space_after = Pt(4)
-
-        p = tf.add_paragraph()
-        p.text = desc
-        p.font.size = Pt(13)
-        p.space_before = Pt(2)
-
+        cards.append((CARD_STYLE, (Inches(1.4), top, Inches(8.1), Inches(1.0)), [
+            (title, CARD_TITLE._replace(space_after=Pt(4))),
+            (desc, CARD_BODY._replace(space_before=Pt(2))),
+        ]))
         top += Inches(1.15)
+    add_cards(slide, cards)
 
     return slide
 
 
 def add_next_steps_visual(prs):
     """次のステップ"""
-    slide = prs.slides.add_slide(prs.slide_layouts[6])
-
-    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
-    tf = txBox.text_frame
-    tf.text = "次のステップ：プロジェクト開始まで"
-    p = tf.paragraphs[0]
-    p.font.size = Pt(28)
-    p.font.bold = True
-    p.font.color.rgb = COLOR_PRIMARY
+    slide = add_themed_slide(prs, LAYOUT_CONTENT, "次のステップ：プロジェクト開始まで", Pt(28))
 
     steps = [
         {
@@ -1726,40 +1661,15 @@ def add_next_steps_visual(prs):
         }
     ]
 
-    top = Inches(1.2)
-    for step in steps:
-        shape = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, Inches(0.5), top, Inches(9), Inches(1.85))
-        shape.fill.solid()
-        shape.fill.fore_color.rgb = COLOR_BG_LIGHT
-        shape.line.color.rgb = COLOR_PRIMARY
-        shape.line.width = Pt(2)
-
-        tf = shape.text_frame
-        tf.word_wrap = True
-        tf.margin_left = Inches(0.2)
-        tf.margin_top = Inches(0.1)
-
-        p = tf.paragraphs[0]
-        p.text = f"{step['num']}：{step['title']}　（{step['period']}）"
-        p.font.size = Pt(16)
-        p.font.bold = True
-        p.font.color.rgb = COLOR_PRIMARY
-        p.space_after = Pt(6)
-
-        for detail in step['details']:
-            p = tf.add_paragraph()
-            p.text = f"• {detail}"
-            p.font.size = Pt(13)
-            p.space_before = Pt(3)
-
-        p = tf.add_paragraph()
-        p.text = f"成果物：{step['output']}"
-        p.font.size = Pt(13)
-        p.font.bold = True
-        p.font.color.rgb = COLOR_SECONDARY
-        p.space_before = Pt(8)
-
-        top += Inches(2.0)
+    step_style = CARD_STYLE._replace(line_width=Pt(2), margin_left=Inches(0.2), margin_top=Inches(0.1))
+    output_style = ParagraphStyle(size=Pt(13), bold=True, color=COLOR_SECONDARY, space_before=Pt(8))
+    cards = []
+    for i, step in enumerate(steps):
+        paragraphs = [(f"{step['num']}：{step['title']}　（{step['period']}）", CARD_TITLE)]
+        paragraphs += [(f"• {detail}", CARD_BODY) for detail in step['details']]
+        paragraphs.append((f"成果物：{step['output']}", output_style))
+        cards.append((step_style, (Inches(0.5), Inches(1.2 + i * 2.0), Inches(9), Inches(1.85)), paragraphs))
+    add_cards(slide, cards)
 
     return slide
 
@@ -1796,8 +1706,66 @@ def add_thank_you_slide(prs):
     return slide
 
 
+# スライド構成（ビルダー関数と引数、宣言順に構築）
+SLIDE_BUILDERS = [
+    # 元のスライド（1-25）
+    (add_title_slide, ()),
+    (add_agenda_slide, ()),
+    (add_executive_summary_slide, ()),
+    (add_section_divider, ("現状分析",)),
+    (add_financial_analysis_compact, ()),
+    (add_issues_summary, ()),
+
+    (add_section_divider, ("提案ソリューション",)),
+    (add_solution_overview, ()),
+    (add_solutions_detail, ()),  # 3ソリューション を1スライドに
+    (add_roi_summary, ()),
+    (add_financial_simulation, ()),
+
+    (add_section_divider, ("実行計画",)),
+    (add_roadmap_overview, ()),
+    (add_expected_benefits, ()),
+
+    # 協業プロジェクト計画（新規）
+    (add_section_divider, ("協業プロジェクト計画",)),
+    (add_collaboration_approach, ()),
+    (add_10_themes_visual, ()),
+    (add_project_timeline_visual, ()),
+    (add_project_gantt, ()),
+    (add_standard_process_visual, ()),
+    (add_project_structure_visual, ()),
+    (add_cumulative_effects_visual, ()),
+    (add_cumulative_effects_chart, ()),
+    (add_kpi_trend_chart, ()),
+    (add_success_factors_visual, ()),
+    (add_next_steps_visual, ()),
+
+    (add_thank_you_slide, ()),
+]
+
+
+def create_presentation(workers=None):
+    """完全版プレゼンテーション作成（workers指定時はスライドをプロセス並列で構築）"""
+    prs = Presentation()
+    prs.slide_width = Inches(10)
+    prs.slide_height = Inches(7.5)
+    apply_theme(prs)
+
+    if workers:
+        return build_parallel(SLIDE_BUILDERS, prs, workers, setup=apply_theme)
+    return build_sequential(SLIDE_BUILDERS, prs)
+
+
 if __name__ == "__main__":
     prs = create_presentation()
+
+    # テキストのはみ出しを計測し、フォント縮小で自動調整（折り返し無しのタイトル等は幅で判定）
+    fit_report = fit_presentation(prs, include_unwrapped=True)
+    for slide_no, results in fit_report.items():
+        for result in results:
+            status = "はみ出し" if result["overflow"] else f"縮小 x{result['scale']}"
+            print(f"  スライド{slide_no} {result['shape']}: {status}")
+
     prs.save("物流ソリューション提案書_ヤマエ久野_完全版v2.pptx")
     print(f"PowerPointプレゼンテーション（改善版）を作成しました")
     print(f"総スライド数: {len(prs.slides)}")
@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+物流データの列指向ローカルストア（拠点×月のパーティション）
+WMS/TMS/ERP の抽出データをデータセットごとに site=<拠点>/month=<年月> のディレクトリへ
+列指向で保存し、分析エンジン・スライド生成からは scan() の1つのAPIで読み出す。
+パーティション名とフラグメント単位の最小/最大値で不要なファイルを読まずに済ませ（述語プッシュダウン）、
+必要な列だけをメモリマップで読む（列の射影）。
+保存形式は pyarrow があれば Parquet、無ければ列ごとの .npy（numpy のメモリマップ）
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+DATA_ROOT = os.environ.get("LOGISTICS_DATA", "data")
+
+# データセットの列定義（列名 → numpy dtype）、月の基準にする日付列、行を一意に特定するキー列
+# 文字列列は幅を固定せず（"U"）、書き込むデータの最大長に合わせる（長いコードを切り詰めない）
+# stock の ship_by は出荷期限（1/3ルールの納品期限、期限管理しない品目は NaT）
+DATASETS = {
+    "stock": {
+        "date": "date",
+        "keys": ("date", "site", "sku", "zone", "location", "lot"),
+        "columns": {
+            "date": "datetime64[D]",
+            "site": "U",
+            "sku": "U",
+            "zone": "U",
+            "location": "U",
+            "lot": "U",
+            "qty": "int64",
+            "unit_cost": "float64",
+            "value": "float64",
+            "ship_by": "datetime64[D]",
+        },
+    },
+    "counts": {
+        "date": "date",
+        "keys": ("date", "site", "location", "sku", "lot"),
+        "columns": {
+            "date": "datetime64[D]",
+            "site": "U",
+            "location": "U",
+            "sku": "U",
+            "lot": "U",
+            "qty": "int64",
+        },
+    },
+    "receipts": {
+        "date": "date",
+        "keys": ("date", "site", "sku", "lot"),
+        "columns": {
+            "date": "datetime64[D]",
+            "site": "U",
+            "sku": "U",
+            "lot": "U",
+            "qty": "int64",
+            "unit_cost": "float64",
+            "ship_by": "datetime64[D]",
+        },
+    },
+    "shipments": {
+        "date": "date",
+        "keys": ("site", "order_id", "sku"),
+        "columns": {
+            "date": "datetime64[D]",
+            "site": "U",
+            "order_id": "U",
+            "customer": "U",
+            "sku": "U",
+            "qty": "int64",
+            "weight_kg": "float64",
+            "cost": "float64",
+        },
+    },
+    "orders": {
+        "date": "date",
+        "keys": ("site", "order_id", "sku"),
+        "columns": {
+            "date": "datetime64[D]",
+            "site": "U",
+            "order_id": "U",
+            "customer": "U",
+            "sku": "U",
+            "qty": "int64",
+            "due_date": "datetime64[D]",
+        },
+    },
+}
+
+MANIFEST = "_manifest.json"
+
+# FNV-1a（64bit）の定数
+FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+FNV_PRIME = np.uint64(0x100000001B3)
+
+# 述語の演算子
+OPERATORS = {
+    "==": np.equal,
+    "!=": np.not_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+
+
+class DataStore:
+    """データセット別・拠点×月パーティションの列指向ストア"""
+
+    def __init__(self, root=DATA_ROOT, format=None):
+        self.root = root
+        self.format = format or ("parquet" if _pyarrow() else "npy")
+        if self.format not in ("parquet", "npy"):
+            raise ValueError(f"未対応の保存形式です: {self.format}")
+        if self.format == "parquet":
+            _require_pyarrow()
+        self.last_scan = {}
+        self._manifests = {}
+
+    # -- 書き込み ----------------------------------------------------------
+
+    def write(self, dataset, columns):
+        """列の辞書（列名 → 配列）を拠点×月に分割してフラグメントを追記し、書き込んだ行数を返す"""
+        schema = _schema(dataset)
+        missing = set(schema["columns"]) - set(columns)
+        if missing:
+            raise KeyError(f"{dataset} に必要な列がありません: {', '.join(sorted(missing))}")
+        data = {name: np.asarray(columns[name]).astype(dtype, copy=False)
+                for name, dtype in schema["columns"].items()}
+        n = len(data["site"])
+        if n == 0:
+            return 0
+
+        # 拠点×月のキーでまとめる（安定ソートで元の行順を保つ）
+        months = data[schema["date"]].astype("datetime64[M]")
+        keys, inverse = np.unique(np.rec.fromarrays([data["site"], months]), return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+
+        manifest = self._manifest(dataset)
+        for k, (site, month) in enumerate(keys):
+            rows = order[bounds[k]:bounds[k + 1]]
+            fragment = {name: values[rows] for name, values in data.items()}
+            manifest["fragments"].append(self._write_fragment(dataset, str(site), str(month), fragment))
+        self._save_manifest(dataset)
+        return n
+
+    def _write_fragment(self, dataset, site, month, fragment):
+        directory = os.path.join(self.root, dataset, f"site={site}", f"month={month}")
+        os.makedirs(directory, exist_ok=True)
+        existing = [int(n[5:10]) for n in os.listdir(directory) if n.startswith("part-")]
+        name = f"part-{max(existing, default=-1) + 1:05d}"
+        path = os.path.join(directory, name)
+
+        if self.format == "parquet":
+            pa, pq = _require_pyarrow()
+            pq.write_table(pa.table({col: values for col, values in fragment.items()}), path + ".parquet")
+        else:
+            os.makedirs(path)
+            for col, values in fragment.items():
+                np.save(os.path.join(path, f"{col}.npy"), values)
+
+        return {
+            "path": os.path.relpath(path, os.path.join(self.root, dataset)),
+            "format": self.format,
+            "site": site,
+            "month": month,
+            "rows": len(fragment["site"]),
+            "stats": {col: _min_max(values) for col, values in fragment.items()},
+        }
+
+    # -- 読み出し ----------------------------------------------------------
+
+    def fragments(self, dataset, sites=None, months=None, where=()):
+        """条件に合い得るフラグメント（パーティション名と最小/最大値で枝刈り）"""
+        schema = _schema(dataset)
+        sites = None if sites is None else {str(s) for s in np.atleast_1d(sites)}
+        months = None if months is None else {str(m) for m in np.atleast_1d(np.asarray(months, dtype="datetime64[M]"))}
+
+        selected = []
+        for fragment in self._manifest(dataset)["fragments"]:
+            if sites is not None and fragment["site"] not in sites:
+                continue
+            if months is not None and fragment["month"] not in months:
+                continue
+            if not all(_may_match(fragment["stats"], schema["columns"], pred) for pred in where):
+                continue
+            selected.append(fragment)
+        return selected
+
+    def iter_batches(self, dataset, columns=None, sites=None, months=None, where=()):
+        """フラグメントごとに条件に合う行の列辞書を返す（メモリ使用量はフラグメント1つ分）"""
+        schema = _schema(dataset)
+        columns = list(columns or schema["columns"])
+        unknown = set(columns) - set(schema["columns"])
+        if unknown:
+            raise KeyError(f"{dataset} に未定義の列です: {', '.join(sorted(unknown))}")
+        # 条件に使う列も読むが、返すのは指定列だけ
+        needed = columns + [c for c, _, _ in where if c not in columns]
+
+        fragments = self.fragments(dataset, sites, months, where)
+        self.last_scan = {
+            "dataset": dataset,
+            "fragments_total": len(self._manifest(dataset)["fragments"]),
+            "fragments_read": len(fragments),
+            "columns": needed,
+            "rows_read": 0,
+        }
+        for fragment in fragments:
+            data = self._read_fragment(dataset, fragment, needed)
+            self.last_scan["rows_read"] += fragment["rows"]
+            if where:
+                mask = np.ones(fragment["rows"], dtype=bool)
+                for pred in where:
+                    mask &= _evaluate(data[pred[0]], schema["columns"][pred[0]], pred)
+                if not mask.any():
+                    continue
+                yield {col: np.asarray(data[col][mask]) for col in columns}
+            else:
+                yield {col: np.asarray(data[col]) for col in columns}
+
+    def scan(self, dataset, columns=None, sites=None, months=None, where=()):
+        """条件に合う行を列辞書で返す
+
+        sites・months はパーティションの絞り込み、where は (列, 演算子, 値) のリストで
+        演算子は ==, !=, <, <=, >, >=, in。
+        """
+        schema = _schema(dataset)
+        columns = list(columns or schema["columns"])
+        batches = list(self.iter_batches(dataset, columns, sites, months, where))
+        if not batches:
+            return {col: np.empty(0, dtype=schema["columns"][col]) for col in columns}
+        return {col: np.concatenate([b[col] for b in batches]) for col in columns}
+
+    def compact(self, dataset, sites=None, months=None, min_fragments=2, drop_keys=None):
+        """パーティション内のフラグメントを1つにまとめ、キーが同じ行は最後に追記された版だけ残す
+
+        drop_keys（キー列の row_hashes）を指定すると、その行を取り除く（別のパーティションへ
+        移った行の旧版の削除）。この場合はフラグメント数に関係なくまとめ、行が残らなければ
+        パーティションを空にする。それ以外で min_fragments 未満のフラグメントしかない
+        パーティションはそのまま。まとめたパーティション数を返す。
+        """
+        schema = _schema(dataset)
+        manifest = self._manifest(dataset)
+        groups = {}
+        for fragment in self.fragments(dataset, sites, months):
+            groups.setdefault((fragment["site"], fragment["month"]), []).append(fragment)
+
+        compacted = 0
+        for (site, month), fragments in groups.items():
+            if drop_keys is None and len(fragments) < min_fragments:
+                continue
+            columns = list(schema["columns"])
+            parts = [self._read_fragment(dataset, f, columns) for f in fragments]
+            data = {col: np.concatenate([np.asarray(p[col]) for p in parts]) for col in columns}
+
+            # 後勝ち：逆順で最初に現れる行を残し、元の並び順に戻す
+            keys = row_hashes(data, schema["keys"])
+            _, last = np.unique(keys[::-1], return_index=True)
+            keep = np.sort(len(keys) - 1 - last)
+            if drop_keys is not None:
+                keep = keep[~np.isin(keys[keep], np.asarray(drop_keys, dtype=np.uint64))]
+            if len(keep) == len(keys) and len(fragments) < min_fragments:
+                continue
+            snapshot = None
+            if len(keep):
+                snapshot = self._write_fragment(dataset, site, month, {col: v[keep] for col, v in data.items()})
+
+            for fragment in fragments:
+                self._remove_fragment(dataset, fragment)
+            manifest["fragments"] = [f for f in manifest["fragments"] if f not in fragments]
+            if snapshot is not None:
+                manifest["fragments"].append(snapshot)
+            compacted += 1
+
+        if compacted:
+            self._save_manifest(dataset)
+        return compacted
+
+    def _remove_fragment(self, dataset, fragment):
+        path = os.path.join(self.root, dataset, fragment["path"])
+        if fragment["format"] == "parquet":
+            os.remove(path + ".parquet")
+        else:
+            for name in os.listdir(path):
+                os.remove(os.path.join(path, name))
+            os.rmdir(path)
+
+    def _read_fragment(self, dataset, fragment, columns):
+        path = os.path.join(self.root, dataset, fragment["path"])
+        dtypes = _schema(dataset)["columns"]
+        if fragment["format"] == "parquet":
+            pa, pq = _require_pyarrow()
+            table = pq.read_table(path + ".parquet", columns=columns, memory_map=True)
+            return {col: table.column(col).to_numpy().astype(dtypes[col], copy=False) for col in columns}
+        return {col: np.load(os.path.join(path, f"{col}.npy"), mmap_mode="r") for col in columns}
+
+    # -- マニフェスト --------------------------------------------------------
+
+    def _manifest(self, dataset):
+        if dataset not in self._manifests:
+            path = os.path.join(self.root, dataset, MANIFEST)
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    self._manifests[dataset] = json.load(f)
+            else:
+                self._manifests[dataset] = {"dataset": dataset, "fragments": []}
+        return self._manifests[dataset]
+
+    def _save_manifest(self, dataset):
+        directory = os.path.join(self.root, dataset)
+        os.makedirs(directory, exist_ok=True)
+        # 書き込み途中で中断しても既存のマニフェストを壊さないよう置き換えで保存
+        tmp = os.path.join(directory, MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._manifests[dataset], f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(directory, MANIFEST))
+
+
+def row_hashes(data, columns):
+    """指定列の値から行ごとの64bitハッシュ（FNV-1a）をベクトル演算で求める
+
+    文字列は文字列長までのコードポイントと長さ、数値・日付は8バイトの値をそのまま1語として混ぜる
+    （文字列の配列幅によらず同じ値は同じハッシュになる）。
+    """
+    h = None
+    for col in columns:
+        values = np.ascontiguousarray(data[col])
+        if h is None:
+            h = np.full(len(values), FNV_OFFSET, dtype=np.uint64)
+        if values.dtype.kind == "U":
+            width = values.dtype.itemsize // 4
+            words = values.view(np.uint32).reshape(len(values), width).astype(np.uint64)
+            lengths = np.char.str_len(values)
+            for j in range(width):
+                inside = lengths > j
+                h[inside] = (h[inside] ^ words[inside, j]) * FNV_PRIME
+            h ^= lengths.astype(np.uint64)
+            h *= FNV_PRIME
+            continue
+        words = values.view(np.uint64).reshape(len(values), 1)
+        h ^= words[:, 0]
+        h *= FNV_PRIME
+    return h
+
+
+def _pyarrow():
+    """pyarrow と pyarrow.parquet（未導入ならNone）"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow, pyarrow.parquet
+
+
+def _require_pyarrow():
+    modules = _pyarrow()
+    if modules is None:
+        raise ImportError("Parquet形式の読み書きには pyarrow が必要です（pip install pyarrow）")
+    return modules
+
+
+def _schema(dataset):
+    if dataset not in DATASETS:
+        raise KeyError(f"未定義のデータセットです: {dataset}")
+    return DATASETS[dataset]
+
+
+def _min_max(values):
+    """列の最小値・最大値（文字列列は numpy の min/max が使えないため整列して求める）
+
+    欠損（NaN・NaT）は除いて求め、値がすべて欠損の列は None とする
+    """
+    if values.dtype.kind == "U":
+        values = np.sort(values)
+        return [str(values[0]), str(values[-1])]
+    if values.dtype.kind == "f":
+        values = values[~np.isnan(values)]
+    elif values.dtype.kind == "M":
+        values = values[~np.isnat(values)]
+    if not len(values):
+        return None
+    return [_json_value(values.min()), _json_value(values.max())]
+
+
+def _json_value(value):
+    """統計値をJSONに保存できる値に変換（日付・文字列は文字列）"""
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    return str(value)
+
+
+def _may_match(stats, dtypes, predicate):
+    """フラグメントの最小/最大値から、条件に合う行があり得るかを判定
+
+    統計値のない列（すべて欠損）は判定できないため読み出し対象に残す。
+    欠損は最小/最大値に含まれないため、欠損があり得る列の != でも除外しない
+    """
+    column, op, value = predicate
+    if stats[column] is None:
+        return True
+    lo, hi = np.array(stats[column], dtype=dtypes[column])
+    if op == "in":
+        values = np.asarray(value, dtype=dtypes[column])
+        return bool(((values >= lo) & (values <= hi)).any())
+    value = np.asarray(value, dtype=dtypes[column])
+    if op == "==":
+        return lo <= value <= hi
+    if op == "!=":
+        return np.dtype(dtypes[column]).kind in "fM" or not (lo == hi == value)
+    if op in ("<", "<="):
+        return OPERATORS[op](lo, value)
+    if op in (">", ">="):
+        return OPERATORS[op](hi, value)
+    raise ValueError(f"未対応の演算子です: {op}")
+
+
+def _evaluate(values, dtype, predicate):
+    """条件を満たす行のマスク"""
+    _, op, value = predicate
+    if op == "in":
+        return np.isin(values, np.asarray(value, dtype=dtype))
+    if op not in OPERATORS:
+        raise ValueError(f"未対応の演算子です: {op}")
+    return OPERATORS[op](values, np.asarray(value, dtype=dtype))
+
+
+# ---------------------------------------------------------------------------
+# 計測（合成の1年分の出荷データで、絞り込み有無の読み出し量と時間を比較）
+# ---------------------------------------------------------------------------
+
+SAMPLE_SITES = [f"S{i:02d}" for i in range(1, 13)]
+
+
+def sample_shipments(days=365, rows_per_day=8000, seed=0, start="2025-04-01"):
+    """合成の出荷明細（拠点12・SKU5,000）"""
+    rng = np.random.default_rng(seed)
+    n = days * rows_per_day
+    date = np.datetime64(start) + np.repeat(np.arange(days), rows_per_day)
+    sku = np.char.add("SKU", rng.integers(0, 5000, n).astype("U5"))
+    qty = rng.integers(1, 50, n)
+    return {
+        "date": date,
+        "site": np.array(SAMPLE_SITES)[rng.integers(0, len(SAMPLE_SITES), n)],
+        "order_id": np.char.add("O", np.arange(n).astype("U10")),
+        "customer": np.char.add("C", rng.integers(0, 800, n).astype("U4")),
+        "sku": sku,
+        "qty": qty,
+        "weight_kg": qty * rng.uniform(0.2, 12.0, n),
+        "cost": qty * rng.uniform(20, 120, n),
+    }
+
+
+def benchmark(days=365, rows_per_day=8000):
+    """全件読み出しと、1拠点×四半期×2列への絞り込みの読み出し量・時間を比較"""
+    with tempfile.TemporaryDirectory() as root:
+        store = DataStore(root)
+        store.write("shipments", sample_shipments(days, rows_per_day))
+
+        results = []
+        for label, kwargs in (
+            ("全件・全列", {}),
+            ("1拠点・四半期・2列", {
+                "columns": ["date", "cost"],
+                "sites": ["S03"],
+                "months": ["2025-10", "2025-11", "2025-12"],
+            }),
+            ("述語のみ（日付範囲＋数量）", {
+                "columns": ["site", "cost"],
+                "where": [("date", ">=", "2026-01-01"), ("qty", ">=", 40)],
+            }),
+        ):
+            start = time.perf_counter()
+            result = store.scan("shipments", **kwargs)
+            elapsed = time.perf_counter() - start
+            rows = len(next(iter(result.values())))
+            results.append({"label": label, "rows": rows, "seconds": elapsed, **store.last_scan})
+        return store.format, results
+
+
+if __name__ == "__main__":
+    fmt, results = benchmark()
+    print(f"保存形式: {fmt}")
+    for r in results:
+        print(f"{r['label']:<16} {r['rows']:>10,}行  {r['seconds'] * 1000:8.1f} ms  "
+              f"フラグメント {r['fragments_read']}/{r['fragments_total']}  列 {','.join(r['columns'])}")
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+複数のpptxからのスライド結合（顧客別付録・標準セクションの組み立て用）
+元ファイルを1つずつ開き、スライドをレイアウト・マスター・画像・グラフなどの関連パーツごと
+結合先のパッケージへ複製する。関係IDは元のまま引き継ぎ、パーツ名は結合先で採番し直す。
+マスター（テーマ・レイアウト込み）と画像・動画は内容のハッシュで重複を排除する
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+from pptx import Presentation
+from pptx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT, RELATIONSHIP_TARGET_MODE as RTM
+from pptx.opc.package import PartFactory, _Relationship
+from pptx.oxml.ns import qn
+from pptx.parts.slide import SlidePart
+from pptx.util import Inches
+
+from deck_parallel import PartnameAllocator, new_presentation
+
+SLIDE_PARTNAME = "/ppt/slides/slide%d.xml"
+
+# 内容のハッシュで共有するパーツの種別
+MEDIA_PREFIXES = ("image/", "video/", "audio/")
+
+# 複製しない関係（ノートはノートマスターとの相互参照を持つため結合先では作り直さない）
+SKIPPED_RELTYPES = (RT.NOTES_SLIDE,)
+
+# マスター・レイアウトのIDの下限（ECMA-376の規定）
+MIN_MASTER_ID = 2147483648
+
+
+class DeckMerger:
+    """結合先プレゼンへ他のpptxのスライドを追加する"""
+
+    def __init__(self, prs=None):
+        self.prs = prs or new_presentation()
+        self.package = self.prs.part.package
+        self._partnames = PartnameAllocator(self.package)
+        self._media = {}
+        self._masters = {}
+        for part in self.package.iter_parts():
+            if part.content_type.startswith(MEDIA_PREFIXES):
+                self._media.setdefault(hashlib.sha1(part.blob).hexdigest(), part)
+        for master in self.prs.slide_masters:
+            self._masters.setdefault(_master_digest(master.part), master.part)
+
+        sldIdLst = self.prs.slides._sldIdLst
+        self._next_slide_id = max([int(sldId.id) for sldId in sldIdLst] + [255]) + 1
+        self.slide_count = 0
+        self.reused_masters = 0
+        self.reused_media = 0
+
+    def merged_slides(self, source, indices=None):
+        """source（パスまたはPresentation）のスライドを複製し、追加したスライドを順に返す
+
+        indices は複製するスライドの番号（0始まり、省略時は全スライド）。
+        複製対象外のスライドへのハイパーリンクは削除する。
+        """
+        src = Presentation(source) if isinstance(source, (str, os.PathLike)) else source
+        slides = list(src.slides)
+        selected = [slides[i] for i in indices] if indices is not None else slides
+
+        # 元パーツ → 結合先パーツ（スライド間リンクの解決のため先に全スライドを作成）
+        created = {}
+        layouts = {}
+        new_slides = []
+        for slide in selected:
+            part = slide.part
+            slide_part = SlidePart.load(
+                self._partnames.next_partname(SLIDE_PARTNAME), CT.PML_SLIDE, self.package, part.blob,
+            )
+            rId = self.prs.part.rels._add_relationship(RT.SLIDE, slide_part)
+            self.prs.slides._sldIdLst._add_sldId(id=self._next_slide_id, rId=rId)
+            self._next_slide_id += 1
+            created[id(part)] = slide_part
+            new_slides.append((part, slide_part))
+
+        for part, slide_part in new_slides:
+            for rId, rel in part.rels.items():
+                if rel.reltype in SKIPPED_RELTYPES:
+                    continue
+                if rel.is_external:
+                    _add_rel(slide_part, rId, rel.reltype, rel.target_ref, external=True)
+                elif rel.reltype == RT.SLIDE_LAYOUT:
+                    layout = rel.target_part
+                    if id(layout) not in layouts:
+                        layouts[id(layout)] = self._layout(layout)
+                    _add_rel(slide_part, rId, rel.reltype, layouts[id(layout)])
+                elif rel.reltype == RT.SLIDE:
+                    target = created.get(id(rel.target_part))
+                    if target is None:
+                        _remove_links(slide_part, rId)
+                    else:
+                        _add_rel(slide_part, rId, rel.reltype, target)
+                else:
+                    _add_rel(slide_part, rId, rel.reltype, self._copy_part(rel.target_part, created))
+            self.slide_count += 1
+            yield slide_part.slide
+
+    def merge(self, source, indices=None):
+        """source のスライドを複製して追加枚数を返す"""
+        return sum(1 for _ in self.merged_slides(source, indices))
+
+    def _layout(self, layout_part):
+        """元のレイアウトに対応する結合先のレイアウト（マスターが未登録なら取り込む）"""
+        master_part = layout_part.part_related_by(RT.SLIDE_MASTER)
+        digest = _master_digest(master_part)
+        target = self._masters.get(digest)
+        if target is None:
+            target = self._import_master(master_part)
+            self._masters[digest] = target
+        else:
+            self.reused_masters += 1
+        # 同じ内容のマスターはレイアウトの並びも同じ
+        index = _layout_parts(master_part).index(layout_part)
+        return _layout_parts(target)[index]
+
+    def _import_master(self, master_part):
+        """マスター（テーマ・レイアウト・画像込み）を複製してプレゼンに登録"""
+        created = {}
+        target = self._copy_part(master_part, created)
+
+        # マスター・レイアウトのIDはプレゼン全体で一意にする
+        next_id = self._next_master_id()
+        for sldLayoutId in target._element.iter(qn("p:sldLayoutId")):
+            sldLayoutId.set("id", str(next_id))
+            next_id += 1
+
+        sldMasterId = self.prs.part._element.get_or_add_sldMasterIdLst()._add_sldMasterId()
+        sldMasterId.set("id", str(next_id))
+        sldMasterId.rId = self.prs.part.rels._add_relationship(RT.SLIDE_MASTER, target)
+        return target
+
+    def _next_master_id(self):
+        ids = [MIN_MASTER_ID - 1]
+        for el in self.prs.part._element.iter(qn("p:sldMasterId")):
+            ids.append(int(el.get("id", MIN_MASTER_ID)))
+        for master in self.prs.slide_masters:
+            ids.extend(int(el.get("id")) for el in master.part._element.iter(qn("p:sldLayoutId")))
+        return max(ids) + 1
+
+    def _copy_part(self, part, created):
+        """パーツを関連パーツごと複製（メディアは内容のハッシュで既存パーツを共有）"""
+        if id(part) in created:
+            return created[id(part)]
+
+        if part.content_type.startswith(MEDIA_PREFIXES):
+            sha1 = hashlib.sha1(part.blob).hexdigest()
+            if sha1 in self._media:
+                self.reused_media += 1
+                created[id(part)] = self._media[sha1]
+                return self._media[sha1]
+
+        partname = self._partnames.next_partname(_partname_template(part.partname))
+        copy = PartFactory(partname, part.content_type, self.package, part.blob)
+        created[id(part)] = copy
+        if part.content_type.startswith(MEDIA_PREFIXES):
+            self._media[hashlib.sha1(part.blob).hexdigest()] = copy
+
+        for rId, rel in part.rels.items():
+            if rel.is_external:
+                _add_rel(copy, rId, rel.reltype, rel.target_ref, external=True)
+            else:
+                _add_rel(copy, rId, rel.reltype, self._copy_part(rel.target_part, created))
+        return copy
+
+
+def merge_decks(sources, prs=None):
+    """sources（パス、または (パス, スライド番号リスト)）を順に結合したプレゼンを返す
+
+    元ファイルは1つずつ開いて閉じるため、同時にメモリに載るのは結合先と元ファイル1つだけ。
+    """
+    merger = DeckMerger(prs)
+    for source in sources:
+        path, indices = source if isinstance(source, tuple) else (source, None)
+        merger.merge(path, indices)
+    return merger.prs
+
+
+def merged_slides(prs, sources):
+    """結合したスライドを順に返すビルダー（deck_stream.stream_build に渡して逐次書き出し可能）"""
+    merger = DeckMerger(prs)
+    for source in sources:
+        path, indices = source if isinstance(source, tuple) else (source, None)
+        yield from merger.merged_slides(path, indices)
+
+
+def _add_rel(part, rId, reltype, target, external=False):
+    """元と同じrIdで関係を追加（スライドXML中の参照をそのまま使う）"""
+    rels = part.rels
+    mode = RTM.EXTERNAL if external else RTM.INTERNAL
+    rels._rels[rId] = _Relationship(rels._base_uri, rId, reltype, mode, target)
+
+
+def _remove_links(slide_part, rId):
+    """複製しないスライドへのハイパーリンク要素を削除"""
+    for el in list(slide_part._element.iter(qn("a:hlinkClick"), qn("a:hlinkHover"))):
+        if el.get(qn("r:id")) == rId:
+            el.getparent().remove(el)
+
+
+def _layout_parts(master_part):
+    """マスターのレイアウト（sldLayoutIdLst の並び順）"""
+    return [master_part.related_part(el.get(qn("r:id"))) for el in master_part._element.iter(qn("p:sldLayoutId"))]
+
+
+def _master_digest(master_part):
+    """マスター・テーマ・レイアウトとその画像の内容から求めたハッシュ
+
+    パーツ名・関係IDは結合先で変わるため、XML中の r:id 参照は除いて比較する。
+    """
+    sha1 = hashlib.sha1()
+    parts = [master_part, master_part.part_related_by(RT.THEME)] + _layout_parts(master_part)
+    for part in parts:
+        sha1.update(_strip_rids(part.blob))
+        for rId, rel in sorted(part.rels.items()):
+            if rel.is_external:
+                sha1.update(rel.target_ref.encode())
+            elif rel.target_part.content_type.startswith(MEDIA_PREFIXES):
+                sha1.update(hashlib.sha1(rel.target_part.blob).digest())
+    return sha1.hexdigest()
+
+
+def _strip_rids(blob):
+    return re.sub(rb'\sr:(id|embed|link|pict)="[^"]*"', b"", blob)
+
+
+def _partname_template(partname):
+    """/ppt/charts/chart3.xml → /ppt/charts/chart%d.xml"""
+    return re.sub(r"\d+(\.\w+)$", r"%d\1", str(partname))
+
+
+# ---------------------------------------------------------------------------
+# ベンチマーク（合成の顧客別付録デッキ50本を結合）
+# ---------------------------------------------------------------------------
+
+def write_sample_decks(directory, count=50, slides=20):
+    """合成の付録デッキ（グラフ・ロゴ画像付き）を count 本書き出してパスを返す"""
+    from deck_parallel import add_site_appendix
+    from deck_theme import apply_theme
+
+    logo = _sample_png()
+    paths = []
+    for d in range(count):
+        prs = new_presentation()
+        # 半数は提案書テーマ、残りは既定テンプレート（マスターの重複排除を確認）
+        if d % 2:
+            apply_theme(prs)
+        for i in range(slides):
+            slide = add_site_appendix(prs, d * slides + i + 1)
+            slide.shapes.add_picture(logo, Inches(8.8), Inches(6.8), Inches(0.8))
+        path = os.path.join(directory, f"appendix_{d:02d}.pptx")
+        prs.save(path)
+        paths.append(path)
+    return paths
+
+
+def _sample_png():
+    """1色塗りの小さなPNG（標準ライブラリのみで生成）"""
+    import io
+    import struct
+    import zlib
+
+    width = height = 32
+    raw = b"".join(b"\x00" + bytes((26, 84, 144)) * width for _ in range(height))
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    png = b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+    png += chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+    return io.BytesIO(png)
+
+
+def benchmark(decks=50, slides=20):
+    """decks本の付録デッキを結合して保存するまでの所要時間と重複排除の件数"""
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_sample_decks(directory, decks, slides)
+        start = time.perf_counter()
+        merger = DeckMerger()
+        for path in paths:
+            merger.merge(path)
+        output = os.path.join(directory, "merged.pptx")
+        merger.prs.save(output)
+        elapsed = time.perf_counter() - start
+
+        merged = Presentation(output)
+        return {
+            "decks": decks,
+            "slides": len(merged.slides),
+            "masters": len(merged.slide_masters),
+            "images": sum(1 for p in merged.part.package.iter_parts() if p.content_type.startswith("image/")),
+            "reused_masters": merger.reused_masters,
+            "reused_media": merger.reused_media,
+            "seconds": elapsed,
+        }
+
+
+if __name__ == "__main__":
+    r = benchmark()
+    print(f"{r['decks']}デッキ → {r['slides']:,}スライド  {r['seconds']:.1f}秒")
+    print(f"マスター {r['masters']}個（再利用 {r['reused_masters']:,}回）、画像 {r['images']}個（再利用 {r['reused_media']:,}回）")
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+スライドの並列構築と決定的なマージ
+独立したスライドビルダーをワーカープロセスで実行し、スライドXMLと関連パーツ
+（グラフ・埋め込みワークブック・画像）を書き出して、宣言順に本体パッケージへ取り込む。
+パーツ名・rIdは逐次構築と同じ順序で採番するため、保存結果は逐次モードとバイト単位で一致する
+"""
+
+import io
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from pptx import Presentation
+from pptx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from pptx.opc.package import PartFactory
+from pptx.opc.packuri import PackURI
+from pptx.parts.slide import SlidePart
+from pptx.util import Inches, Pt
+
+# 再現可能な保存のためのZIPエントリの日時（ZIP形式の最小値）
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# スライドから取り込めない関係（ノートはノートマスターとの相互参照を持つため非対応）
+UNSUPPORTED_RELTYPES = (RT.NOTES_SLIDE,)
+
+
+def new_presentation(width=Inches(10), height=Inches(7.5)):
+    """提案書と同じ既定テンプレート・スライドサイズのプレゼンテーション"""
+    prs = Presentation()
+    prs.slide_width = width
+    prs.slide_height = height
+    return prs
+
+
+def build_sequential(builders, prs=None):
+    """ビルダー（(関数, 引数タプル) のリスト）を宣言順に逐次実行"""
+    prs = prs or new_presentation()
+    for func, args in builders:
+        func(prs, *args)
+    return prs
+
+
+def build_parallel(builders, prs=None, workers=None, batch_size=None, setup=None):
+    """ビルダーをワーカープロセスで実行し、出力スライドを宣言順にマージ
+
+    ビルダーは他のスライドに依存しないこと（プロセス間で渡すためモジュールレベルの関数）。
+    連続するビルダーをバッチにまとめ、ワーカー側のプレゼン生成を1バッチ1回に抑える。
+    setup はワーカー側のプレゼンに適用する準備処理（テーマ・レイアウト定義など、本体と同じもの）。
+    """
+    prs = prs or new_presentation()
+    size = (prs.slide_width, prs.slide_height)
+    workers = workers or os.cpu_count() or 1
+    batch_size = batch_size or max(1, -(-len(builders) // (workers * 4)))
+    tasks = [(builders[i:i + batch_size], size, setup) for i in range(0, len(builders), batch_size)]
+
+    partnames = PartnameAllocator(prs.part.package)
+    if workers == 1:
+        for task in tasks:
+            merge_slides(prs, _build_task(task), partnames)
+        return prs
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map は投入順に結果を返すため、完了順に関係なく宣言順でマージされる
+        for payload in executor.map(_build_task, tasks):
+            merge_slides(prs, payload, partnames)
+    return prs
+
+
+def export_slides(prs, start=0):
+    """start番目以降のスライドを (レイアウト名, スライドXML, 関係) の形式で書き出す"""
+    payload = []
+    for slide in list(prs.slides)[start:]:
+        part = slide.part
+        layout = part.part_related_by(RT.SLIDE_LAYOUT)
+        payload.append((str(layout.partname), part.blob, _export_rels(part, {})))
+    return payload
+
+
+def merge_slides(prs, payload, partnames=None):
+    """書き出したスライドを末尾に追加（パーツ名・rIdは逐次構築と同じ順で採番）"""
+    package = prs.part.package
+    partnames = partnames or PartnameAllocator(package)
+    layouts = {str(layout.part.partname): layout.part for layout in prs.slide_layouts}
+
+    for layout_name, blob, rels in payload:
+        # Presentation.slides.add_slide と同じ順序：スライド→プレゼンへの関係→レイアウト
+        partname = prs.part._next_slide_partname
+        slide_part = SlidePart.load(partname, CT.PML_SLIDE, package, blob)
+        rId = prs.part.relate_to(slide_part, RT.SLIDE)
+        prs.slides._sldIdLst.add_sldId(rId)
+        _import_rels(slide_part, rels, partnames, layouts[layout_name], {})
+    return prs
+
+
+class PartnameAllocator:
+    """Package.next_partname と同じ規則（空いている最小の番号）のパーツ名採番
+
+    next_partname は呼び出しのたびに全パーツを走査するため、使用済みの名前を
+    集合で保持して増分的に採番する。マージ中はパーツが増える一方なので、
+    テンプレートごとの探索開始位置を持ち越せる。
+    """
+
+    def __init__(self, package):
+        self.package = package
+        self._used = {str(part.partname) for part in package.iter_parts()}
+        self._next = {}
+
+    def next_partname(self, tmpl):
+        n = self._next.get(tmpl, 1)
+        while tmpl % n in self._used:
+            n += 1
+        self._next[tmpl] = n + 1
+        return self.add(tmpl % n)
+
+    def add(self, partname):
+        self._used.add(str(partname))
+        return PackURI(str(partname))
+
+
+def save_deterministic(prs, path):
+    """ZIPエントリの日時を固定して保存（同じ内容なら同じバイト列になる）"""
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    buffer.seek(0)
+
+    output = io.BytesIO()
+    with zipfile.ZipFile(buffer) as src, zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            entry = zipfile.ZipInfo(info.filename, ZIP_DATE_TIME)
+            entry.compress_type = info.compress_type
+            dst.writestr(entry, src.read(info.filename))
+
+    data = output.getvalue()
+    if hasattr(path, "write"):
+        path.write(data)
+    else:
+        with open(path, "wb") as f:
+            f.write(data)
+    return data
+
+
+def _build_task(task):
+    """ワーカー側：空のプレゼンでバッチ内のビルダーを実行して追加スライドを書き出す"""
+    batch, (width, height), setup = task
+    prs = new_presentation(width, height)
+    if setup is not None:
+        setup(prs)
+    return export_slides(build_sequential(batch, prs))
+
+
+def _export_rels(part, seen):
+    """パーツの関係をrId順に書き出し（関連パーツは再帰的に内容ごと）"""
+    rels = []
+    for rId, rel in sorted(part.rels.items(), key=lambda item: _rid_number(item[0])):
+        if rel.reltype in UNSUPPORTED_RELTYPES:
+            raise ValueError(f"並列構築に対応していない関係です: {rel.reltype}")
+        if rel.is_external:
+            target = ("external", rel.target_ref)
+        elif rel.reltype == RT.SLIDE_LAYOUT:
+            target = ("layout", str(rel.target_part.partname))
+        else:
+            target_part = rel.target_part
+            key = str(target_part.partname)
+            if key in seen:
+                target = ("ref", key)
+            else:
+                seen[key] = True
+                target = (
+                    "part",
+                    key,
+                    target_part.content_type,
+                    target_part.blob,
+                    _export_rels(target_part, seen),
+                )
+        rels.append((rId, rel.reltype, target))
+    return rels
+
+
+def _import_rels(part, rels, partnames, layout_part, created):
+    """書き出した関係を再構築（パーツは関係を張る直前に採番）"""
+    package = partnames.package
+    for rId, reltype, target in rels:
+        kind = target[0]
+        if kind == "external":
+            new_rId = part.relate_to(target[1], reltype, is_external=True)
+        elif kind == "layout":
+            new_rId = part.relate_to(layout_part, reltype)
+        elif kind == "ref":
+            new_rId = part.relate_to(created[target[1]], reltype)
+        else:
+            _, name, content_type, blob, child_rels = target
+            if content_type.startswith("image/"):
+                # 画像は逐次構築と同じくSHA1で既存パーツを再利用
+                child = package.get_or_add_image_part(io.BytesIO(blob))
+                partnames.add(child.partname)
+            else:
+                child = PartFactory(partnames.next_partname(_partname_template(name)), content_type, package, blob)
+            created[name] = child
+            new_rId = part.relate_to(child, reltype)
+            _import_rels(child, child_rels, partnames, layout_part, created)
+
+        if new_rId != rId:
+            raise ValueError(f"関係IDが一致しません: {rId} → {new_rId}（{part.partname}）")
+
+
+def _partname_template(partname):
+    """/ppt/charts/chart3.xml → /ppt/charts/chart%d.xml"""
+    return re.sub(r"\d+(\.\w+)$", r"%d\1", partname)
+
+
+def _rid_number(rId):
+    return int(rId[3:]) if rId[3:].isdigit() else 0
+
+
+# ---------------------------------------------------------------------------
+# ベンチマーク（拠点別付録スライドを想定した合成デッキ）
+# ---------------------------------------------------------------------------
+
+def add_site_appendix(prs, site_no):
+    """合成の拠点別付録スライド（KPI推移グラフ＋指標ボックス）"""
+    from charts import add_line_chart
+
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
+    p = txBox.text_frame.paragraphs[0]
+    p.text = f"拠点別KPI：拠点{site_no:03d}"
+    p.font.size = Pt(24)
+    p.font.bold = True
+
+    months = [f"M{m}" for m in range(1, 37)]
+    series = {
+        "在庫回転日数": [30 - (site_no % 7) - m * 0.2 for m in range(36)],
+        "欠品率": [3 + (site_no % 5) * 0.1 - m * 0.05 for m in range(36)],
+    }
+    add_line_chart(slide, (Inches(0.5), Inches(1.0), Inches(6), Inches(5.5)), months, series)
+
+    for i in range(12):
+        box = slide.shapes.add_textbox(Inches(6.8), Inches(1.0 + i * 0.45), Inches(2.8), Inches(0.4))
+        box.text_frame.text = f"指標{i + 1}：{(site_no * 37 + i * 11) % 100}"
+    return slide
+
+
+def benchmark(slides=300, worker_counts=None):
+    """逐次構築と並列構築の所要時間・速度向上率・出力一致を計測"""
+    builders = [(add_site_appendix, (i,)) for i in range(1, slides + 1)]
+    worker_counts = worker_counts or sorted({1, 2, 4, os.cpu_count() or 1})
+
+    start = time.perf_counter()
+    expected = save_deterministic(build_sequential(builders), io.BytesIO())
+    sequential = time.perf_counter() - start
+
+    results = [{"workers": 0, "seconds": sequential, "speedup": 1.0, "identical": True}]
+    for workers in worker_counts:
+        start = time.perf_counter()
+        data = save_deterministic(build_parallel(builders, workers=workers), io.BytesIO())
+        elapsed = time.perf_counter() - start
+        results.append({
+            "workers": workers,
+            "seconds": elapsed,
+            "speedup": sequential / elapsed,
+            "identical": data == expected,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    print(f"CPU数: {os.cpu_count()}")
+    for r in benchmark():
+        label = "逐次" if r["workers"] == 0 else f"並列 {r['workers']}プロセス"
+        print(f"{label:>12}: {r['seconds']:.2f}秒  x{r['speedup']:.2f}  一致={r['identical']}")
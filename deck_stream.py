@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ストリーミング構築（数千〜1万スライドの付録デッキ用）
+スライドビルダーは完成したスライドを順に yield し、スライドとその関連パーツ
+（グラフ・埋め込みワークブック・画像）は完成時点で出力ZIPへ書き出してメモリから解放する。
+プレゼン本体・マスター・レイアウト・[Content_Types].xml は最後に書き出す。
+保存後に全スライドを走査する処理（text_fit・pptx_optimizer）はこのモードでは使えない
+"""
+
+import hashlib
+import os
+import re
+import time
+import zipfile
+from collections import namedtuple
+
+from pptx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from pptx.opc.package import Part
+from pptx.opc.packuri import PACKAGE_URI, CONTENT_TYPES_URI
+from pptx.opc.serialized import _ContentTypesItem
+from pptx.opc.oxml import serialize_part_xml
+from pptx.util import Inches, Pt
+
+from deck_parallel import PartnameAllocator, new_presentation
+
+# 書き出し済みパーツ（[Content_Types].xml 生成用の名前と種別だけを保持）
+WrittenPart = namedtuple("WrittenPart", ["partname", "content_type"])
+
+SLIDE_PARTNAME = "/ppt/slides/slide%d.xml"
+
+# スライド外で共有されるパーツへの関係（スライドと一緒には書き出さない）
+SHARED_RELTYPES = (RT.SLIDE_LAYOUT, RT.NOTES_MASTER, RT.SLIDE)
+
+
+class StreamingDeckWriter:
+    """完成したスライドを逐次ZIPへ書き出すプレゼン出力"""
+
+    def __init__(self, path, prs=None):
+        self.prs = prs or new_presentation()
+        self.package = self.prs.part.package
+        self.slide_count = 0
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        self._written = []
+        self._partnames = PartnameAllocator(self.package)
+        self._images = {}
+        self._slides = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._zip.close()
+
+    def add(self, slide):
+        """完成したスライドを書き出し、プレゼンからは切り離してメモリを解放する"""
+        slide_part = slide.part
+        parts = self._collect(slide_part)
+
+        # 出力上の名前に採番（画像は内容が同じなら書き出し済みを参照）
+        slide_part.partname = self._partnames.next_partname(SLIDE_PARTNAME)
+        to_write = [slide_part]
+        for part in parts[1:]:
+            if part.content_type.startswith("image/"):
+                sha1 = hashlib.sha1(part.blob).hexdigest()
+                if sha1 in self._images:
+                    _replace_target(parts, part, _stub(self._images[sha1], part))
+                    continue
+                self._images[sha1] = part.partname = self._next_partname(part)
+            else:
+                part.partname = self._next_partname(part)
+            to_write.append(part)
+
+        for part in to_write:
+            self._write_part(part)
+
+        # プレゼンの関係・スライド一覧から外し、名前だけを記録（close時に再登録）。
+        # 関係を残すと add_slide が毎回全スライドを走査するため、枚数に比例して遅くなる
+        self._detach(slide_part)
+        self._slides.append(slide_part.partname)
+        self.slide_count += 1
+
+    def close(self):
+        """プレゼン本体・共有パーツ・パッケージ関係・[Content_Types].xml を書き出して閉じる"""
+        self._attach_written_slides()
+
+        written = {str(w.partname) for w in self._written}
+        for part in self.package.iter_parts():
+            if str(part.partname) not in written:
+                self._write_part(part)
+        self._zip.writestr(PACKAGE_URI.rels_uri.membername, self.package._rels.xml)
+        self._zip.writestr(
+            CONTENT_TYPES_URI.membername,
+            serialize_part_xml(_ContentTypesItem.xml_for(self._written)),
+        )
+        self._zip.close()
+
+    def _next_partname(self, part):
+        return self._partnames.next_partname(_partname_template(part.partname))
+
+    def _detach(self, slide_part):
+        """プレゼンからスライドへの関係とスライドIDを削除（通常は末尾のスライド）"""
+        rels = self.prs.part.rels
+        sldIdLst = self.prs.slides._sldIdLst
+        for sldId in reversed(sldIdLst):
+            if rels[sldId.rId].target_part is slide_part:
+                rels.pop(sldId.rId)
+                sldIdLst.remove(sldId)
+                return
+        raise ValueError(f"プレゼンに含まれないスライドです: {slide_part.partname}")
+
+    def _attach_written_slides(self):
+        """書き出し済みスライドを名前だけのスタブとして宣言順に再登録"""
+        rels = self.prs.part.rels
+        sldIdLst = self.prs.slides._sldIdLst
+        next_id = max([int(sldId.id) for sldId in sldIdLst] + [255]) + 1
+        for i, partname in enumerate(self._slides):
+            stub = Part(partname, CT.PML_SLIDE, self.package, b"")
+            # add_sldId は呼び出しごとに最大IDを検索するため、IDは連番で直接付与
+            rId = rels._add_relationship(RT.SLIDE, stub)
+            sldIdLst._add_sldId(id=next_id + i, rId=rId)
+        self._slides = []
+
+    def _collect(self, slide_part):
+        """スライドと、スライドからのみ参照される関連パーツ（深さ優先）"""
+        parts, seen = [], {id(slide_part)}
+        stack = [slide_part]
+        while stack:
+            part = stack.pop()
+            parts.append(part)
+            for rel in part.rels.values():
+                if rel.is_external or rel.reltype in SHARED_RELTYPES:
+                    continue
+                target = rel.target_part
+                if id(target) not in seen:
+                    seen.add(id(target))
+                    stack.append(target)
+        return parts
+
+    def _write_part(self, part):
+        self._zip.writestr(part.partname.membername, part.blob)
+        if part._rels:
+            self._zip.writestr(part.partname.rels_uri.membername, part.rels.xml)
+        self._written.append(WrittenPart(part.partname, part.content_type))
+
+
+def stream_build(path, builders, prs=None, on_slide=None):
+    """ジェネレーター型ビルダー（(関数, 引数) のリスト）の出力を逐次書き出す"""
+    with StreamingDeckWriter(path, prs) as writer:
+        for func, args in builders:
+            for slide in func(writer.prs, *args):
+                writer.add(slide)
+                if on_slide is not None:
+                    on_slide(writer.slide_count)
+    return writer.slide_count
+
+
+def _stub(partname, part):
+    """書き出し済みパーツの名前だけを持つ空のパーツ"""
+    return Part(partname, part.content_type, part.package, b"")
+
+
+def _replace_target(parts, old, new):
+    """parts から old への関係の参照先を new に付け替え"""
+    for part in parts:
+        for rel in part.rels.values():
+            if not rel.is_external and rel.target_part is old:
+                _retarget(rel, new)
+
+
+def _retarget(rel, part):
+    rel._target = part
+    for name in ("target_part", "target_partname", "target_ref"):
+        rel.__dict__.pop(name, None)
+
+
+def _partname_template(partname):
+    """/ppt/charts/chart3.xml → /ppt/charts/chart%d.xml"""
+    return re.sub(r"\d+(\.\w+)$", r"%d\1", str(partname))
+
+
+# ---------------------------------------------------------------------------
+# 計測（合成の1万スライド付録デッキでRSSの推移を記録）
+# ---------------------------------------------------------------------------
+
+def sku_appendix_slides(prs, count, chart_every=20):
+    """合成のSKU別付録スライドを順に生成（chart_every枚ごとにグラフ付き）"""
+    from charts import add_line_chart
+
+    for i in range(1, count + 1):
+        slide = prs.slides.add_slide(prs.slide_layouts[6])
+        txBox = slide.shapes.add_textbox(Inches(0.5), Inches(0.3), Inches(9), Inches(0.5))
+        p = txBox.text_frame.paragraphs[0]
+        p.text = f"SKU別在庫推移：SKU-{i:05d}"
+        p.font.size = Pt(24)
+        p.font.bold = True
+
+        for row in range(10):
+            box = slide.shapes.add_textbox(Inches(0.5), Inches(1.0 + row * 0.55), Inches(4), Inches(0.5))
+            box.text_frame.text = f"週{row + 1}：在庫{(i * 31 + row * 7) % 500}ケース"
+
+        if i % chart_every == 0:
+            weeks = [f"W{w}" for w in range(1, 27)]
+            add_line_chart(
+                slide, (Inches(4.8), Inches(1.0), Inches(4.8), Inches(5.5)),
+                weeks, {"在庫": [(i + w * 13) % 500 for w in range(26)]},
+            )
+        yield slide
+
+
+def current_rss_mb():
+    """現在の常駐メモリ（MB、/proc 非対応環境では ru_maxrss）"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure_rss(path, count=10000, interval=1000, streaming=True):
+    """count枚の合成デッキを構築し、interval枚ごとのRSS（MB）を返す"""
+    curve = [(0, current_rss_mb())]
+
+    def record(n):
+        if n % interval == 0:
+            curve.append((n, current_rss_mb()))
+
+    start = time.perf_counter()
+    if streaming:
+        stream_build(path, [(sku_appendix_slides, (count,))], on_slide=record)
+    else:
+        prs = new_presentation()
+        for n, _ in enumerate(sku_appendix_slides(prs, count), start=1):
+            record(n)
+        prs.save(path)
+    return curve, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    # 通常モードで確保したメモリはプロセスに残るため、ストリーミングを先に計測
+    for streaming, count in ((True, 10000), (False, 2000)):
+        mode = "ストリーミング" if streaming else "通常（全スライド保持）"
+        curve, elapsed = measure_rss("rss_benchmark.pptx", count, interval=count // 10, streaming=streaming)
+        print(f"{mode}: {count:,}スライド {elapsed:.1f}秒")
+        for n, rss in curve:
+            print(f"  {n:>6,}枚  RSS {rss:7.1f} MB")
+    os.remove("rss_benchmark.pptx")
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+スライドマスター・レイアウトによるテーマ設定
+既定テンプレートのテーマ配色を提案書のパレットに置き換え、タイトル・セクション区切り・
+タイトルのみの各レイアウトに背景・装飾・タイトルプレースホルダーの書式を定義する。
+各スライドは背景図形やタイトル書式を持たず、プレースホルダーに文字を入れるだけになる
+"""
+
+from lxml import etree
+from pptx.dml.color import RGBColor
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls, qn
+from pptx.util import Inches, Pt
+
+# テーマ配色（テーマの色名 → 提案書の COLOR_* と同じ値）
+PALETTE = {
+    "dk2": RGBColor(52, 73, 94),  # COLOR_TEXT
+    "lt2": RGBColor(245, 248, 252),  # COLOR_BG_LIGHT
+    "accent1": RGBColor(26, 84, 144),  # COLOR_PRIMARY
+    "accent2": RGBColor(192, 57, 43),  # COLOR_SECONDARY
+    "accent3": RGBColor(40, 116, 166),  # COLOR_ACCENT
+    "accent4": RGBColor(252, 245, 245),  # COLOR_BG_LIGHT2
+}
+
+# レイアウト名（既定テンプレートのレイアウトを置き換える）
+LAYOUT_TITLE = "提案書タイトル"
+LAYOUT_SECTION = "セクション区切り"
+LAYOUT_CONTENT = "タイトルのみ"
+
+# 置き換え対象の既定レイアウト名
+REPLACED_LAYOUTS = {
+    LAYOUT_TITLE: "Title Slide",
+    LAYOUT_SECTION: "Section Header",
+    LAYOUT_CONTENT: "Title Only",
+}
+
+# タイトルのみレイアウトの既定タイトルサイズ（スライド側で個別に上書き可）
+CONTENT_TITLE_SIZE = Pt(32)
+
+# 日付プレースホルダーのidx（タイトルレイアウト）
+DATE_IDX = 10
+
+_LAYOUT_XML = (
+    '<p:sldLayout %s type="{type}" preserve="1"{show_master}>'
+    '<p:cSld name="{name}">{background}<p:spTree>'
+    '<p:nvGrpSpPr><p:cNvPr id="1" name=""/><p:cNvGrpSpPr/><p:nvPr/></p:nvGrpSpPr>'
+    '<p:grpSpPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="0" cy="0"/>'
+    '<a:chOff x="0" y="0"/><a:chExt cx="0" cy="0"/></a:xfrm></p:grpSpPr>'
+    '{shapes}</p:spTree></p:cSld>'
+    '<p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:sldLayout>'
+) % nsdecls("a", "p", "r")
+
+_PLACEHOLDER_XML = (
+    '<p:sp><p:nvSpPr><p:cNvPr id="{id}" name="{name}"/>'
+    '<p:cNvSpPr><a:spLocks noGrp="1"/></p:cNvSpPr><p:nvPr><p:ph {ph}/></p:nvPr></p:nvSpPr>'
+    '<p:spPr><a:xfrm><a:off x="{x}" y="{y}"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm></p:spPr>'
+    '<p:txBody><a:bodyPr wrap="none" lIns="91440" tIns="45720" rIns="91440" bIns="45720" anchor="t">'
+    '<a:noAutofit/></a:bodyPr>'
+    '<a:lstStyle><a:lvl1pPr marL="0" indent="0" algn="{align}"><a:buNone/>'
+    '<a:defRPr sz="{size}" b="{bold}">{color}<a:latin typeface="+mn-lt"/><a:ea typeface="+mn-ea"/>'
+    '</a:defRPr></a:lvl1pPr></a:lstStyle>'
+    '<a:p><a:r><a:rPr lang="ja-JP"/><a:t>{prompt}</a:t></a:r></a:p></p:txBody></p:sp>'
+)
+
+_RECT_XML = (
+    '<p:sp><p:nvSpPr><p:cNvPr id="{id}" name="{name}"/><p:cNvSpPr/><p:nvPr userDrawn="1"/></p:nvSpPr>'
+    '<p:spPr><a:xfrm><a:off x="{x}" y="{y}"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm>'
+    '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom>{fill}<a:ln><a:noFill/></a:ln></p:spPr></p:sp>'
+)
+
+
+def apply_theme(prs, palette=PALETTE):
+    """テーマ配色と提案書用レイアウトをプレゼンに適用し、{レイアウト名: レイアウト} を返す"""
+    master = prs.slide_master
+    _apply_palette(master.part.part_related_by(RT.THEME), palette)
+
+    layouts = {}
+    for name, builder in (
+        (LAYOUT_TITLE, _title_layout),
+        (LAYOUT_SECTION, _section_layout),
+        (LAYOUT_CONTENT, _content_layout),
+    ):
+        layout = prs.slide_layouts.get_by_name(name) or prs.slide_layouts.get_by_name(REPLACED_LAYOUTS[name])
+        if layout is None:
+            raise KeyError(f"置き換え元のレイアウトがありません: {REPLACED_LAYOUTS[name]}")
+        _replace_children(layout._element, parse_xml(builder(name)))
+        layouts[name] = layout
+    return layouts
+
+
+def add_themed_slide(prs, layout_name, title, size=None):
+    """レイアウトからスライドを追加してタイトルを設定（size指定時のみ文字サイズを上書き）"""
+    layout = prs.slide_layouts.get_by_name(layout_name)
+    if layout is None:
+        raise KeyError(f"テーマが適用されていません（レイアウト {layout_name} がありません）")
+    slide = prs.slides.add_slide(layout)
+    slide.shapes.title.text = title
+    if size is not None:
+        slide.shapes.title.text_frame.paragraphs[0].font.size = size
+    return slide
+
+
+def _apply_palette(theme_part, palette):
+    """テーマパーツの配色（clrScheme）を置き換える"""
+    theme = etree.fromstring(theme_part.blob)
+    scheme = theme.find(f"{qn('a:themeElements')}/{qn('a:clrScheme')}")
+    scheme.set("name", "提案書")
+    for role, rgb in palette.items():
+        slot = scheme.find(qn(f"a:{role}"))
+        if slot is None:
+            raise KeyError(f"未定義のテーマ色です: {role}")
+        for child in list(slot):
+            slot.remove(child)
+        etree.SubElement(slot, qn("a:srgbClr"), val=str(rgb))
+    theme_part._blob = etree.tostring(theme, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+def _replace_children(element, source):
+    """レイアウト要素を内容ごと置き換える（SlideLayout が保持する要素の同一性は保つ）"""
+    for name in list(element.attrib):
+        del element.attrib[name]
+    element.attrib.update(source.attrib)
+    for child in list(element):
+        element.remove(child)
+    element.extend(list(source))
+
+
+def _placeholder(id_, name, ph, rect, size, align="l", bold=True, color="", prompt=""):
+    x, y, cx, cy = (int(v) for v in rect)
+    return _PLACEHOLDER_XML.format(
+        id=id_, name=name, ph=ph, x=x, y=y, cx=cx, cy=cy, size=int(size.pt * 100),
+        align=align, bold=int(bold), color=color, prompt=prompt,
+    )
+
+
+def _fill(scheme=None, rgb=None):
+    color = f'<a:schemeClr val="{scheme}"/>' if scheme else f'<a:srgbClr val="{rgb}"/>'
+    return f"<a:solidFill>{color}</a:solidFill>"
+
+
+def _title_layout(name):
+    """タイトルスライド：中央の帯、タイトル・サブタイトル・日付"""
+    band = _RECT_XML.format(
+        id=2, name="Band", x=0, y=int(Inches(2)), cx=int(Inches(10)), cy=int(Inches(3.5)),
+        fill=_fill(rgb=RGBColor(240, 245, 250)),
+    )
+    shapes = [
+        band,
+        _placeholder(3, "Title 2", 'type="ctrTitle"', (Inches(1), Inches(2.5), Inches(8), Inches(1.2)),
+                     Pt(40), "ctr", color=_fill("accent1"), prompt="タイトル"),
+        _placeholder(4, "Subtitle 3", 'type="subTitle" idx="1"', (Inches(1), Inches(3.9), Inches(8), Inches(0.7)),
+                     Pt(28), "ctr", bold=False, color=_fill("tx2"), prompt="宛先"),
+        _placeholder(5, "Date 4", f'type="body" sz="quarter" idx="{DATE_IDX}"',
+                     (Inches(1), Inches(6.2), Inches(8), Inches(0.4)),
+                     Pt(18), "ctr", bold=False, color=_fill(rgb=RGBColor(127, 140, 141)), prompt="日付"),
+    ]
+    return _LAYOUT_XML.format(type="title", show_master="", name=name, background="", shapes="".join(shapes))
+
+
+def _section_layout(name):
+    """セクション区切り：メインカラーの全面背景と中央の白抜きタイトル"""
+    background = f'<p:bg><p:bgPr>{_fill("accent1")}<a:effectLst/></p:bgPr></p:bg>'
+    title = _placeholder(2, "Title 1", 'type="title"', (Inches(1), Inches(3), Inches(8), Inches(1.5)),
+                         Pt(56), "ctr", color=_fill("bg1"), prompt="セクション名")
+    return _LAYOUT_XML.format(
+        type="secHead", show_master=' showMasterSp="0"', name=name, background=background, shapes=title,
+    )
+
+
+def _content_layout(name):
+    """タイトルのみ：左上のタイトル（本文はスライド側で自由に配置）"""
+    title = _placeholder(2, "Title 1", 'type="title"', (Inches(0.5), Inches(0.3), Inches(9), Inches(0.7)),
+                         CONTENT_TITLE_SIZE, color=_fill("accent1"), prompt="スライドタイトル")
+    return _LAYOUT_XML.format(type="titleOnly", show_master="", name=name, background="", shapes=title)
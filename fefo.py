@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ロット別の賞味期限・FEFO引当シミュレーション
+入荷ロットごとに納品期限（製造日から賞味期間の1/3、いわゆる1/3ルール）を持たせ、
+日々の需要を期限の近いロットから引き当てる（FEFO）。納品期限を過ぎたロットは廃棄とする。
+ロットはSKUごとに引当順（期限順/入荷順）に並べた配列とし、(シナリオ, SKU)ごとの先頭ポインタを
+優先度付きキューとして扱うことで、全SKU・全シナリオを日単位でまとめて計算する。
+現状の入荷順（FIFO）との廃棄額の差を、総利益率ブリッジの在庫ロス削減の内数として渡す
+"""
+
+import heapq
+import time
+
+import numpy as np
+
+from profit_bridge import GROSS_MARGIN, split_component
+
+# 納品期限：製造日から賞味期間のこの割合までに出荷できなければ廃棄
+DELIVERY_RULE = 1 / 3
+
+# 期限切れ在庫の回収率（0：全額廃棄）
+SALVAGE_RATE = 0.0
+
+# 需要シナリオ（需要の倍率）と期待値計算の重み
+DEMAND_SCENARIOS = (("需要減", 0.95), ("基準", 1.0), ("需要増", 1.05))
+SCENARIO_WEIGHTS = (0.25, 0.5, 0.25)
+
+# 引当方式（ロットの並び順）
+POLICIES = ("fifo", "fefo")
+
+# 合成データ：賞味期間（日）の候補、発注間隔（日）、発注量の計画需要に対する倍率、
+# 計画より需要が落ちているSKUの割合、入荷時の経過日数の上限（納品期限までの期間に対する割合）
+SHELF_LIFE_DAYS = (90, 120, 180, 270, 365, 540)
+REVIEW_DAYS = (7, 14)
+ORDER_COVER = 1.0
+SLOW_MOVER_SHARE = 0.03
+AGE_SPREAD = 0.5
+HORIZON_DAYS = 182
+SKU_COUNT = 50_000
+
+# ブリッジの要因名（FEFOの効果は在庫ロス削減の内数として切り出す）
+BRIDGE_PARENT = "在庫ロス削減"
+BRIDGE_COMPONENT = "期限管理（FEFO）"
+BRIDGE_REST = "在庫ロス削減（その他）"
+
+
+class LotQueue:
+    """SKUごとに引当順に並べたロット配列と、(シナリオ, SKU)ごとの先頭ポインタ"""
+
+    def __init__(self, sku, key, sku_count, scenarios):
+        self.order = np.lexsort((key, sku))
+        counts = np.bincount(sku, minlength=sku_count)
+        self.end = np.cumsum(counts)
+        self.start = self.end - counts
+        # head より前のロットは引当済みまたは廃棄済み
+        self.head = np.tile(self.start, (scenarios, 1))
+
+
+def shipping_deadline(arrival, age, shelf_life, rule=DELIVERY_RULE):
+    """入荷日・入荷時の経過日数・賞味期間から納品期限（最終出荷日）を求める"""
+    return arrival - age + np.floor(np.asarray(shelf_life) * rule).astype(np.int64) - 1
+
+
+def _allocate(queue, remaining, arrival, need, day, skip_future):
+    """需要を先頭ロットから順に引き当て、SKU別の出荷数を返す（need は残需要に更新）"""
+    n_sku, n_lots = need.shape[1], remaining.shape[1]
+    stock, head = remaining.reshape(-1), queue.head.reshape(-1)
+    served = np.zeros(need.size, dtype=need.dtype)
+    pair = np.flatnonzero(need)
+    sku = pair % n_sku
+    base = pair // n_sku * n_lots
+    pos = head[pair]
+    want = need.reshape(-1)[pair]
+    contiguous = np.ones(len(pair), dtype=bool)
+
+    while len(pair):
+        live = pos < queue.end[sku]
+        if not live.all():
+            pair, sku, base, pos, want, contiguous = (
+                pair[live], sku[live], base[live], pos[live], want[live], contiguous[live])
+        if not len(pair):
+            break
+        lot = queue.order[pos]
+        slot = base + lot
+        arrived = arrival[lot] <= day
+        take = np.minimum(want, stock[slot])
+        take[~arrived] = 0
+        stock[slot] -= take
+        served[pair] += take
+        want -= take
+
+        # 先頭から連続して空になったロットは先頭ポインタを進める
+        contiguous &= stock[slot] == 0
+        head[pair[contiguous]] = pos[contiguous] + 1
+
+        # 未入荷ロット：入荷順ならそれ以降も未入荷、期限順なら次のロットを探す
+        more = want > 0
+        if not skip_future:
+            more &= arrived
+        pair, sku, base, pos, want, contiguous = (
+            pair[more], sku[more], base[more], pos[more] + 1, want[more], contiguous[more])
+
+    served = served.reshape(need.shape)
+    need -= served
+    return served
+
+
+def simulate(lots, demand_rate, policy="fefo", days=HORIZON_DAYS, scenarios=DEMAND_SCENARIOS, seed=0):
+    """ロット（sku, arrival, deadline, qty, unit_cost）と日次需要率から、シナリオ別の廃棄・出荷を計算"""
+    if policy not in POLICIES:
+        raise ValueError(f"未対応の引当方式です: {policy}")
+    sku = np.asarray(lots["sku"])
+    arrival = np.asarray(lots["arrival"])
+    deadline = np.asarray(lots["deadline"])
+    unit_cost = np.asarray(lots["unit_cost"], dtype=float)
+    if np.any(deadline < arrival):
+        raise ValueError("納品期限が入荷日より前のロットがあります")
+
+    demand_rate = np.asarray(demand_rate, dtype=float)
+    multipliers = np.array([m for _, m in scenarios])
+    n_scen, n_sku = len(multipliers), len(demand_rate)
+
+    key = deadline if policy == "fefo" else arrival
+    queue = LotQueue(sku, key, n_sku, n_scen)
+    remaining = np.tile(np.asarray(lots["qty"], dtype=np.int64), (n_scen, 1))
+
+    # 納品期限日ごとのロット（その日の出荷後に廃棄）
+    expiring = np.argsort(deadline, kind="stable")
+    bounds = np.searchsorted(deadline[expiring], np.arange(days + 1), side="right")
+    first = np.searchsorted(deadline[expiring], 0, side="left")
+
+    sku_cost = np.zeros(n_sku)
+    np.maximum.at(sku_cost, sku, unit_cost)
+    written_off = np.zeros(n_scen)
+    written_units = np.zeros(n_scen, dtype=np.int64)
+    served_cost = np.zeros(n_scen)
+    served_units = np.zeros(n_scen, dtype=np.int64)
+    lost_units = np.zeros(n_scen, dtype=np.int64)
+
+    # 開始時点で期限切れのロットは初日に廃棄
+    stale = expiring[:first]
+    written_off += (remaining[:, stale] * unit_cost[stale]).sum(axis=1) * (1 - SALVAGE_RATE)
+    written_units += remaining[:, stale].sum(axis=1)
+    remaining[:, stale] = 0
+
+    # 方式間で同じ需要系列を使う（共通乱数）
+    rng = np.random.default_rng(seed)
+    for day in range(days):
+        need = rng.poisson(multipliers[:, None] * demand_rate[None, :])
+        served = _allocate(queue, remaining, arrival, need, day, policy == "fefo")
+        served_units += served.sum(axis=1)
+        served_cost += served @ sku_cost
+        lost_units += need.sum(axis=1)
+
+        expired = expiring[bounds[day - 1] if day else first:bounds[day]]
+        if len(expired):
+            value = remaining[:, expired] * unit_cost[expired]
+            written_off += value.sum(axis=1) * (1 - SALVAGE_RATE)
+            written_units += remaining[:, expired].sum(axis=1)
+            remaining[:, expired] = 0
+
+    on_hand = arrival < days
+    return {
+        "policy": policy,
+        "scenarios": [name for name, _ in scenarios],
+        "days": days,
+        "written_off": written_off,
+        "written_units": written_units,
+        "served_cost": served_cost,
+        "served_units": served_units,
+        "lost_units": lost_units,
+        "end_stock": (remaining[:, on_hand] * unit_cost[on_hand]).sum(axis=1),
+    }
+
+
+def disposal_rate(result, gross_margin=GROSS_MARGIN["start"] / 100):
+    """廃棄額の売上高比（売上は出荷原価を総利益率で割り戻して推計）"""
+    sales = result["served_cost"] / (1 - gross_margin)
+    return result["written_off"] / sales
+
+
+def compare(lots, demand_rate, days=HORIZON_DAYS, seed=0):
+    """入荷順（現状）と期限順（FEFO）を同じ需要系列で比較"""
+    results = {policy: simulate(lots, demand_rate, policy, days, seed=seed) for policy in POLICIES}
+    rates = {policy: disposal_rate(r) for policy, r in results.items()}
+    weights = np.asarray(SCENARIO_WEIGHTS)
+    return {
+        "results": results,
+        "rates": rates,
+        "expected_rate": {policy: float(r @ weights) for policy, r in rates.items()},
+        "reduction_pt": (rates["fifo"] - rates["fefo"]) * 100,
+    }
+
+
+def bridge_effect(comparison):
+    """廃棄率の低下幅（pt）を low/base/high に並べ替えてブリッジ用の値にする"""
+    reduction = np.asarray(comparison["reduction_pt"])
+    low, high = reduction.min(), reduction.max()
+    base = reduction[[name for name, _ in DEMAND_SCENARIOS].index("基準")]
+    return np.array([low, base, high])
+
+
+def gross_margin_definition(comparison):
+    """FEFOによる廃棄削減を在庫ロス削減の内数として切り出した総利益率ブリッジの定義（見出しは変えない）"""
+    return split_component(GROSS_MARGIN, BRIDGE_PARENT, BRIDGE_COMPONENT, bridge_effect(comparison), BRIDGE_REST)
+
+
+def estimate(skus=10_000, days=HORIZON_DAYS, seed=0, store=None, start=None, sites=None):
+    """入荷順とFEFOを比較
+
+    store（DataStore）と開始日 start を指定するとデータストアの在庫・入荷・出荷から、
+    省略時は合成データで比較する（廃棄率は売上高比のためSKU数を抑えて推計）。
+    """
+    if store is not None:
+        lots, rate = load_lots(store, start, days, sites)
+    else:
+        lots, rate = sample_lots(skus, days, seed)
+    return compare(lots, rate, days, seed)
+
+
+def load_lots(store, start, days=HORIZON_DAYS, sites=None):
+    """データストアから開始日の在庫ロット・期間中の入荷ロットと、拠点×SKU別の日次需要率を読み出す
+
+    ロットは開始日の stock（入荷日0）と期間中の receipts、納品期限は出荷期限（ship_by）の開始日からの日数。
+    出荷期限のない品目は対象外とし、需要率は期間中の shipments の出荷数の日平均とする。
+    SKUは拠点×品目コードの組を連番に符号化する。
+    """
+    start = np.datetime64(start, "D")
+    end = start + days
+    months = np.arange(start.astype("datetime64[M]"), end.astype("datetime64[M]") + 1)
+    columns = ["date", "site", "sku", "qty", "unit_cost", "ship_by"]
+    stock = store.scan("stock", columns, sites=sites, months=start.astype("datetime64[M]"),
+                       where=[("date", "==", start)])
+    receipts = store.scan("receipts", columns, sites=sites, months=months,
+                          where=[("date", ">", start), ("date", "<", end)])
+    shipments = store.scan("shipments", ["date", "site", "sku", "qty"], sites=sites, months=months,
+                           where=[("date", ">=", start), ("date", "<", end)])
+
+    data = {col: np.concatenate([stock[col], receipts[col]]) for col in columns}
+    dated = ~np.isnat(data["ship_by"])
+    data = {col: values[dated] for col, values in data.items()}
+    names, sku = np.unique(np.char.add(np.char.add(data["site"], "/"), data["sku"]), return_inverse=True)
+    arrival = (data["date"] - start).astype(np.int64)
+    # 入荷時点で出荷期限を過ぎているロットは入荷日に廃棄する
+    deadline = np.maximum((data["ship_by"] - start).astype(np.int64), arrival)
+    lots = {
+        "sku": sku,
+        "arrival": arrival,
+        "deadline": deadline,
+        "qty": data["qty"],
+        "unit_cost": data["unit_cost"],
+    }
+
+    shipped = np.char.add(np.char.add(shipments["site"], "/"), shipments["sku"])
+    pos = np.minimum(np.searchsorted(names, shipped), max(len(names) - 1, 0))
+    known = (names[pos] == shipped) if len(names) else np.zeros(len(shipped), dtype=bool)
+    rate = np.bincount(pos[known], weights=shipments["qty"][known], minlength=len(names)) / days
+    return lots, rate
+
+
+def format_disposal(comparison):
+    """期待廃棄率（売上高比・需要シナリオ加重、現状 → FEFO）の表示用文字列"""
+    before, after = comparison["expected_rate"]["fifo"], comparison["expected_rate"]["fefo"]
+    return f"期限切れ廃棄率 {before * 100:.2f}% → {after * 100:.2f}%"
+
+
+def sample_lots(skus=SKU_COUNT, days=HORIZON_DAYS, seed=0):
+    """食品卸を想定した合成ロット（定期発注・仕入先による入荷時の鮮度のばらつき・需要が落ちた滞留品）"""
+    rng = np.random.default_rng(seed)
+    planned = rng.lognormal(1.0, 1.0, skus)
+    # 一部のSKUは発注計画に対して実需要が落ちている（滞留・廃棄の主因）
+    slow = rng.uniform(0, 1, skus) < SLOW_MOVER_SHARE
+    rate = planned * np.where(slow, rng.uniform(0.5, 0.8, skus), rng.lognormal(0.0, 0.03, skus))
+    shelf_life = rng.choice(SHELF_LIFE_DAYS, skus)
+    window = np.floor(shelf_life * DELIVERY_RULE).astype(np.int64)
+    # 納品期限までの期間が短いSKUは発注間隔を短くする
+    review = np.where(window < 2 * REVIEW_DAYS[-1], REVIEW_DAYS[0], rng.choice(REVIEW_DAYS, skus))
+    unit_cost = np.round(rng.lognormal(5.5, 0.8, skus))
+
+    # 開始時の在庫（発注1回分を2ロット）と、発注間隔ごとの入荷
+    per_sku = days // review + 3
+    sku = np.repeat(np.arange(skus), per_sku)
+    index = np.arange(len(sku)) - np.repeat(np.cumsum(per_sku) - per_sku, per_sku)
+    opening = index < 2
+    phase = rng.integers(0, review)
+    arrival = np.where(opening, 0, phase[sku] + (index - 2) * review[sku])
+    cover = np.where(opening, 0.5, ORDER_COVER) * rng.lognormal(0.0, 0.15, len(sku))
+    qty = np.ceil(planned[sku] * review[sku] * cover).astype(np.int64)
+
+    # 入荷時点の経過日数：仕入先・製造ロットによりばらつく（開始在庫は納品期限までの期間の0-70%）
+    age = np.floor(window[sku] * rng.uniform(0, 1, len(sku)) * np.where(opening, 0.7, AGE_SPREAD)).astype(np.int64)
+    deadline = shipping_deadline(arrival, age, shelf_life[sku])
+
+    keep = arrival < days
+    lots = {
+        "sku": sku[keep],
+        "arrival": arrival[keep],
+        "deadline": deadline[keep],
+        "qty": np.maximum(qty[keep], 1),
+        "unit_cost": unit_cost[sku[keep]],
+    }
+    return lots, rate
+
+
+def _reference(lots, demand, policy):
+    """検証用：SKUごとのヒープでロットを管理する逐次シミュレーション（需要は日×シナリオ×SKU）"""
+    days, n_scen, n_sku = demand.shape
+    written_off = np.zeros(n_scen)
+    served = np.zeros(n_scen, dtype=np.int64)
+    key = lots["deadline"] if policy == "fefo" else lots["arrival"]
+    for s in range(n_scen):
+        heaps = [[] for _ in range(n_sku)]
+        incoming = sorted(range(len(lots["sku"])), key=lambda i: lots["arrival"][i])
+        qty = [int(q) for q in lots["qty"]]
+        nxt = 0
+        for day in range(days):
+            while nxt < len(incoming) and lots["arrival"][incoming[nxt]] <= day:
+                i = incoming[nxt]
+                heapq.heappush(heaps[lots["sku"][i]], (key[i], i))
+                nxt += 1
+            for k in range(n_sku):
+                need = int(demand[day, s, k])
+                heap = heaps[k]
+                while need and heap:
+                    # 期限切れロットは出荷前に除外
+                    i = heap[0][1]
+                    if lots["deadline"][i] < day:
+                        written_off[s] += qty[i] * lots["unit_cost"][i]
+                        heapq.heappop(heap)
+                        continue
+                    take = min(need, qty[i])
+                    qty[i] -= take
+                    need -= take
+                    served[s] += take
+                    if not qty[i]:
+                        heapq.heappop(heap)
+                # 当日で納品期限を迎えるロットを廃棄
+                for _, i in list(heap):
+                    if lots["deadline"][i] <= day and qty[i]:
+                        written_off[s] += qty[i] * lots["unit_cost"][i]
+                        qty[i] = 0
+                heaps[k] = [(d, i) for d, i in heap if qty[i]]
+                heapq.heapify(heaps[k])
+    return written_off, served
+
+
+def verify(skus=300, days=60, seed=1):
+    """小規模データで配列版とヒープ版の廃棄額・出荷数が一致するか確認"""
+    lots, rate = sample_lots(skus, days, seed)
+    # 共通乱数の需要系列を再現
+    rng = np.random.default_rng(seed)
+    multipliers = np.array([m for _, m in DEMAND_SCENARIOS])
+    demand = np.stack([rng.poisson(multipliers[:, None] * rate[None, :]) for _ in range(days)])
+    for policy in POLICIES:
+        result = simulate(lots, rate, policy, days, seed=seed)
+        written_off, served = _reference(lots, demand, policy)
+        if not (np.allclose(result["written_off"], written_off) and np.array_equal(result["served_units"], served)):
+            return False
+    return True
+
+
+def benchmark(skus=SKU_COUNT, days=HORIZON_DAYS):
+    """5万SKU・約100万ロット × 3シナリオ × 2方式 の所要時間と比較結果"""
+    lots, rate = sample_lots(skus, days)
+    start = time.perf_counter()
+    comparison = compare(lots, rate, days)
+    elapsed = time.perf_counter() - start
+    return {
+        "skus": skus,
+        "lots": len(lots["sku"]),
+        "days": days,
+        "seconds": elapsed,
+        "valid": verify(),
+        "comparison": comparison,
+        "effect": bridge_effect(comparison),
+    }
+
+
+if __name__ == "__main__":
+    r = benchmark()
+    c = r["comparison"]
+    print(f"SKU {r['skus']:,}  ロット {r['lots']:,}  {r['days']}日 × {len(DEMAND_SCENARIOS)}シナリオ × {len(POLICIES)}方式")
+    print(f"所要時間 {r['seconds']:.1f}秒  検証: {r['valid']}")
+    for s, (name, _) in enumerate(DEMAND_SCENARIOS):
+        fifo, fefo = c["results"]["fifo"], c["results"]["fefo"]
+        print(f"{name}: 廃棄 入荷順 {fifo['written_off'][s] / 1e6:,.1f}百万円 → FEFO {fefo['written_off'][s] / 1e6:,.1f}百万円  "
+              f"欠品 {fifo['lost_units'][s]:,} → {fefo['lost_units'][s]:,}個  "
+              f"廃棄率 {c['rates']['fifo'][s] * 100:.2f}% → {c['rates']['fefo'][s] * 100:.2f}%")
+    print(format_disposal(c))
+    print("総利益率ブリッジへの効果（low/base/high）: " + " / ".join(f"{v:+.2f}pt" for v in r["effect"]))
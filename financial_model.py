@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+財務モデルの計算グラフ（DAG）
+各指標をノードとして入力を宣言し、前提値の変更時は下流ノードのみ再計算して
+値の変わったノードを表示するスライドだけを再描画対象（dirty）にする。
+多数の前提セットのWhat-if計算はレベル単位でベクトル化して一括評価する。
+提案書（create_pptx・create_pptx_improved）の営業CF・CFマージン・物流コスト・経常利益率はこのモデルから求める
+（流動比率は working_capital、総利益率は profit_bridge の定義が正）
+"""
+
+from collections import deque
+
+import numpy as np
+
+from profit_bridge import ORDINARY_MARGIN
+from ranges import format_range
+
+# 前提値（TDB報告書・提案書より、単位：百万円）
+SALES = 480599
+LOGISTICS_COST = 35000
+OPERATING_CF = 4653
+# 営業CFマージンはTDB報告書の報告値（令和7年度）。定義が営業CF/売上高と一致しないため、
+# 改善後は報告値に営業CFの増加額/売上高を加えて求める
+CF_MARGIN = -0.0312
+INVENTORY = 14000
+# 在庫削減額（保守, 楽観）
+INVENTORY_CUT = (1000, 2000)
+
+
+def margin_component(name, margin=ORDINARY_MARGIN):
+    """利益率ブリッジの要因の改善幅（下限, 上限、比率）"""
+    values = dict(margin["components"])[name]
+    return values[0] / 100, values[-1] / 100
+
+
+def logistics_cut_rate(component="物流コスト削減", sales=SALES, cost=LOGISTICS_COST):
+    """経常利益率ブリッジの物流コスト削減幅（pt）を物流コスト削減率（下限, 上限）に換算"""
+    lo, hi = margin_component(component)
+    return lo * sales / cost, hi * sales / cost
+
+
+class FinancialModel:
+    """入力ノードと計算式ノードからなる財務モデル"""
+
+    def __init__(self):
+        self._inputs = {}
+        self._formulas = {}
+        self._children = {}
+        self._slides = {}
+        self._values = {}
+        self._dirty = set()
+        self._dirty_slides = set()
+        self._levels = None
+
+    def add_input(self, name, value, slides=()):
+        """前提値ノードを追加（slides はこの値を表示するスライドのビルダー名）"""
+        self._check_new(name)
+        value = _as_value(value)
+        self._inputs[name] = value
+        self._values[name] = value
+        self._children[name] = []
+        self._slides[name] = tuple(slides)
+        self._levels = None
+
+    def add_formula(self, name, inputs, func, slides=()):
+        """計算式ノードを追加（func は inputs の値を位置引数で受け取る）"""
+        self._check_new(name)
+        for dep in inputs:
+            if dep not in self._children:
+                raise KeyError(f"未定義のノードです: {dep}")
+            self._children[dep].append(name)
+        self._formulas[name] = (tuple(inputs), func)
+        self._children[name] = []
+        self._slides[name] = tuple(slides)
+        self._dirty.add(name)
+        self._levels = None
+
+    @property
+    def levels(self):
+        """トポロジカル順のレベル分割（同一レベル内は相互依存なし）"""
+        if self._levels is None:
+            self._levels = self._build_levels()
+        return self._levels
+
+    def set_input(self, name, value):
+        """前提値を変更し、下流ノードを再計算対象にする"""
+        if name not in self._inputs:
+            raise KeyError(f"入力ノードではありません: {name}")
+        value = _as_value(value)
+        if _same(self._values[name], value):
+            return
+        self._inputs[name] = value
+        self._values[name] = value
+        self._dirty_slides.update(self._slides[name])
+        self._dirty.update(self.downstream(name))
+
+    def downstream(self, name):
+        """指定ノードの下流ノード（自身を含まない）"""
+        seen = set()
+        queue = deque(self._children[name])
+        while queue:
+            node = queue.popleft()
+            if node in seen:
+                continue
+            seen.add(node)
+            queue.extend(self._children[node])
+        return seen
+
+    def recompute(self):
+        """再計算対象のノードのみをレベル順に評価し、再計算したノード名を返す"""
+        if not self._dirty:
+            return []
+
+        recomputed = []
+        for level in self.levels:
+            for name in level:
+                if name not in self._dirty:
+                    continue
+                inputs, func = self._formulas[name]
+                value = func(*(self._values[dep] for dep in inputs))
+                if name not in self._values or not _same(self._values[name], value):
+                    self._dirty_slides.update(self._slides[name])
+                self._values[name] = value
+                recomputed.append(name)
+
+        self._dirty.clear()
+        return recomputed
+
+    def value(self, name):
+        """ノードの現在値（必要なら再計算）"""
+        if self._dirty:
+            self.recompute()
+        return self._values[name]
+
+    def values(self):
+        """全ノードの現在値"""
+        if self._dirty:
+            self.recompute()
+        return dict(self._values)
+
+    def pop_dirty_slides(self):
+        """再描画が必要なスライド（ビルダー名）を返してクリア"""
+        if self._dirty:
+            self.recompute()
+        slides = self._dirty_slides
+        self._dirty_slides = set()
+        return slides
+
+    def evaluate_batch(self, assignments):
+        """前提値の配列（{入力名: 配列}）で全ノードをベクトル評価
+
+        未指定の入力は現在値をブロードキャストする。モデルの状態は変更しない。
+        """
+        unknown = set(assignments) - set(self._inputs)
+        if unknown:
+            raise KeyError(f"入力ノードではありません: {', '.join(sorted(unknown))}")
+
+        values = {name: np.asarray(assignments.get(name, value), dtype=float)
+                  for name, value in self._inputs.items()}
+        for level in self.levels:
+            for name in level:
+                inputs, func = self._formulas[name]
+                values[name] = func(*(values[dep] for dep in inputs))
+        return values
+
+    def _check_new(self, name):
+        if name in self._children:
+            raise ValueError(f"ノードが重複しています: {name}")
+
+    def _build_levels(self):
+        """計算式ノードを依存の深さでレベル分け（循環があればエラー）"""
+        depth = {name: 0 for name in self._inputs}
+        pending = dict(self._formulas)
+        levels = []
+        while pending:
+            ready = [name for name, (inputs, _) in pending.items() if all(dep in depth for dep in inputs)]
+            if not ready:
+                raise ValueError(f"循環参照があります: {', '.join(sorted(pending))}")
+            for name in ready:
+                depth[name] = len(levels) + 1
+                del pending[name]
+            levels.append(ready)
+        return levels
+
+
+def build_default_model(ranges=False):
+    """提案書の財務ストーリー（在庫削減・物流コスト削減→営業CF・CFマージン、経常利益率ブリッジ）のモデル
+
+    物流コスト削減率と、物流コスト以外の経常利益率の改善要因は ORDINARY_MARGIN、在庫削減額は INVENTORY_CUT による。
+    既定は中央値（感度分析用）。ranges=True では改善要因を (保守, 楽観) の2要素配列で持ち、
+    改善後の指標も同じ形のレンジになる（スライド表示用）
+    """
+    def driver(bounds):
+        bounds = np.asarray(bounds, dtype=float)
+        return bounds if ranges else float(bounds.mean())
+
+    model = FinancialModel()
+
+    model.add_input("売上高", SALES)
+    model.add_input("営業CF", OPERATING_CF, slides=["add_financial_simulation"])
+    model.add_input("CFマージン", CF_MARGIN, slides=[
+        "add_executive_summary_slide", "add_financial_analysis_1", "add_financial_analysis_3",
+        "add_financial_simulation", "add_expected_benefits",
+    ])
+    model.add_input("棚卸資産", INVENTORY, slides=["add_executive_summary_slide", "add_financial_analysis_3"])
+    model.add_input("物流コスト", LOGISTICS_COST, slides=[
+        "add_executive_summary_slide", "add_financial_analysis_3", "add_financial_simulation",
+    ])
+    model.add_input("経常利益率", ORDINARY_MARGIN["start"] / 100, slides=[
+        "add_executive_summary_slide", "add_financial_analysis_3",
+        "add_financial_simulation", "add_expected_benefits",
+    ])
+    model.add_input("在庫削減額", driver(INVENTORY_CUT), slides=["add_expected_benefits"])
+    model.add_input("物流コスト削減率", driver(logistics_cut_rate()))
+    for name in ("総利益率改善効果", "オペレーション効率化"):
+        model.add_input(name, driver(margin_component(name)))
+
+    # 改善効果
+    model.add_formula(
+        "物流コスト削減額", ["物流コスト", "物流コスト削減率"], lambda c, r: c * r,
+        slides=["add_financial_simulation", "add_expected_benefits"],
+    )
+    model.add_formula(
+        "改善後棚卸資産", ["棚卸資産", "在庫削減額"], lambda inv, cut: inv - cut,
+    )
+    model.add_formula(
+        "改善後物流コスト", ["物流コスト", "物流コスト削減額"], lambda c, cut: c - cut,
+        slides=["add_financial_simulation"],
+    )
+    model.add_formula(
+        "改善後営業CF", ["営業CF", "在庫削減額", "物流コスト削減額"],
+        lambda cf, inv_cut, cost_cut: cf + inv_cut + cost_cut,
+        slides=["add_financial_simulation"],
+    )
+    model.add_formula(
+        "改善後CFマージン", ["CFマージン", "営業CF", "改善後営業CF", "売上高"],
+        lambda margin, cf, improved, sales: margin + (improved - cf) / sales,
+        slides=["add_financial_simulation", "add_expected_benefits"],
+    )
+    model.add_formula(
+        "改善後経常利益率", ["経常利益率", "物流コスト削減額", "売上高", "総利益率改善効果", "オペレーション効率化"],
+        lambda margin, cut, sales, gross, operations: margin + cut / sales + gross + operations,
+        slides=["add_executive_summary_slide", "add_financial_simulation", "add_expected_benefits"],
+    )
+
+    return model
+
+
+def format_amount(values, unit="", signed=False):
+    """金額（百万円）を整形（単一値の報告値はそのまま、(保守, 楽観) の試算レンジは100百万円単位に丸める）"""
+    values = np.atleast_1d(np.asarray(values, dtype=float))
+    if len(values) > 1:
+        values = np.round(values, -2)
+    return format_range(values.min(), values.max(), unit, decimals=0, signed=signed)
+
+
+def format_margin(values):
+    """比率（スカラーまたは (保守, 楽観)）を「3.0-3.5%」「-2.3〜-1.9%」の形式に整形"""
+    values = np.atleast_1d(np.asarray(values, dtype=float)) * 100
+    lo, hi = values.min(), values.max()
+    if len(values) == 1 or round(lo, 1) == round(hi, 1):
+        return f"{values[0]:.2f}%"
+    if lo < 0:
+        return f"{lo:.1f}〜{hi:.1f}%"
+    return f"{lo:.1f}-{hi:.1f}%"
+
+
+def format_margin_change(start, values):
+    """比率の改善幅を「+1.3-1.8pt」の形式に整形"""
+    change = (np.atleast_1d(np.asarray(values, dtype=float)) - start) * 100
+    return format_range(change.min(), change.max(), "pt", decimals=1, signed=True)
+
+
+def _as_value(value):
+    """リスト・タプルで渡された前提値（保守, 楽観）を配列にする"""
+    if isinstance(value, (list, tuple)):
+        return np.asarray(value, dtype=float)
+    return value
+
+
+def _same(a, b):
+    """値が変化していないか（配列対応）"""
+    try:
+        return bool(np.array_equal(a, b))
+    except TypeError:
+        return a == b
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日次CSV（WMS/ERPの在庫・棚卸・入荷・出荷・受注、拠点別、Shift_JIS/CP932）の差分取り込み
+ファイルはサイズ・更新日時・SHA-1で、行はキー列と全列のハッシュで前回までの取り込みと照合し、
+新規・変更された行だけをデータストアへ追記する。取り込み後は断片化したパーティションを
+キーごとの最新版だけのスナップショットに圧縮し、訂正で別の月へ移った行は旧パーティションから消す。
+キー・基準日・整数の列が空欄の行と、日付・数値に変換できない値を含む行は取り込まず（件数は rows_rejected）、
+それ以外の日付の空欄は NaT、実数の空欄は NaN とする。日付はゼロ埋めなし（2026/3/1）・時刻付きも受け付ける。
+CSVは一定行数のチャンクで逐次読み（メモリ使用量はチャンク1つ分）、ファイル単位でプロセス並列に解析する
+"""
+
+import csv
+import hashlib
+import itertools
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from datastore import DATASETS, DataStore, row_hashes
+
+ENCODING = "cp932"
+CHUNK_ROWS = 100000
+
+# 年/月/日（- 区切り、ゼロ埋めなし、後続の時刻は無視）
+DATE_PATTERN = re.compile(r"(\d{4})[/-](\d{1,2})[/-](\d{1,2})(?:[ T].*)?")
+
+# 取り込み後にまとめるパーティションのフラグメント数
+# （変更行を追記したパーティションは旧版が残らないよう、この数に関係なくまとめる）
+COMPACT_THRESHOLD = 8
+
+# CSVの見出し → データストアの列名（見出しの組み合わせでデータセットを判定）
+HEADERS = {
+    "stock": {
+        "日付": "date",
+        "拠点": "site",
+        "品目コード": "sku",
+        "温度帯": "zone",
+        "ロケーション": "location",
+        "ロット": "lot",
+        "在庫数": "qty",
+        "単価": "unit_cost",
+        "在庫金額": "value",
+        "出荷期限": "ship_by",
+    },
+    "counts": {
+        "棚卸日": "date",
+        "拠点": "site",
+        "ロケーション": "location",
+        "品目コード": "sku",
+        "ロット": "lot",
+        "棚卸数": "qty",
+    },
+    "receipts": {
+        "入荷日": "date",
+        "拠点": "site",
+        "品目コード": "sku",
+        "ロット": "lot",
+        "入荷数": "qty",
+        "単価": "unit_cost",
+        "出荷期限": "ship_by",
+    },
+    "shipments": {
+        "出荷日": "date",
+        "拠点": "site",
+        "受注番号": "order_id",
+        "得意先": "customer",
+        "品目コード": "sku",
+        "数量": "qty",
+        "重量kg": "weight_kg",
+        "運賃": "cost",
+    },
+    "orders": {
+        "受注日": "date",
+        "拠点": "site",
+        "受注番号": "order_id",
+        "得意先": "customer",
+        "品目コード": "sku",
+        "数量": "qty",
+        "納期": "due_date",
+    },
+}
+
+LEDGER_DIR = "_ingest"
+
+
+class IngestLedger:
+    """取り込み済みの行のキーハッシュ → 行ハッシュ・格納先パーティション（拠点・月）の対応
+
+    配列はキーハッシュ順。キーに日付を含まないデータセット（出荷・受注）では、修正で日付が
+    月をまたぐと行が別のパーティションへ移るため、旧パーティションの版を消せるよう格納先を記録する。
+    """
+
+    def __init__(self, root, dataset):
+        self.directory = os.path.join(root, dataset, LEDGER_DIR)
+        path = os.path.join(self.directory, "rows.npz")
+        if os.path.exists(path):
+            with np.load(path) as ledger:
+                self.keys, self.rows = ledger["keys"], ledger["rows"]
+                # 格納先を記録していない旧形式の台帳は、移動の判定をしない（空の拠点）
+                self.sites = ledger["sites"] if "sites" in ledger else np.full(len(self.keys), "")
+                self.months = (ledger["months"] if "months" in ledger
+                               else np.full(len(self.keys), np.datetime64("NaT"), dtype="datetime64[M]"))
+        else:
+            self.keys = np.empty(0, dtype=np.uint64)
+            self.rows = np.empty(0, dtype=np.uint64)
+            self.sites = np.empty(0, dtype=str)
+            self.months = np.empty(0, dtype="datetime64[M]")
+
+    def classify(self, keys, rows, sites, months):
+        """(新規マスク, 変更マスク, 移動マスク, 移動前の (拠点, 月)) を返し、台帳を今回の値で更新
+
+        移動は変更行のうち格納先のパーティションが変わった行。
+        """
+        pos = np.searchsorted(self.keys, keys)
+        found = pos < len(self.keys)
+        found[found] = self.keys[pos[found]] == keys[found]
+        changed = found.copy()
+        changed[found] = self.rows[pos[found]] != rows[found]
+
+        at = pos[changed]
+        moved = changed.copy()
+        moved[changed] = (self.sites[at] != "") & (
+            (self.sites[at] != sites[changed]) | (self.months[at] != months[changed]))
+        previous = (self.sites[pos[moved]], self.months[pos[moved]])
+
+        self.rows[at] = rows[changed]
+        self.sites = self.sites.astype(np.result_type(self.sites, sites))
+        self.sites[at] = sites[changed]
+        self.months[at] = months[changed]
+        new = ~found
+        if new.any():
+            keys_all = np.concatenate([self.keys, keys[new]])
+            order = np.argsort(keys_all, kind="stable")
+            self.keys = keys_all[order]
+            self.rows = np.concatenate([self.rows, rows[new]])[order]
+            self.sites = np.concatenate([self.sites, sites[new]])[order]
+            self.months = np.concatenate([self.months, months[new]])[order]
+        return new, changed, moved, previous
+
+    def partition(self, keys):
+        """キーハッシュの現在の格納先 (拠点, 月)（未登録は空の拠点）"""
+        pos = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        if not len(self.keys):
+            return np.full(len(keys), ""), np.full(len(keys), np.datetime64("NaT"), dtype="datetime64[M]")
+        found = self.keys[pos] == keys
+        return np.where(found, self.sites[pos], ""), self.months[pos]
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = os.path.join(self.directory, "rows.tmp.npz")
+        np.savez(tmp, keys=self.keys, rows=self.rows, sites=self.sites, months=self.months)
+        os.replace(tmp, os.path.join(self.directory, "rows.npz"))
+
+
+def ingest(store, paths, workers=None, chunk_rows=CHUNK_ROWS):
+    """CSVファイル群を差分取り込みし、件数のレポートを返す"""
+    start = time.perf_counter()
+    fingerprints = _load_fingerprints(store.root)
+    report = {
+        "files": len(paths),
+        "files_skipped": 0,
+        "rows_read": 0,
+        "rows_new": 0,
+        "rows_changed": 0,
+        "rows_moved": 0,
+        "rows_unchanged": 0,
+        "rows_rejected": 0,
+        "partitions_compacted": 0,
+    }
+
+    # サイズ・更新日時が前回と同じファイルは読まずに除外
+    candidates = []
+    for path in paths:
+        stat = os.stat(path)
+        known = fingerprints.get(os.path.abspath(path))
+        if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+            report["files_skipped"] += 1
+            continue
+        candidates.append((path, known["sha1"] if known else None))
+
+    staging = tempfile.mkdtemp(prefix="ingest_")
+    tasks = [(path, sha1, staging, chunk_rows) for path, sha1 in candidates]
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(tasks))) if workers > 1 and len(tasks) > 1 else None
+    ledgers, touched, moved = {}, {}, {}
+    try:
+        results = executor.map(_parse_file, tasks) if executor else map(_parse_file, tasks)
+        # map は投入順に結果を返すため、同じキーの行はファイルの指定順で後勝ちになる
+        for (path, *_), result in zip(tasks, results):
+            stat = os.stat(path)
+            if result["dataset"] is None:
+                report["files_skipped"] += 1
+            else:
+                dataset = result["dataset"]
+                ledger = ledgers.setdefault(dataset, IngestLedger(store.root, dataset))
+                report["rows_rejected"] += result["rejected"]
+                for chunk_path in result["chunks"]:
+                    counts = _apply_chunk(store, dataset, ledger, chunk_path,
+                                          touched.setdefault(dataset, {}), moved.setdefault(dataset, {}))
+                    for key, value in counts.items():
+                        report[key] += value
+            fingerprints[os.path.abspath(path)] = {
+                "size": stat.st_size, "mtime": stat.st_mtime, "sha1": result["sha1"],
+            }
+    finally:
+        if executor:
+            executor.shutdown()
+        shutil.rmtree(staging, ignore_errors=True)
+
+    for dataset, ledger in ledgers.items():
+        ledger.save()
+        stale = _stale_keys(ledger, moved.get(dataset, {}))
+        partitions = set(touched.get(dataset, {})) | set(stale)
+        for site, month in sorted(partitions):
+            changed = touched.get(dataset, {}).get((site, month), False)
+            report["partitions_compacted"] += store.compact(
+                dataset, [site], [month], min_fragments=2 if changed else COMPACT_THRESHOLD,
+                drop_keys=stale.get((site, month)),
+            )
+    _save_fingerprints(store.root, fingerprints)
+
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+
+def _apply_chunk(store, dataset, ledger, chunk_path, touched, moved):
+    """解析済みチャンクを台帳と照合し、新規・変更行だけをストアへ追記
+
+    別のパーティションへ移った行は、移動前のパーティション → キーハッシュのリストとして moved に記録する。
+    """
+    with np.load(chunk_path) as chunk:
+        data = {col: chunk[col] for col in DATASETS[dataset]["columns"]}
+        keys, rows = chunk["_keys"], chunk["_rows"]
+    os.remove(chunk_path)
+
+    # チャンク内で同じキーが複数あれば最後の行だけを使う
+    _, last = np.unique(keys[::-1], return_index=True)
+    keep = np.sort(len(keys) - 1 - last)
+    months = data[DATASETS[dataset]["date"]].astype("datetime64[M]")
+    new, changed, shifted, (old_sites, old_months) = ledger.classify(
+        keys[keep], rows[keep], data["site"][keep], months[keep])
+    write = keep[new | changed]
+
+    if len(write):
+        batch = {col: values[write] for col, values in data.items()}
+        store.write(dataset, batch)
+        # 追記したパーティション → 変更行を含むか
+        flags = changed[new | changed]
+        for partition, flag in zip(zip(batch["site"].tolist(), months[write].astype(str).tolist()), flags.tolist()):
+            touched[partition] = touched.get(partition, False) or flag
+    for partition, key in zip(zip(old_sites.tolist(), old_months.astype(str).tolist()), keys[keep][shifted].tolist()):
+        moved.setdefault(partition, []).append(key)
+
+    return {
+        "rows_read": len(keys),
+        "rows_new": int(new.sum()),
+        "rows_changed": int(changed.sum()),
+        "rows_moved": int(shifted.sum()),
+        "rows_unchanged": len(keys) - int(new.sum()) - int(changed.sum()),
+    }
+
+
+def _stale_keys(ledger, moved):
+    """移動前のパーティションごとに、削除すべき旧版のキーハッシュ
+
+    同じ取り込みの中で元のパーティションへ戻った行は、現在の版なので除く。
+    """
+    stale = {}
+    for (site, month), keys in moved.items():
+        keys = np.unique(np.array(keys, dtype=np.uint64))
+        current_site, current_month = ledger.partition(keys)
+        away = (current_site != site) | (current_month.astype(str) != month)
+        if away.any():
+            stale[site, month] = keys[away]
+    return stale
+
+
+def _parse_file(task):
+    """ワーカー側：SHA-1を確認し、変わっていればチャンクごとに列配列とハッシュを書き出す"""
+    path, known_sha1, staging, chunk_rows = task
+    sha1 = _file_sha1(path)
+    if sha1 == known_sha1:
+        return {"dataset": None, "sha1": sha1, "chunks": [], "rejected": 0}
+
+    chunks, rejected = [], 0
+    with open(path, encoding=ENCODING, newline="") as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader)]
+        dataset = detect_dataset(header)
+        mapping = HEADERS[dataset]
+        index = [header.index(h) for h in mapping]
+        dtypes = DATASETS[dataset]["columns"]
+        schema = DATASETS[dataset]
+
+        stem = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12]
+        for n in itertools.count():
+            rows = list(itertools.islice(reader, chunk_rows))
+            if not rows:
+                break
+            fields = list(zip(*rows))
+            data, valid = {}, np.ones(len(rows), dtype=bool)
+            required = set(schema["keys"]) | {schema["date"]}
+            for i, col in zip(index, mapping.values()):
+                data[col], present, parsed = _convert(fields[i], dtypes[col])
+                # 変換できない値と、キー・基準日の列・整数の空欄は補えないため行ごと取り込まない
+                # （それ以外の日付の空欄は NaT、実数の空欄は NaN）
+                valid &= parsed
+                if col in required or dtypes[col].startswith("int"):
+                    valid &= present
+            if not valid.all():
+                rejected += int((~valid).sum())
+                data = {col: values[valid] for col, values in data.items()}
+            chunk_path = os.path.join(staging, f"{stem}_{n:05d}.npz")
+            np.savez(
+                chunk_path,
+                _keys=row_hashes(data, schema["keys"]),
+                _rows=row_hashes(data, list(dtypes)),
+                **data,
+            )
+            chunks.append(chunk_path)
+    return {"dataset": dataset, "sha1": sha1, "chunks": chunks, "rejected": rejected}
+
+
+def detect_dataset(header):
+    """見出し行からデータセット名を判定"""
+    names = set(header)
+    for dataset, mapping in HEADERS.items():
+        if set(mapping) <= names:
+            return dataset
+    raise ValueError(f"見出しが既知のデータセットに一致しません: {', '.join(header)}")
+
+
+def _convert(values, dtype):
+    """CSVの文字列列を列の型に変換（日付の / 区切り・ゼロ埋めなし、数値の桁区切りに対応）
+
+    (値, 空欄でないマスク, 変換できたマスク) を返す。空欄は変換できた扱いで、日付が NaT、実数が NaN、
+    整数は仮に0とする。変換できない値も同じ仮の値にする（呼び出し側でマスクを見て行を除く）。
+    変換は重複を除いた値ごとに行う（日付・数量の列は値の種類が行数よりずっと少ない）。
+    """
+    values = np.char.strip(np.array(values, dtype=str))
+    present = values != ""
+    if dtype.startswith("datetime64"):
+        unique, inverse = np.unique(values, return_inverse=True)
+        converted = np.array([_parse_date(v) for v in unique], dtype=dtype)[inverse]
+        return converted, present, ~np.isnat(converted) | ~present
+    if dtype.startswith(("int", "float")):
+        values = np.char.replace(values, ",", "")
+        values[~present] = "nan" if dtype.startswith("float") else "0"
+        try:
+            return values.astype(dtype), present, np.ones(len(values), dtype=bool)
+        except ValueError:
+            unique, inverse = np.unique(values, return_inverse=True)
+            numbers = np.array([_parse_number(v) for v in unique])
+            ok = ~np.isnan(numbers) | (unique == "nan")
+            if dtype.startswith("int"):
+                # 「1.0」のような整数値の実数表記は受け付ける
+                ok &= np.isnan(numbers) | (numbers == np.round(numbers))
+                numbers = np.where(ok, numbers, 0)
+            return numbers[inverse].astype(dtype), present, ok[inverse]
+    return values.astype(dtype), present, np.ones(len(values), dtype=bool)
+
+
+def _parse_date(text):
+    """日付の文字列を ISO 形式（YYYY-MM-DD）に正規化（空欄・変換できない値は NaT）"""
+    match = DATE_PATTERN.fullmatch(text)
+    if match is None:
+        return "NaT"
+    year, month, day = (int(v) for v in match.groups())
+    try:
+        return np.datetime64(f"{year:04d}-{month:02d}-{day:02d}", "D")
+    except ValueError:
+        return "NaT"
+
+
+def _parse_number(text):
+    """数値の文字列を実数に変換（変換できない値は NaN）"""
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+def _file_sha1(path, block=1 << 20):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(block), b""):
+            sha1.update(data)
+    return sha1.hexdigest()
+
+
+def _load_fingerprints(root):
+    path = os.path.join(root, LEDGER_DIR, "files.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_fingerprints(root, fingerprints):
+    directory = os.path.join(root, LEDGER_DIR)
+    os.makedirs(directory, exist_ok=True)
+    tmp = os.path.join(directory, "files.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(fingerprints, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(directory, "files.json"))
+
+
+# ---------------------------------------------------------------------------
+# 計測（合成の日次出荷CSVを取り込み、再実行・一部修正時の差分だけが追記されることを確認）
+# ---------------------------------------------------------------------------
+
+def write_daily_csv(directory, day, site, rows=20000, seed=0, start="2026-03-01"):
+    """合成の日次出荷CSV（CP932・日本語見出し）を書き出してパスを返す"""
+    rng = np.random.default_rng([seed, day, int(site[1:])])
+    date = (np.datetime64(start) + day).astype(str).replace("-", "/")
+    path = os.path.join(directory, f"出荷_{site}_{date.replace('/', '')}.csv")
+    with open(path, "w", encoding=ENCODING, newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS["shipments"])
+        qty = rng.integers(1, 50, rows)
+        for i in range(rows):
+            writer.writerow([
+                date, site, f"O{day:03d}{site}{i:06d}", f"得意先{rng.integers(800):03d}",
+                f"SKU{rng.integers(5000):04d}", qty[i], f"{qty[i] * 3.2:.1f}", f"{qty[i] * 85:,}",
+            ])
+    return path
+
+
+def benchmark(days=10, sites=("S01", "S02", "S03", "S04"), rows=20000):
+    """初回取り込み・再実行（全ファイル未変更）・1ファイル修正後の取り込みを計測"""
+    with tempfile.TemporaryDirectory() as directory:
+        csv_dir = os.path.join(directory, "csv")
+        os.makedirs(csv_dir)
+        paths = [write_daily_csv(csv_dir, d, s, rows) for d in range(days) for s in sites]
+        store = DataStore(os.path.join(directory, "store"))
+
+        results = [("初回", ingest(store, paths))]
+        results.append(("再実行（変更なし）", ingest(store, paths)))
+
+        # 1ファイルの先頭100行の数量を変更、続く10行の出荷日を翌月に訂正し、100行を追加
+        with open(paths[0], encoding=ENCODING, newline="") as f:
+            lines = list(csv.reader(f))
+        for row in lines[1:101]:
+            row[5] = str(int(row[5]) + 1)
+        for row in lines[101:111]:
+            row[0] = "2026/04/01"
+        lines += [[*lines[1][:2], f"X{i:06d}", *lines[1][3:]] for i in range(100)]
+        with open(paths[0], "w", encoding=ENCODING, newline="") as f:
+            csv.writer(f).writerows(lines)
+        results.append(("1ファイル修正", ingest(store, paths)))
+
+        total = len(store.scan("shipments", columns=["qty"])["qty"])
+        return results, total
+
+
+if __name__ == "__main__":
+    results, total = benchmark()
+    for label, r in results:
+        print(f"{label:<12} {r['seconds']:6.2f}秒  ファイル {r['files'] - r['files_skipped']}/{r['files']}  "
+              f"読込 {r['rows_read']:,}行  新規 {r['rows_new']:,}  変更 {r['rows_changed']:,}"
+              f"（月移動 {r['rows_moved']:,}）  "
+              f"圧縮 {r['partitions_compacted']}")
+    print(f"ストアの行数: {total:,}")
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+宣言的レイアウトソルバー（カード・グリッド配置）
+行・列・スタック・間隔・整列を記述し、全シェイプの絶対座標（EMU）を一括で求める
+同一構造のレイアウトは構造シグネチャでメモ化する
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+from pptx.util import Emu
+
+Rect = namedtuple("Rect", ["left", "top", "width", "height"])
+
+
+def box(width=None, height=None, weight=1):
+    """末端の矩形（幅・高さ未指定なら残り領域を重みで分配）"""
+    return ("box", _emu(width), _emu(height), weight)
+
+
+def row(*children, gap=0, align="start"):
+    """横方向に並べる"""
+    return ("row", tuple(children), _emu(gap), align)
+
+
+def stack(*children, gap=0, align="start"):
+    """縦方向に積み重ねる"""
+    return ("stack", tuple(children), _emu(gap), align)
+
+
+def grid(rows, cols, gap=0, row_gap=None, width=None, height=None):
+    """rows×colsのカードグリッド（セル順は行優先）"""
+    cells = tuple(box(width, height) for _ in range(cols))
+    return stack(
+        *(row(*cells, gap=gap) for _ in range(rows)),
+        gap=gap if row_gap is None else row_gap,
+    )
+
+
+@lru_cache(maxsize=4096)
+def solve_layout(node, left, top, width, height):
+    """レイアウトを解き、末端矩形のRectタプル（定義順）を返す"""
+    out = []
+    _solve(node, int(left), int(top), int(width), int(height), out)
+    return tuple(out)
+
+
+def _solve(node, left, top, width, height, out):
+    """ノードを指定領域に配置し、末端矩形をoutに追加"""
+    kind = node[0]
+
+    if kind == "box":
+        _, w, h, _ = node
+        out.append(Rect(Emu(left), Emu(top), Emu(width if w is None else w), Emu(height if h is None else h)))
+        return
+
+    _, children, gap, align = node
+    horizontal = kind == "row"
+    main = width if horizontal else height
+    cross = height if horizontal else width
+
+    sizes = _main_sizes(children, main - gap * (len(children) - 1), horizontal)
+
+    pos = left if horizontal else top
+    for child, size in zip(children, sizes):
+        extent = _fixed(child, not horizontal)
+        extent = cross if extent is None else extent
+        offset = _align_offset(align, cross, extent)
+        if horizontal:
+            _solve(child, pos, top + offset, size, extent, out)
+        else:
+            _solve(child, left + offset, pos, extent, size, out)
+        pos += size + gap
+
+
+def _main_sizes(children, available, horizontal):
+    """主軸方向のサイズ（固定サイズ優先、残りを重みで分配）"""
+    fixed = [_fixed(child, horizontal) for child in children]
+    remaining = available - sum(s for s in fixed if s is not None)
+    weights = [_weight(child) if s is None else 0 for child, s in zip(children, fixed)]
+    total = sum(weights)
+
+    sizes = []
+    for s, w in zip(fixed, weights):
+        if s is None:
+            s = remaining * w // total if total else 0
+        sizes.append(s)
+    return sizes
+
+
+def _fixed(node, horizontal):
+    """ノードの固定サイズ（boxのみ、未指定はNone）"""
+    if node[0] != "box":
+        return None
+    return node[1] if horizontal else node[2]
+
+
+def _weight(node):
+    """可変サイズ分配の重み"""
+    return node[3] if node[0] == "box" else 1
+
+
+def _align_offset(align, available, extent):
+    """交差軸方向の整列オフセット"""
+    if align == "center":
+        return (available - extent) // 2
+    if align == "end":
+        return available - extent
+    return 0
+
+
+def _emu(value):
+    """長さをint（EMU）に正規化（Noneはそのまま）"""
+    return None if value is None else int(value)
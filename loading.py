@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+トラックの積付け計画（パレット・カゴ車・ケースの3次元積載）
+配送コースごとの荷物を、重量・容積・温度帯・配送順の制約のもとでトラックに積み付ける。
+配置はエクストリームポイント法（置いた荷物の角から生じる候補点のうち、奥・下・左を優先）で決め、
+後で降ろす荷物が先に降ろす荷物の手前を塞がないようにする（配送順の逆に積む）。
+現状（固定仕切りの10t車・段積みなし）と、可動仕切り・車格選択・段積み・回転ありの計画を比較し、
+積載率・必要台数と、車格の見直しによる積載容量の削減を求める。1日分の全コースをチャンクに分けてプロセスプールで計算する
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+ZONES = ("冷凍", "冷蔵", "常温")
+
+# 車格：荷室の内寸（cm：長さ・幅・高さ）と最大積載量（kg）。小さい順
+TRUCKS = {
+    "4t": ((620, 210, 220), 3_500),
+    "6t": ((720, 225, 230), 6_000),
+    "10t": ((960, 235, 240), 9_000),
+}
+
+# 多温度帯車の仕切り板の厚さ（cm）と、現状の固定仕切り（荷室長さに対する温度帯別の割合）
+PARTITION = 5
+FIXED_COMPARTMENTS = (0.25, 0.25, 0.5)
+
+# 段積みの条件：下の荷物の上面で支える底面積の割合
+SUPPORT_RATIO = 0.75
+
+# 積み方：pack_truck のオプションと使える車格（小さい順）。
+# 現状は仕切り固定の10t車に段積み・回転なし、計画は仕切り可動で段積み・回転あり・車格選択
+LAYOUTS = {
+    "current": (dict(allow_stack=False, allow_rotate=False, fixed=True), ("10t",)),
+    "planned": (dict(allow_stack=True, allow_rotate=True, fixed=False), tuple(TRUCKS)),
+}
+
+# 並列計算の1チャンクあたりコース数
+CHUNK_ROUTES = 50
+
+# 合成データ：1日のコース数、1コースの配送先数の範囲、配車担当が現状の積み方（固定仕切りの10t車1台・
+# 段積みなし）で積める範囲で荷物を加えるときの目標積載率（現状の積載率65-70%に合わせる）と、
+# 載らなかった荷物を別の荷物で試す回数、温度帯ごとの荷姿別の構成比
+ROUTE_COUNT = 300
+ROUTE_STOPS = (3, 10)
+ROUTE_LOAD = (0.64, 0.9)
+ROUTE_TRIES = 5
+UNIT_MIX = {
+    "pallet": (0.4, 0.4, 1.2),
+    "cage": (0.6, 0.8, 0.5),
+    "case": (1.5, 2.0, 2.0),
+}
+
+# 荷姿：底面寸法・高さの範囲（cm）、重量の範囲（kg）
+PALLET = ((110, 110), (100, 150), (300, 700))
+CAGE = ((80, 65), (170, 170), (80, 250))
+CASE = ((60, 40), (30, 50), (8, 20))
+
+
+def _fits(origin, dims, lo, hi, stop, stackable, same_zone, bounds, room, item_stop, allow_stack):
+    """候補点 origin（候補×3）に dims の荷物を置けるかを候補ごとに判定"""
+    end = origin + dims
+    ok = (origin[:, 0] >= bounds[0]) & (end[:, 0] <= bounds[1]) & np.all(end <= room, axis=1)
+    if not allow_stack or not len(lo):
+        ok &= origin[:, 2] == 0
+    if not len(lo):
+        return ok
+
+    # 既存の荷物との重なり
+    overlap = np.all((origin[:, None, :] < hi[None]) & (end[:, None, :] > lo[None]), axis=2)
+    ok &= ~overlap.any(axis=1)
+
+    # 床置き、または真下の荷物（段積み可）で底面の一定割合を支える
+    dx = np.clip(np.minimum(end[:, None, 0], hi[None, :, 0]) - np.maximum(origin[:, None, 0], lo[None, :, 0]), 0, None)
+    dy = np.clip(np.minimum(end[:, None, 1], hi[None, :, 1]) - np.maximum(origin[:, None, 1], lo[None, :, 1]), 0, None)
+    under = (hi[None, :, 2] == origin[:, None, 2]) & stackable[None]
+    supported = (dx * dy * under).sum(axis=1) >= SUPPORT_RATIO * dims[0] * dims[1]
+    ok &= (origin[:, 2] == 0) | supported
+
+    # 同じ区画で後に降ろす荷物（配送順が後）が、この荷物と扉（区画の後端側）の間を塞がない
+    dz = np.minimum(end[:, None, 2], hi[None, :, 2]) > np.maximum(origin[:, None, 2], lo[None, :, 2])
+    later = same_zone & (stop > item_stop)
+    blocking = later[None] & (dy > 0) & dz & (lo[None, :, 0] >= end[:, None, 0])
+    return ok & ~blocking.any(axis=1)
+
+
+def compartments(truck, fixed):
+    """温度帯別の区画（荷室長さ方向の範囲）。固定でなければ None（積んだ位置で仕切る）"""
+    if not fixed:
+        return None
+    length = TRUCKS[truck][0][0]
+    edges = np.round(np.concatenate([[0], np.cumsum(FIXED_COMPARTMENTS)]) * length).astype(np.int64)
+    return [(int(edges[z]) + (PARTITION if z else 0), int(edges[z + 1])) for z in range(len(ZONES))]
+
+
+def pack_truck(items, order, truck, allow_stack=True, allow_rotate=True, fixed=False):
+    """order の順に荷物を1台に積み付け、積めた荷物・その配置（始点・終点）・積めなかった荷物を返す
+
+    温度帯は ZONES の順に奥から区画を取り、区画ごとに扉がある（配送順の制約は区画内で見る）。
+    fixed=True は仕切りの位置が固定の車両、それ以外は前の温度帯を積み終えた位置に仕切り板を入れる。
+    """
+    room, payload = np.array(TRUCKS[truck][0]), TRUCKS[truck][1]
+    dims_all, weight, zone, stop, stackable = (
+        items["dims"], items["weight"], items["zone"], items["stop"], items["stackable"])
+    fixed_bounds = compartments(truck, fixed)
+    lo = np.zeros((0, 3), dtype=np.int64)
+    hi = np.zeros((0, 3), dtype=np.int64)
+    placed, unplaced = [], []
+    load = 0.0
+    points = np.zeros((0, 3), dtype=np.int64)
+    bounds, current_zone = (0, int(room[0])), None
+
+    for i in order:
+        if zone[i] != current_zone:
+            current_zone = zone[i]
+            if fixed_bounds is not None:
+                bounds = fixed_bounds[current_zone]
+            elif len(placed):
+                bounds = (int(hi[:, 0].max()) + PARTITION, int(room[0]))
+            points = np.vstack([points, [[bounds[0], 0, 0]]])
+        if load + weight[i] > payload:
+            unplaced.append(i)
+            continue
+
+        best = None
+        shapes = [dims_all[i]]
+        if allow_rotate and dims_all[i][0] != dims_all[i][1]:
+            shapes.append(dims_all[i][[1, 0, 2]])
+        for dims in shapes:
+            ok = _fits(points, dims, lo, hi, stop[placed], stackable[placed], zone[placed] == zone[i],
+                       bounds, room, stop[i], allow_stack)
+            if ok.any():
+                candidates = points[ok]
+                # 奥（x）・下（z）・左（y）の順に優先
+                k = np.lexsort((candidates[:, 1], candidates[:, 2], candidates[:, 0]))[0]
+                if best is None or tuple(candidates[k][[0, 2, 1]]) < tuple(best[0][[0, 2, 1]]):
+                    best = (candidates[k], dims)
+        if best is None:
+            unplaced.append(i)
+            continue
+
+        origin, dims = best
+        lo = np.vstack([lo, origin])
+        hi = np.vstack([hi, origin + dims])
+        placed.append(i)
+        load += weight[i]
+        # 新しいエクストリームポイント（長さ・幅・高さ方向の角）。荷物の内部に入った点は除く
+        points = np.vstack([points, origin + np.diag(dims)])
+        inside = np.all((points[:, None, :] >= lo[None]) & (points[:, None, :] < hi[None]), axis=2).any(axis=1)
+        points = np.unique(points[~inside], axis=0)
+
+    return placed, lo, hi, unplaced
+
+
+def _load_sequence(items, indices):
+    """温度帯順、配送順の逆（最後の配送先を最初）、底面積・容積の大きい順に並べる"""
+    dims = items["dims"][indices]
+    key = (dims[:, 0] * dims[:, 1], dims.prod(axis=1))
+    return indices[np.lexsort((-key[1], -key[0], -items["stop"][indices], items["zone"][indices]))]
+
+
+def build_route(items, plan="planned", current=None):
+    """1コース分の荷物をトラックに積み付け、使用した車両（車格・積載容積・重量・床面積・積み方）のリストを返す
+
+    plan="current" は仕切り固定の10t車に段積み・回転なしで積む。
+    plan="planned" は仕切り可動の車両に段積み・回転ありで積み、全量が載る最小の車格を選ぶ。
+    ただし現状の積み方（current、未指定なら計算）も候補に残し、台数・積載容量（最大積載量の合計）の
+    少ない方を採るため、計画がコース単位で現状より悪くなることはない。
+    """
+    if plan not in LAYOUTS:
+        raise ValueError(f"未対応の計画です: {plan}")
+    trucks = _pack_route(items, plan)
+    if plan == "planned":
+        current = current if current is not None else _pack_route(items, "current")
+        trucks = min((trucks, current), key=_route_cost)
+    return trucks
+
+
+def _route_cost(trucks):
+    """コースの積付けの優劣（台数、積載容量の合計の順に少ない方が良い）"""
+    return len(trucks), sum(TRUCKS[t[0]][1] for t in trucks)
+
+
+def _pack_route(items, layout):
+    """積み方 layout で全量を積み終えるまで車両を追加する（各車両は全量が載る最小の車格）"""
+    options, sizes = LAYOUTS[layout]
+    volume = items["dims"].prod(axis=1)
+    trucks = []
+    remaining = _load_sequence(items, np.arange(len(volume)))
+    while len(remaining):
+        for size in sizes:
+            placed, lo, hi, unplaced = pack_truck(items, remaining, size, **options)
+            if not unplaced:
+                break
+        if not placed:
+            raise ValueError("荷室に入らない荷物があります")
+        extent = hi - lo
+        floor = float((extent[:, 0] * extent[:, 1])[lo[:, 2] == 0].sum())
+        trucks.append((size, float(volume[placed].sum()), float(items["weight"][placed].sum()), floor, layout))
+        remaining = np.array(unplaced, dtype=np.int64)
+    return trucks
+
+
+def fill_rates(trucks):
+    """車両リストから台数と積載率を集計
+
+    積載率は車両ごとに重量・床面積の使用率の大きい方（カゴ車・パレットは床面積、重量物は重量で埋まる）の平均。
+    """
+    size = [t[0] for t in trucks]
+    volume, weight, floor = (np.array([t[k] for t in trucks]) for k in (1, 2, 3))
+    room = np.array([TRUCKS[s][0] for s in size], dtype=float).reshape(-1, 3)
+    payload = np.array([TRUCKS[s][1] for s in size], dtype=float)
+    volume, weight, floor = volume / room.prod(axis=1), weight / payload, floor / (room[:, 0] * room[:, 1])
+    return {
+        "trucks": len(trucks),
+        "volume_fill": float(volume.mean()),
+        "weight_fill": float(weight.mean()),
+        "floor_fill": float(floor.mean()),
+        "fill": float(np.maximum(weight, floor).mean()),
+    }
+
+
+def build_day(routes, workers=None):
+    """1日分のコースを現状・計画の両方で積み付け、コース別の車両リストを返す"""
+    chunks = [routes[i:i + CHUNK_ROUTES] for i in range(0, len(routes), CHUNK_ROUTES)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) <= 1:
+        results = [_build_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            results = list(executor.map(_build_chunk, chunks))
+    return {
+        plan: [trucks for result in results for trucks in result[plan]]
+        for plan in ("current", "planned")
+    }
+
+
+def _build_chunk(routes):
+    """ワーカー側でコースのまとまりを順に積み付ける（計画は現状の積付けを候補に含める）"""
+    current = [build_route(items, "current") for items in routes]
+    planned = [build_route(items, "planned", trucks) for items, trucks in zip(routes, current)]
+    return {"current": current, "planned": planned}
+
+
+def summarize(day):
+    """現状・計画の台数と積載率、台数・積載容量（車格別の最大積載量の合計）の削減率"""
+    result = {plan: fill_rates([t for trucks in day[plan] for t in trucks]) for plan in day}
+    result["truck_reduction"] = 1 - result["planned"]["trucks"] / result["current"]["trucks"]
+    payload = {plan: sum(TRUCKS[t[0]][1] for trucks in day[plan] for t in trucks) for plan in day}
+    result["capacity_reduction"] = 1 - payload["planned"] / payload["current"]
+    return result
+
+
+def format_fill(summary):
+    """積載率の現状 → 計画を「65% → 82%」の形式に整形"""
+    return f"{summary['current']['fill'] * 100:.0f}% → {summary['planned']['fill'] * 100:.0f}%"
+
+
+def format_reduction(summary):
+    """車格の見直しによる積載容量の削減率を「積載容量21%減」の形式に整形"""
+    return f"積載容量{summary['capacity_reduction'] * 100:.0f}%減"
+
+
+def sample_routes(n_routes=ROUTE_COUNT, seed=0):
+    """合成データの1日分のコース（配送先・温度帯ごとのパレット・カゴ車・ケース）
+
+    現状の配車に合わせ、固定仕切りの10t車1台に現状の積み方で載る範囲で、積載率が ROUTE_LOAD の
+    範囲の目標に達するまで荷物を加える（載らない荷物は ROUTE_TRIES 回まで別の荷物で試す）。
+    温度帯は固定仕切りの区画の大きさの割合で選ぶ。
+    """
+    rng = np.random.default_rng(seed)
+    kinds = list(UNIT_MIX)
+    routes = []
+    for _ in range(n_routes):
+        stops = int(rng.integers(*ROUTE_STOPS, endpoint=True))
+        target = rng.uniform(*ROUTE_LOAD)
+        items = {
+            "dims": np.zeros((0, 3), dtype=np.int64),
+            "weight": np.zeros(0),
+            "zone": np.zeros(0, dtype=np.int64),
+            "stop": np.zeros(0, dtype=np.int64),
+            "stackable": np.zeros(0, dtype=bool),
+        }
+        failures = 0
+        while failures < ROUTE_TRIES:
+            z = int(rng.choice(len(ZONES), p=FIXED_COMPARTMENTS))
+            mix = np.array([UNIT_MIX[kind][z] for kind in kinds])
+            dims, weight, stackable = _sample_unit(rng, kinds[rng.choice(len(kinds), p=mix / mix.sum())])
+            trial = {
+                "dims": np.vstack([items["dims"], [dims]]),
+                "weight": np.append(items["weight"], weight),
+                "zone": np.append(items["zone"], z),
+                "stop": np.append(items["stop"], int(rng.integers(stops))),
+                "stackable": np.append(items["stackable"], stackable),
+            }
+            trucks = build_route(trial, "current")
+            if len(trucks) > 1:
+                failures += 1
+                continue
+            items = trial
+            if fill_rates(trucks)["fill"] >= target:
+                break
+        routes.append(items)
+    return routes
+
+
+def _sample_unit(rng, kind):
+    """荷姿 kind の荷物1個の (寸法, 重量, 段積み可否)"""
+    if kind == "pallet":
+        height = int(rng.integers(PALLET[1][0] // 10, PALLET[1][1] // 10, endpoint=True)) * 10
+        return (*PALLET[0], height), rng.uniform(*PALLET[2]), height <= 130
+    if kind == "cage":
+        return (*CAGE[0], CAGE[1][0]), rng.uniform(*CAGE[2]), False
+    height = int(rng.integers(CASE[1][0] // 10, CASE[1][1] // 10, endpoint=True)) * 10
+    return (*CASE[0], height), rng.uniform(*CASE[2]), True
+
+
+def estimate(n_routes=40, seed=0):
+    """合成データ（縮小版）で積載率・台数の改善を推計"""
+    return summarize(build_day(sample_routes(n_routes, seed), workers=1))
+
+
+def verify(routes, day):
+    """計画の積付けで重なり・はみ出し・重量超過・配送順の塞ぎがないか確認"""
+    for items, trucks in zip(routes, day["planned"]):
+        remaining = _load_sequence(items, np.arange(len(items["weight"])))
+        for size, *_, layout in trucks:
+            placed, lo, hi, unplaced = pack_truck(items, remaining, size, **LAYOUTS[layout][0])
+            stop, zone = items["stop"][placed], items["zone"][placed]
+            if np.any(lo < 0) or np.any(hi > np.array(TRUCKS[size][0])):
+                return False
+            if items["weight"][placed].sum() > TRUCKS[size][1]:
+                return False
+            for a in range(len(placed)):
+                for b in range(len(placed)):
+                    if a != b and np.all((lo[a] < hi[b]) & (hi[a] > lo[b])):
+                        return False
+                    # 同じ区画で b が a より後の配送先で、a と扉の間にある
+                    yz = np.all((lo[a, 1:] < hi[b, 1:]) & (hi[a, 1:] > lo[b, 1:]))
+                    if zone[a] == zone[b] and stop[b] > stop[a] and yz and lo[b, 0] >= hi[a, 0]:
+                        return False
+            remaining = np.array(unplaced, dtype=np.int64)
+    return True
+
+
+def benchmark(n_routes=ROUTE_COUNT, workers=None):
+    """1日300コースの積付け所要時間（逐次・並列）と現状比の改善"""
+    routes = sample_routes(n_routes)
+    start = time.perf_counter()
+    day = build_day(routes, workers=1)
+    sequential = time.perf_counter() - start
+    start = time.perf_counter()
+    build_day(routes, workers=workers)
+    parallel = time.perf_counter() - start
+    return {
+        "routes": n_routes,
+        "items": sum(len(r["weight"]) for r in routes),
+        "sequential": sequential,
+        "parallel": parallel,
+        "workers": workers or os.cpu_count() or 1,
+        "valid": verify(routes[:20], {"planned": day["planned"][:20]}),
+        "summary": summarize(day),
+    }
+
+
+if __name__ == "__main__":
+    r = benchmark()
+    s = r["summary"]
+    print(f"コース {r['routes']}  荷物 {r['items']:,}個  検証: {r['valid']}")
+    print(f"所要時間 逐次 {r['sequential']:.1f}秒 / 並列（{r['workers']}プロセス） {r['parallel']:.1f}秒")
+    for plan, label in (("current", "現状"), ("planned", "計画")):
+        print(f"{label}: {s[plan]['trucks']}台  容積 {s[plan]['volume_fill'] * 100:.1f}%  "
+              f"重量 {s[plan]['weight_fill'] * 100:.1f}%  床面積 {s[plan]['floor_fill'] * 100:.1f}%")
+    print(f"積載率 {format_fill(s)}  台数 {s['truck_reduction'] * 100:.0f}%減  {format_reduction(s)}")
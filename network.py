@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+物流拠点網の設計（拠点の統廃合・新設の評価）
+地域別の需要、拠点の固定費・荷役単価・能力、幹線（供給拠点→物流拠点）と配送（物流拠点→地域）の
+輸送単価から、どの拠点を開設・閉鎖し、各地域をどの拠点から配送するかを容量制約付き施設配置問題として解く。
+需要の充足制約をラグランジュ緩和し、劣勾配法で下界を上げながら、緩和解の開設拠点を修復して
+輸送問題（最小費用流）で実行可能解（上界）を求め、最後に開設・閉鎖の入れ替えで改善する。
+需要・輸送単価のシナリオ×候補網（現状維持・統廃合のみ・統廃合＋新設）をプロセスプールで並列に評価し、
+現状維持との費用差（年間削減額・一時費用）を求める
+"""
+
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ranges import RangeArray
+from rebalance import MinCostFlow
+
+# 需要・輸送単価のシナリオ（名称, 需要の倍率, 輸送単価の倍率）
+SCENARIOS = (
+    ("保守", 0.97, 1.10),
+    ("基準", 1.00, 1.00),
+    ("楽観", 1.03, 0.95),
+)
+
+# 候補網：現状維持（既存拠点をすべて使う）、統廃合のみ（既存拠点の閉鎖を許す）、統廃合＋新設
+CONFIGURATIONS = ("現状維持", "統廃合のみ", "統廃合＋新設")
+
+# 輸送単価（円/t・km）：供給拠点からの幹線、物流拠点からの配送
+LINEHAUL_PER_TKM = 15
+DELIVERY_PER_TKM = 60
+
+# 拠点の閉鎖費用・新設費用（一時費用、百万円/拠点）
+CLOSING_COST = 40
+OPENING_COST = 60
+
+# 配送の候補とする拠点（地域ごとに近い順の件数）
+MAX_LANES = 6
+
+# 局所探索で開設と閉鎖を入れ替える拠点の組（拠点ごとに近い順の件数）
+SWAP_NEIGHBORS = 3
+
+# 開設拠点の修復で確保する能力の余裕（総需要に対する割合）
+CAPACITY_SLACK = 0.05
+
+# 劣勾配法の反復回数・初期ステップ係数、上界を更新する間隔
+ITERATIONS = 150
+STEP = 2.0
+UPPER_BOUND_EVERY = 10
+
+# 合成データ：地域数、既存拠点数、新設候補数、年間総需要（t）、供給拠点（博多港付近）の座標（km）
+REGIONS = 150
+EXISTING = 14
+CANDIDATES = 6
+TOTAL_DEMAND = 800_000
+SUPPLY_POINT = (40, 300)
+
+
+def lane_costs(network, scenario="基準"):
+    """拠点×地域 の1tあたり費用（円：幹線＋荷役＋配送）と地域別需要（t）"""
+    _, demand_factor, rate_factor = SCENARIOS[[s[0] for s in SCENARIOS].index(scenario)]
+    sites, regions = network["sites"], network["regions"]
+    delivery = np.sqrt(((sites[:, None, :] - regions[None, :, :]) ** 2).sum(axis=2))
+    linehaul = np.sqrt(((sites - np.array(SUPPLY_POINT)) ** 2).sum(axis=1))
+    unit = (LINEHAUL_PER_TKM * linehaul * rate_factor + network["handling"])[:, None] \
+        + DELIVERY_PER_TKM * rate_factor * delivery
+    demand = np.rint(network["demand"] * demand_factor).astype(np.int64)
+    return unit, demand
+
+
+def allowed_sites(network, configuration):
+    """候補網ごとの (開設を固定する拠点, 開設してよい拠点) の真偽配列"""
+    existing = network["existing"]
+    if configuration == "現状維持":
+        return existing.copy(), existing.copy()
+    if configuration == "統廃合のみ":
+        return np.zeros_like(existing), existing.copy()
+    return np.zeros_like(existing), np.ones_like(existing)
+
+
+def transport(open_sites, unit, demand, capacity, max_lanes=MAX_LANES):
+    """開設拠点を固定した輸送問題を最小費用流で解き、(配送費用（円）, 拠点×地域 の配送量) を返す
+
+    各地域は近い順に max_lanes 件の開設拠点からのみ配送する。需要を満たせなければ費用は inf。
+    """
+    sites = np.flatnonzero(open_sites)
+    n_sites, n_regions = len(sites), len(demand)
+    flow = np.zeros(unit.shape, dtype=np.int64)
+    if n_sites == 0 or capacity[sites].sum() < demand.sum():
+        return float("inf"), flow
+
+    # 節点：0=始点、1=終点、2..=開設拠点、続いて地域
+    mcf = MinCostFlow(2 + n_sites + n_regions)
+    for k, i in enumerate(sites):
+        mcf.add_edge(0, 2 + k, int(capacity[i]), 0.0)
+    for j in range(n_regions):
+        mcf.add_edge(2 + n_sites + j, 1, int(demand[j]), 0.0)
+    nearest = np.argsort(unit[sites], axis=0, kind="stable")[:max_lanes]
+    edges = [(sites[k], j, mcf.add_edge(2 + k, 2 + n_sites + j, int(demand[j]), float(unit[sites[k], j])))
+             for j in range(n_regions) for k in nearest[:, j]]
+    total, cost = mcf.flow(0, 1)
+    if total < demand.sum():
+        return float("inf"), flow
+    for i, j, edge in edges:
+        flow[i, j] = mcf.edge_flow(edge)
+    return cost, flow
+
+
+def _knapsack(reduced, demand, capacity):
+    """拠点ごとの緩和問題（連続ナップサック）：費用が負の地域を1tあたりの費用の小さい順に能力まで割り当てる
+
+    reduced は 拠点×地域 の（全量配送した場合の）費用から乗数を引いた値。割当率と拠点別の最小値を返す。
+    """
+    ratio = np.where(reduced < 0, reduced / demand, 0.0)
+    order = np.argsort(ratio, axis=1, kind="stable")
+    d = demand[order]
+    before = np.cumsum(d, axis=1) - d
+    share = np.clip((capacity[:, None] - before) / d, 0.0, 1.0)
+    share = np.where(np.take_along_axis(ratio, order, axis=1) < 0, share, 0.0)
+    assign = np.zeros_like(reduced)
+    np.put_along_axis(assign, order, share, axis=1)
+    return assign, (assign * reduced).sum(axis=1)
+
+
+def locate(network, scenario="基準", configuration="統廃合＋新設", iterations=ITERATIONS):
+    """ラグランジュ緩和と局所探索で開設拠点・配送量を求める
+
+    返り値は {"open", "flow", "cost"（年間費用、円）, "lower_bound", "gap", "scenario", "configuration"}。
+    """
+    unit, demand = lane_costs(network, scenario)
+    capacity, fixed = network["capacity"], network["fixed_cost"]
+    forced, allowed = allowed_sites(network, configuration)
+    serve = unit * demand  # 地域の全量を拠点から配送した場合の費用
+    cache = {}
+
+    def evaluate(open_sites):
+        key = open_sites.tobytes()
+        if key not in cache:
+            cost, flow = transport(open_sites, unit, demand, capacity)
+            cache[key] = (cost + float(fixed[open_sites].sum()), flow)
+        return cache[key][0]
+
+    def repair(open_sites, score):
+        # 能力が総需要（＋余裕）に足りるまで、緩和問題の評価値が小さい拠点から開設する
+        open_sites = (open_sites | forced) & allowed
+        for i in np.argsort(score, kind="stable"):
+            if capacity[open_sites].sum() >= demand.sum() * (1 + CAPACITY_SLACK):
+                break
+            open_sites[i] |= allowed[i]
+        return open_sites
+
+    # 乗数の初期値：各地域の最も安い配送費用
+    u = np.where(allowed[:, None], serve, np.inf).min(axis=0)
+    best_open = repair(np.zeros(len(capacity), dtype=bool), fixed / capacity)
+    upper = evaluate(best_open)
+    lower, step, stall = -np.inf, STEP, 0
+    for it in range(iterations):
+        assign, value = _knapsack(serve - u[None, :], demand, capacity)
+        score = np.where(allowed, fixed + value, np.inf)
+        y = forced | (score < 0)
+        bound = float(u.sum() + np.where(y, score, 0.0).sum())
+        if bound > lower + 1e-6 * abs(lower if np.isfinite(lower) else 1):
+            lower, stall = bound, 0
+        else:
+            stall += 1
+            if stall >= 10:
+                step, stall = step / 2, 0
+        if it % UPPER_BOUND_EVERY == 0:
+            candidate = repair(y.copy(), score)
+            if evaluate(candidate) < upper:
+                best_open, upper = candidate, evaluate(candidate)
+        g = 1 - (assign * y[:, None]).sum(axis=0)
+        norm = float((g ** 2).sum())
+        if norm < 1e-12 or step < 1e-4:
+            break
+        u = u + step * (upper - bound) / norm * g
+
+    distance = np.sqrt(((network["sites"][:, None, :] - network["sites"][None, :, :]) ** 2).sum(axis=2))
+    neighbors = np.argsort(distance, axis=1, kind="stable")[:, 1:SWAP_NEIGHBORS + 1]
+    best_open, upper = _local_search(best_open, upper, evaluate, forced, allowed, neighbors)
+    return {
+        "scenario": scenario,
+        "configuration": configuration,
+        "open": best_open,
+        "flow": cache[best_open.tobytes()][1],
+        "cost": upper,
+        "lower_bound": lower,
+        "gap": (upper - lower) / upper if np.isfinite(lower) else float("nan"),
+    }
+
+
+def _local_search(open_sites, cost, evaluate, forced, allowed, neighbors):
+    """1拠点の開設・閉鎖、近隣拠点（neighbors）との開設・閉鎖の入れ替えで改善がなくなるまで改善する"""
+    free = allowed & ~forced
+    improved = True
+    while improved:
+        improved = False
+        moves = [(i,) for i in np.flatnonzero(free)] + [
+            (i, k) for i in np.flatnonzero(free & open_sites) for k in neighbors[i] if free[k] and not open_sites[k]
+        ]
+        for move in moves:
+            candidate = open_sites.copy()
+            candidate[list(move)] ^= True
+            value = evaluate(candidate)
+            if value < cost - 1e-6:
+                open_sites, cost, improved = candidate, value, True
+                break
+    return open_sites, cost
+
+
+def evaluate_scenarios(network, scenarios=None, configurations=CONFIGURATIONS, workers=None):
+    """シナリオ×候補網 を並列に解き、locate の結果のリストを返す"""
+    scenarios = scenarios or [s[0] for s in SCENARIOS]
+    tasks = [(network, s, c) for s in scenarios for c in configurations]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        return [_solve_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        return list(executor.map(_solve_task, tasks))
+
+
+def _solve_task(task):
+    """ワーカー側で1つのシナリオ×候補網を解く"""
+    network, scenario, configuration = task
+    return locate(network, scenario, configuration)
+
+
+def summarize(network, results, configuration="統廃合＋新設"):
+    """シナリオ別の現状維持との年間費用差（百万円）と拠点の開設・閉鎖、一時費用
+
+    delta は現状維持の費用から選んだ網の費用を引いた額（正なら削減）。
+    """
+    existing = network["existing"]
+    current = {r["scenario"]: r for r in results if r["configuration"] == "現状維持"}
+    rows = []
+    for r in results:
+        if r["configuration"] != configuration:
+            continue
+        closed = int((existing & ~r["open"]).sum())
+        opened = int((~existing & r["open"]).sum())
+        rows.append({
+            "scenario": r["scenario"],
+            "cost": r["cost"] / 1e6,
+            "current_cost": current[r["scenario"]]["cost"] / 1e6,
+            "delta": (current[r["scenario"]]["cost"] - r["cost"]) / 1e6,
+            "closed": closed,
+            "opened": opened,
+            "one_off": closed * CLOSING_COST + opened * OPENING_COST,
+            "gap": r["gap"],
+        })
+    delta = [row["delta"] for row in rows]
+    one_off = [row["one_off"] for row in rows]
+    base = next(row for row in rows if row["scenario"] == "基準")
+    return {
+        "scenarios": rows,
+        "saving": (min(delta), max(delta)),
+        "one_off": (min(one_off), max(one_off)),
+        "closed": base["closed"],
+        "opened": base["opened"],
+    }
+
+
+def format_network(summary):
+    """基準シナリオの拠点再編と年間削減額を「2拠点閉鎖・1拠点新設で年間150-210百万円削減」の形式に整形"""
+    changes = []
+    if summary["closed"]:
+        changes.append(f"{summary['closed']}拠点閉鎖")
+    if summary["opened"]:
+        changes.append(f"{summary['opened']}拠点新設")
+    saving = RangeArray(*np.rint(summary["saving"]), unit="百万円").format()
+    return f"{'・'.join(changes) or '現状維持'}で年間{saving}削減"
+
+
+# ---------------------------------------------------------------------------
+# 合成データとベンチマーク
+# ---------------------------------------------------------------------------
+
+def sample_network(regions=REGIONS, existing=EXISTING, candidates=CANDIDATES, total_demand=TOTAL_DEMAND, seed=0):
+    """検証・計測用の地域・拠点（既存＋新設候補）
+
+    地域・拠点は約300×350kmの範囲に置く。既存拠点は小規模で荷役単価が高く、
+    新設候補は大規模・自動化前提で固定費が高く荷役単価が低い。既存拠点の能力は総需要の約1.2倍。
+    """
+    rng = np.random.default_rng(seed)
+    region_xy = rng.uniform([0, 0], [300, 350], (regions, 2))
+    demand = rng.lognormal(0, 0.8, regions)
+    demand = np.maximum(np.rint(demand / demand.sum() * total_demand), 1).astype(np.int64)
+    sites = existing + candidates
+    capacity = np.concatenate([
+        rng.uniform(0.7, 1.3, existing) * total_demand * 1.2 / existing,
+        rng.uniform(0.9, 1.2, candidates) * total_demand * 0.25,
+    ]).astype(np.int64)
+    return {
+        "regions": region_xy,
+        "demand": demand,
+        "sites": rng.uniform([0, 0], [300, 350], (sites, 2)),
+        "capacity": capacity,
+        # 固定費（円/年）：規模に比例する部分と拠点あたりの部分
+        "fixed_cost": capacity * rng.uniform(100, 150, sites) + np.where(np.arange(sites) < existing, 30e6, 250e6),
+        # 荷役単価（円/t）
+        "handling": np.where(np.arange(sites) < existing, rng.uniform(3000, 3400, sites), rng.uniform(2700, 2900, sites)),
+        "existing": np.arange(sites) < existing,
+    }
+
+
+def estimate(seed=0, workers=1):
+    """合成データの全シナリオで現状維持と統廃合＋新設の網を解き、費用差を集計"""
+    network = sample_network(seed=seed)
+    return summarize(network, evaluate_scenarios(network, configurations=("現状維持", "統廃合＋新設"), workers=workers))
+
+
+def _enumerate(network, scenario, configuration):
+    """比較用：開設してよい拠点の組合せをすべて輸送問題で評価する厳密解"""
+    unit, demand = lane_costs(network, scenario)
+    forced, allowed = allowed_sites(network, configuration)
+    free = np.flatnonzero(allowed & ~forced)
+    best = (float("inf"), None)
+    for mask in itertools.product((False, True), repeat=len(free)):
+        open_sites = forced.copy()
+        open_sites[free] = mask
+        cost, _ = transport(open_sites, unit, demand, network["capacity"])
+        cost += float(network["fixed_cost"][open_sites].sum())
+        best = min(best, (cost, open_sites), key=lambda b: b[0])
+    return best
+
+
+def verify(seed=1):
+    """小規模な網（既存7・候補3拠点）で厳密解（全組合せ）との費用差と、配送量の整合を確認"""
+    network = sample_network(regions=40, existing=7, candidates=3, total_demand=200_000, seed=seed)
+    for scenario in ("保守", "基準", "楽観"):
+        result = locate(network, scenario)
+        exact, _ = _enumerate(network, scenario, "統廃合＋新設")
+        _, demand = lane_costs(network, scenario)
+        flow = result["flow"]
+        if not np.array_equal(flow.sum(axis=0), demand):
+            return False
+        if np.any(flow.sum(axis=1) > network["capacity"]) or np.any(flow[~result["open"]]):
+            return False
+        if result["cost"] > exact * (1 + 1e-3) or result["lower_bound"] > exact * (1 + 1e-6):
+            return False
+    return True
+
+
+def benchmark(workers=None):
+    """全シナリオ×候補網の所要時間（逐次・並列）と費用差"""
+    network = sample_network()
+    start = time.perf_counter()
+    results = evaluate_scenarios(network, workers=1)
+    sequential = time.perf_counter() - start
+    start = time.perf_counter()
+    evaluate_scenarios(network, workers=workers)
+    parallel = time.perf_counter() - start
+    return {
+        "tasks": len(results),
+        "sequential": sequential,
+        "parallel": parallel,
+        "workers": workers or os.cpu_count() or 1,
+        "max_gap": max(r["gap"] for r in results),
+        "valid": verify(),
+        "summary": summarize(network, results),
+    }
+
+
+if __name__ == "__main__":
+    r = benchmark()
+    s = r["summary"]
+    print(f"シナリオ×候補網 {r['tasks']}件  検証: {r['valid']}  最大双対ギャップ {r['max_gap'] * 100:.2f}%")
+    print(f"所要時間 逐次 {r['sequential']:.1f}秒 / 並列（{r['workers']}プロセス） {r['parallel']:.1f}秒")
+    for row in s["scenarios"]:
+        print(f"{row['scenario']}: 現状 {row['current_cost']:,.0f}百万円 → {row['cost']:,.0f}百万円  "
+              f"差 {row['delta']:+,.0f}百万円  閉鎖 {row['closed']} 新設 {row['opened']}  一時費用 {row['one_off']}百万円")
+    print(format_network(s))
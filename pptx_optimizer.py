@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+PowerPointパッケージ最適化（保存前パス）
+同一画像・メディアパートの重複排除、PNGの可逆再圧縮・目標DPIへの縮小
+"""
+
+import hashlib
+import io
+
+MEDIA_PREFIX = "/ppt/media/"
+EMU_PER_INCH = 914400
+NS_A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+NS_R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_P = "http://schemas.openxmlformats.org/presentationml/2006/main"
+
+
+def optimize_package(prs, recompress_png=False, target_dpi=None):
+    """保存前にメディアパートを最適化し、削減バイト数のレポートを返す"""
+    package = prs.part.package
+
+    bytes_before = _media_bytes(package)
+
+    deduplicated = deduplicate_media(package)
+
+    recompressed = 0
+    if recompress_png or target_dpi:
+        recompressed = recompress_images(package, target_dpi=target_dpi)
+
+    bytes_after = _media_bytes(package)
+
+    return {
+        "media_bytes_before": bytes_before,
+        "media_bytes_after": bytes_after,
+        "bytes_saved": bytes_before - bytes_after,
+        "deduplicated_parts": deduplicated,
+        "recompressed_parts": recompressed,
+    }
+
+
+def deduplicate_media(package):
+    """同一内容のメディアパートを1つに集約し、リレーションを共有させる"""
+    canonical = {}
+    removed = set()
+
+    for rel in list(package.iter_rels()):
+        if rel.is_external:
+            continue
+        part = rel.target_part
+        if not _is_media(part):
+            continue
+
+        digest = hashlib.sha1(part.blob).hexdigest()
+        first = canonical.setdefault(digest, part)
+        if first is not part:
+            # リレーションの参照先を代表パートへ付け替え（rIdは変更しない）
+            _retarget(rel, first)
+            removed.add(part)
+
+    # 参照されなくなったパートは保存時のリレーション走査から外れる
+    return len(removed)
+
+
+def recompress_images(package, target_dpi=None):
+    """PNGを可逆再圧縮し、target_dpi指定時は表示サイズに合わせて縮小"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return 0
+
+    display_sizes = _display_sizes(package) if target_dpi else {}
+
+    count = 0
+    for part in list(package.iter_parts()):
+        if not _is_media(part) or part.content_type != "image/png":
+            continue
+
+        image = Image.open(io.BytesIO(part.blob))
+        image.load()
+
+        # 表示サイズ（最大のもの）から目標DPIでの必要画素数を算出
+        size = display_sizes.get(part)
+        if size is not None:
+            max_w = int(size[0] / EMU_PER_INCH * target_dpi)
+            max_h = int(size[1] / EMU_PER_INCH * target_dpi)
+            if 0 < max_w < image.width and 0 < max_h < image.height:
+                image = image.resize((max_w, max_h), Image.LANCZOS)
+
+        out = io.BytesIO()
+        image.save(out, format="PNG", optimize=True)
+        blob = out.getvalue()
+
+        if len(blob) < len(part.blob):
+            part._blob = blob
+            count += 1
+
+    return count
+
+
+def format_report(report, label=""):
+    """最適化レポートを表示用文字列に整形"""
+    saved = report["bytes_saved"]
+    before = report["media_bytes_before"]
+    rate = saved / before * 100 if before else 0.0
+    prefix = f"{label}: " if label else ""
+    return (
+        f"{prefix}メディア {before:,} → {report['media_bytes_after']:,} bytes"
+        f"（{saved:,} bytes削減、{rate:.1f}%）"
+        f" 重複排除 {report['deduplicated_parts']}件"
+        f" 再圧縮 {report['recompressed_parts']}件"
+    )
+
+
+def _is_media(part):
+    """メディアパート（画像・動画・音声）かどうか"""
+    return str(part.partname).startswith(MEDIA_PREFIX)
+
+
+def _retarget(rel, part):
+    """リレーションの参照先パートを差し替え、キャッシュ済みの参照先情報を破棄"""
+    rel._target = part
+    for name in ("target_part", "target_partname", "target_ref"):
+        rel.__dict__.pop(name, None)
+
+
+def _media_bytes(package):
+    """パッケージから到達可能なメディアパートの合計バイト数"""
+    return sum(len(part.blob) for part in package.iter_parts() if _is_media(part))
+
+
+def _display_sizes(package):
+    """各画像パートのスライド上での最大表示サイズ（EMU）を収集"""
+    sizes = {}
+    for part in package.iter_parts():
+        element = getattr(part, "_element", None)
+        if element is None:
+            continue
+
+        for pic in element.iter(f"{{{NS_P}}}pic"):
+            blips = pic.findall(f".//{{{NS_A}}}blip")
+            exts = pic.findall(f".//{{{NS_A}}}xfrm/{{{NS_A}}}ext")
+            if not blips or not exts:
+                continue
+            rId = blips[0].get(f"{{{NS_R}}}embed")
+            if rId is None or rId not in part.rels:
+                continue
+            image_part = part.rels[rId].target_part
+            cx = int(exts[0].get("cx", 0))
+            cy = int(exts[0].get("cy", 0))
+            w, h = sizes.get(image_part, (0, 0))
+            sizes[image_part] = (max(w, cx), max(h, cy))
+
+    return sizes
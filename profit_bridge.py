@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+収益性改善ブリッジ計算（総利益率・経常利益率）
+各ソリューションの要因別効果を集計し、見出しの改善幅との整合を検証して
+ウォーターフォールグラフを作成する。low/base/highの各シナリオを一括計算する
+"""
+
+import numpy as np
+
+from charts import add_waterfall_chart
+
+SCENARIOS = ("low", "base", "high")
+
+# 総利益率：7.38% → 9.0-10.0%（+1.6-2.6pt）
+GROSS_MARGIN = {
+    "start": 7.38,
+    "headline": (1.6, 2.6),
+    "components": [
+        ("調達物流最適化", (0.8, 1.2)),
+        ("在庫ロス削減", (0.5, 0.8)),
+        ("物流効率化", (0.3, 0.6)),
+    ],
+}
+
+# 経常利益率：1.73% → 3.0-3.5%（+1.3-1.8pt）
+ORDINARY_MARGIN = {
+    "start": 1.73,
+    "headline": (1.3, 1.8),
+    "components": [
+        ("物流コスト削減", (0.6, 0.8)),
+        ("総利益率改善効果", (0.4, 0.6)),
+        ("オペレーション効率化", (0.3, 0.4)),
+    ],
+}
+
+
+def scenario_matrix(ranges):
+    """(下限, 上限)またはシナリオ別の値のリストを low/base/high × 要因 の行列に展開"""
+    columns = []
+    for r in ranges:
+        r = np.asarray(r, dtype=float)
+        if len(r) != len(SCENARIOS):
+            r = np.array([r[0], (r[0] + r[-1]) / 2, r[-1]])
+        columns.append(r)
+    return np.column_stack(columns)
+
+
+def aggregate_effects(effects, names):
+    """エンジン別の効果 [(要因名, シナリオ別配列)] を要因ごとに合算"""
+    index = {name: i for i, name in enumerate(names)}
+    total = np.zeros((len(SCENARIOS), len(names)))
+    for name, values in effects:
+        if name not in index:
+            raise KeyError(f"未定義の要因です: {name}")
+        total[:, index[name]] += np.asarray(values, dtype=float)
+    return total
+
+
+def compute_bridge(start, names, deltas, headline=None, tol=0.05):
+    """ブリッジを計算（deltas: シナリオ×要因）し、見出しの改善幅と照合"""
+    deltas = np.atleast_2d(np.asarray(deltas, dtype=float))
+    totals = deltas.sum(axis=1)
+    ends = start + totals
+
+    if headline is not None:
+        expected = scenario_matrix([headline])[:, 0]
+        diff = np.abs(totals - expected)
+        if np.any(diff > tol):
+            worst = SCENARIOS[int(diff.argmax())] if len(totals) == len(SCENARIOS) else int(diff.argmax())
+            raise ValueError(
+                f"要因の合計が見出しの改善幅と一致しません（{worst}: "
+                f"合計{totals[diff.argmax()]:+.2f}pt、見出し{expected[diff.argmax()]:+.2f}pt）"
+            )
+
+    # 各シナリオの累積位置（ウォーターフォールの基底）
+    cumulative = start + np.cumsum(deltas, axis=1)
+    previous = cumulative - deltas
+
+    return {
+        "names": list(names),
+        "start": start,
+        "deltas": deltas,
+        "totals": totals,
+        "ends": ends,
+        "base": np.minimum(previous, cumulative),
+        "up": np.clip(deltas, 0, None),
+        "down": np.clip(-deltas, 0, None),
+    }
+
+
+def margin_bridge(definition, effects=None, tol=0.05):
+    """定義（GROSS_MARGIN等）からブリッジを計算、effects指定時はエンジン集計値を使用"""
+    names = [name for name, _ in definition["components"]]
+    if effects is None:
+        deltas = scenario_matrix([r for _, r in definition["components"]])
+    else:
+        deltas = aggregate_effects(effects, names)
+    return compute_bridge(definition["start"], names, deltas, definition["headline"], tol)
+
+
+def split_component(definition, parent, name, values, rest=None):
+    """要因 parent のうちエンジンで求めたシナリオ別の効果（low/base/high）を要因 name として切り出した定義を返す
+
+    見出しの改善幅は変えず、parent は残りの効果（名前は rest、省略時は parent のまま）とする。
+    """
+    values = np.asarray(values, dtype=float)
+    if values.shape != (len(SCENARIOS),):
+        raise ValueError(f"効果は {len(SCENARIOS)} シナリオ分の配列で指定してください")
+    components = []
+    for component, effect in definition["components"]:
+        if component != parent:
+            components.append((component, effect))
+            continue
+        remainder = scenario_matrix([effect])[:, 0] - values
+        if np.any(remainder < 0):
+            raise ValueError(f"{name} の効果が {parent} の改善幅を超えています")
+        components += [(rest or parent, remainder), (name, values)]
+    if len(components) == len(definition["components"]):
+        raise KeyError(f"未定義の要因です: {parent}")
+    return {
+        "start": definition["start"],
+        "headline": definition["headline"],
+        "components": components,
+    }
+
+
+def format_headline(definition):
+    """定義の現状・改善後・改善幅を ("7.38%", "9.0-10.0%", "+1.6-2.6pt") の表示用文字列で返す"""
+    start = definition["start"]
+    low, high = definition["headline"][0], definition["headline"][-1]
+    return f"{start}%", f"{start + low:.1f}-{start + high:.1f}%", f"+{low:.1f}-{high:.1f}pt"
+
+
+def format_total(bridge, unit="ポイント"):
+    """low-highの合計改善幅を表示用文字列に整形"""
+    low, high = bridge["totals"][0], bridge["totals"][-1]
+    return f"+{low:.1f}-{high:.1f}{unit}"
+
+
+def add_bridge_chart(slide, rect, bridge, scenario="base", start_label="現状", end_label="改善後"):
+    """指定シナリオのブリッジをネイティブのウォーターフォールグラフで描画"""
+    s = SCENARIOS.index(scenario)
+    return add_waterfall_chart(
+        slide, rect,
+        bridge["names"],
+        [round(float(d), 2) for d in bridge["deltas"][s]],
+        start=bridge["start"],
+        start_label=start_label,
+        end_label=end_label,
+    )
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+「下限-上限」レンジ値の区間演算型（NumPyベース）
+"220-280百万円"、"△300-400百万円"、"+1.6-2.6pt"、"0.5-0.8年" 等の表記を
+解析・整形し、表全体の合計・派生列（投資回収年数など）を一括で計算する
+"""
+
+import re
+
+import numpy as np
+
+# 符号・数値・（範囲上限）・単位
+RANGE_PATTERN = re.compile(r"^\s*([+\-△▲]?)\s*([\d,]+(?:\.\d+)?)(?:\s*[-~〜]\s*([\d,]+(?:\.\d+)?))?\s*(.*?)\s*$")
+NEGATIVE_SIGNS = ("-", "△", "▲")
+
+
+class RangeArray:
+    """下限・上限の配列を持つ区間値（スカラーは0次元配列）"""
+
+    __array_priority__ = 1000
+
+    def __init__(self, lo, hi=None, unit=""):
+        lo = np.asarray(lo, dtype=float)
+        hi = lo if hi is None else np.asarray(hi, dtype=float)
+        self.lo = np.minimum(lo, hi)
+        self.hi = np.maximum(lo, hi)
+        self.unit = unit
+
+    @classmethod
+    def parse(cls, texts):
+        """文字列（またはそのリスト）を解析"""
+        if isinstance(texts, str):
+            lo, hi, unit = parse_range(texts)
+            return cls(lo, hi, unit)
+
+        parsed = [parse_range(t) for t in texts]
+        units = {unit for _, _, unit in parsed}
+        unit = units.pop() if len(units) == 1 else ""
+        return cls([p[0] for p in parsed], [p[1] for p in parsed], unit)
+
+    @property
+    def mid(self):
+        """中央値"""
+        return (self.lo + self.hi) / 2
+
+    @property
+    def width(self):
+        """レンジ幅"""
+        return self.hi - self.lo
+
+    def __len__(self):
+        return len(self.lo)
+
+    def __getitem__(self, index):
+        return RangeArray(self.lo[index], self.hi[index], self.unit)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return f"RangeArray({self.format()!r})"
+
+    def __neg__(self):
+        return RangeArray(-self.hi, -self.lo, self.unit)
+
+    def __add__(self, other):
+        lo, hi = _bounds(other)
+        return RangeArray(self.lo + lo, self.hi + hi, self.unit)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        lo, hi = _bounds(other)
+        return RangeArray(self.lo - hi, self.hi - lo, self.unit)
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __mul__(self, other):
+        lo, hi = _bounds(other)
+        products = np.stack([self.lo * lo, self.lo * hi, self.hi * lo, self.hi * hi])
+        return RangeArray(products.min(axis=0), products.max(axis=0), self.unit)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        lo, hi = _bounds(other)
+        if np.any((lo <= 0) & (hi >= 0)):
+            raise ZeroDivisionError("0を含むレンジでは除算できません")
+        return self * RangeArray(1 / hi, 1 / lo)
+
+    def __rtruediv__(self, other):
+        return RangeArray(*_bounds(other)) / self
+
+    def sum(self, axis=None):
+        """合計（下限同士・上限同士の和）"""
+        return RangeArray(self.lo.sum(axis=axis), self.hi.sum(axis=axis), self.unit)
+
+    def payback(self, annual_effect, paired=False):
+        """投資回収年数（self=投資額、annual_effect=年間効果）
+
+        既定は区間演算（最短=投資下限/効果上限、最長=投資上限/効果下限）。
+        paired=Trueなら下限同士・上限同士を対応させる（同一シナリオ前提）。
+        """
+        effect = annual_effect if isinstance(annual_effect, RangeArray) else RangeArray(annual_effect)
+        if paired:
+            return RangeArray(self.lo / effect.lo, self.hi / effect.hi, "年")
+        result = self / effect
+        result.unit = "年"
+        return result
+
+    def with_unit(self, unit):
+        """単位を差し替えたコピー"""
+        return RangeArray(self.lo, self.hi, unit)
+
+    def format(self, decimals=None, unit=None, signed=False, negative="△"):
+        """表示用文字列（配列ならリスト）に整形"""
+        unit = self.unit if unit is None else unit
+        if self.lo.ndim == 0:
+            return format_range(float(self.lo), float(self.hi), unit, decimals, signed, negative)
+        return [
+            format_range(lo, hi, unit, decimals, signed, negative)
+            for lo, hi in zip(self.lo.tolist(), self.hi.tolist())
+        ]
+
+
+def parse_range(text):
+    """レンジ文字列を (下限, 上限, 単位) に分解（△・▲・-は負値）"""
+    m = RANGE_PATTERN.match(text)
+    if m is None:
+        raise ValueError(f"レンジ表記として解釈できません: {text!r}")
+    sign, first, second, unit = m.groups()
+    lo = float(first.replace(",", ""))
+    hi = float(second.replace(",", "")) if second else lo
+    if sign in NEGATIVE_SIGNS:
+        lo, hi = -hi, -lo
+    return lo, hi, unit
+
+
+def format_range(lo, hi, unit="", decimals=None, signed=False, negative="△"):
+    """(下限, 上限) を「下限-上限単位」の表記に整形"""
+    if decimals is None:
+        decimals = 0 if float(lo).is_integer() and float(hi).is_integer() else 1
+
+    if hi < 0:
+        # 負のレンジは絶対値の小さい順に「△300-400」と表記
+        body = _span(-hi, -lo, decimals)
+        return f"{negative}{body}{unit}"
+    if lo < 0:
+        # ゼロをまたぐレンジは「△150〜+160」と表記（「-」だと区切りと符号が紛れる）
+        return f"{negative}{_number(-lo, decimals)}〜+{_number(hi, decimals)}{unit}"
+
+    prefix = "+" if signed else ""
+    return f"{prefix}{_span(lo, hi, decimals)}{unit}"
+
+
+def _span(lo, hi, decimals):
+    """下限-上限（同値なら単一値）"""
+    a, b = _number(lo, decimals), _number(hi, decimals)
+    return a if a == b else f"{a}-{b}"
+
+
+def _number(value, decimals):
+    """四捨五入（0.5切り上げ）・桁区切り付きの数値表記"""
+    scale = 10 ** decimals
+    rounded = np.floor(abs(value) * scale + 0.5 + 1e-9) / scale
+    return f"{rounded:,.{decimals}f}"
+
+
+def _bounds(value):
+    """RangeArrayまたは数値から (下限, 上限) 配列を取り出す"""
+    if isinstance(value, RangeArray):
+        return value.lo, value.hi
+    value = np.asarray(value, dtype=float)
+    return value, value
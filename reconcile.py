@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+在庫精度検証（実地棚卸と帳簿在庫の突合）
+SKU×ロケーション×ロットの複合キーを整数に符号化し、ベクトル演算のハッシュ表で
+集約・結合して差異を求める。差異は金額帯と原因（数量差異・ロット相違・
+ロケーション相違・未登録在庫・所在不明）に分類し、差異率・差異額を集計する。
+循環棚卸を想定し、帳簿側は棚卸したロケーションの在庫だけを突合の対象とする
+"""
+
+import time
+
+import numpy as np
+
+# 突合キー（帳簿・棚卸の両方に必要な列）
+KEY_COLUMNS = ("sku", "location", "lot")
+
+# 差異の原因
+CAUSE_MATCH = "一致"
+CAUSE_QUANTITY = "数量差異"
+CAUSE_LOT = "ロット相違"
+CAUSE_LOCATION = "ロケーション相違"
+CAUSE_FOUND = "未登録在庫"
+CAUSE_MISSING = "所在不明"
+CAUSES = (CAUSE_MATCH, CAUSE_QUANTITY, CAUSE_LOT, CAUSE_LOCATION, CAUSE_FOUND, CAUSE_MISSING)
+
+# 差異金額（絶対値・円）の区分：(下限, 区分名)
+VALUE_BANDS = (
+    (0, "軽微"),
+    (10_000, "要確認"),
+    (100_000, "重大"),
+)
+
+# ハッシュ表の負荷率の上限（表の大きさはキー数の2倍以上の2のべき乗）
+LOAD_FACTOR = 0.5
+
+# フィボナッチハッシュの乗数（2^64 / 黄金比）
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+# 合成データの帳簿在庫総額（提案書の在庫14,000百万円）
+STOCK_VALUE = 14_000e6
+
+
+class HashIndex:
+    """整数キーのオープンアドレス法ハッシュ表（線形探索をキー全体に対して一括で進める）
+
+    構築時に重複キーをまとめ、keys に一意キー、rows に各一意キーの代表行、
+    inverse に各入力行の一意キー番号を持つ。
+    """
+
+    def __init__(self, keys):
+        keys = np.ascontiguousarray(keys, dtype=np.int64)
+        self.bits = max(4, (int(np.ceil(len(keys) / LOAD_FACTOR)) - 1).bit_length())
+        self.mask = (1 << self.bits) - 1
+        # スロットには代表行（そのキーが最初に置かれた入力行）の番号を入れる
+        slots = np.full(1 << self.bits, -1, dtype=np.int32 if len(keys) < 2 ** 31 else np.int64)
+        owner = np.empty(len(keys), dtype=slots.dtype)
+
+        pending = np.arange(len(keys), dtype=slots.dtype)
+        pos = self._slot(keys)
+        while pending.size:
+            slot = slots[pos]
+            empty = slot < 0
+            # 空きスロットへ一斉に書き込み、書き込みが残った行がそのスロットの代表になる
+            slots[pos[empty]] = pending[empty]
+            slot = slots[pos]
+            same = keys[slot] == keys[pending]
+            owner[pending[same]] = slot[same]
+            # 別のキーが入っているスロットは次へ、同じスロットで負けた行はその場で再判定
+            moved = ~same & ~empty
+            pos[moved] = (pos[moved] + 1) & self.mask
+            pending, pos = pending[~same], pos[~same]
+
+        first = np.flatnonzero(owner == np.arange(len(keys)))
+        self._group = np.empty(len(keys), dtype=np.int64)
+        self._group[first] = np.arange(len(first))
+        self._slots, self._row_keys = slots, keys
+        self.keys = keys[first]
+        self.rows = first
+        self.inverse = self._group[owner]
+
+    def _slot(self, keys):
+        """キーの初期スロット（乗算ハッシュの上位ビット）"""
+        h = keys.astype(np.uint64) * _GOLDEN
+        return (h >> np.uint64(64 - self.bits)).astype(np.int64)
+
+    def lookup(self, keys):
+        """各キーの一意キー番号（表にないキーは -1）"""
+        keys = np.ascontiguousarray(keys, dtype=np.int64)
+        result = np.full(len(keys), -1, dtype=np.int64)
+        pending = np.arange(len(keys))
+        pos = self._slot(keys)
+        while pending.size:
+            slot = self._slots[pos]
+            occupied = slot >= 0
+            hit = occupied & (self._row_keys[slot] == keys[pending])
+            result[pending[hit]] = self._group[slot[hit]]
+            probe = occupied & ~hit
+            pending, pos = pending[probe], (pos[probe] + 1) & self.mask
+        return result
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def factorize(values):
+    """値を 0..n-1 の連番に符号化し、(一意値, 符号) を返す（整数はハッシュ表、文字列は整列）"""
+    values = np.asarray(values)
+    if values.dtype.kind in "iub":
+        index = HashIndex(values)
+        return index.keys, index.inverse
+    return np.unique(values, return_inverse=True)
+
+
+def combine_codes(codes, cardinalities):
+    """列ごとの符号を1つの int64 キーに合成（桁あふれしそうなら途中で詰め直す）"""
+    key = np.asarray(codes[0], dtype=np.int64)
+    size = cardinalities[0]
+    for code, card in zip(codes[1:], cardinalities[1:]):
+        if size * card >= 2 ** 63:
+            index = HashIndex(key)
+            key, size = index.inverse, len(index)
+        key = key * card + code
+        size *= card
+    return key
+
+
+def encode_keys(system, counts, columns=KEY_COLUMNS, locations=None):
+    """帳簿・棚卸の複合キーを共通の辞書で符号化し、列別の符号（帳簿, 棚卸）と合成キーを返す
+
+    locations を指定すると、その符号をロケーション列の3番目の要素に加える。
+    """
+    n, m = len(system[columns[0]]), len(counts[columns[0]])
+    codes, cards = {}, []
+    for i, col in enumerate(columns):
+        parts = [system[col], counts[col]]
+        if i == 1 and locations is not None:
+            parts.append(np.asarray(locations, dtype=np.asarray(counts[col]).dtype))
+        uniques, code = factorize(np.concatenate(parts))
+        codes[col] = (code[:n], code[n:n + m]) + ((code[n + m:],) if len(parts) == 3 else ())
+        cards.append(len(uniques))
+    keys = tuple(combine_codes([codes[col][side] for col in columns], cards) for side in (0, 1))
+    return codes, cards, keys
+
+
+def _sum_by(group, values, size):
+    return np.bincount(group, weights=values, minlength=size)
+
+
+def reconcile(system, counts, locations=None, columns=KEY_COLUMNS):
+    """帳簿在庫と棚卸結果を突合し、キー単位の差異と原因・金額区分を返す
+
+    system: {"sku", "location", "lot", "qty", "unit_cost"} の列（load_inventory で DataStore から読み出せる）
+    counts: {"sku", "location", "lot", "qty"} の列。同じキーの複数行（二重カウント）は合算する。
+    locations: 棚卸対象のロケーション（空だったロケーションを含む）。省略時は棚卸結果にある
+    ロケーションを対象とするため、全数がなくなったロケーションの帳簿在庫は突合されない。
+    """
+    codes, cards, (sys_keys, cnt_keys) = encode_keys(system, counts, columns, locations)
+    sku, location = columns[0], columns[1]
+
+    # 棚卸したロケーションの帳簿在庫だけを対象にする
+    counted = np.zeros(cards[1], dtype=bool)
+    counted[codes[location][1]] = True
+    if locations is not None:
+        counted[codes[location][2]] = True
+    in_scope = counted[codes[location][0]]
+
+    # SKU別の単価（棚卸側だけにあるキーの評価に使う）
+    unit_cost = np.zeros(cards[0])
+    unit_cost[codes[sku][0]] = system["unit_cost"]
+
+    # 帳簿側を構築側としてハッシュ表を作り、棚卸側のキーで探索する
+    build = HashIndex(sys_keys[in_scope])
+    sys_qty = _sum_by(build.inverse, np.asarray(system["qty"], dtype=float)[in_scope], len(build))
+    sys_rep = np.flatnonzero(in_scope)[build.rows]
+
+    probe = HashIndex(cnt_keys)
+    cnt_qty = _sum_by(probe.inverse, np.asarray(counts["qty"], dtype=float), len(probe))
+    matched = build.lookup(probe.keys)
+
+    # 帳簿側のキー（一致・差異）に棚卸側だけのキーを続けて並べる
+    found = matched < 0
+    book = np.zeros(len(build))
+    book[matched[~found]] = cnt_qty[~found]
+    count_qty = np.concatenate([book, cnt_qty[found]])
+    system_qty = np.concatenate([sys_qty, np.zeros(found.sum())])
+    has_count = np.zeros(len(build), dtype=bool)
+    has_count[matched[~found]] = True
+    has_count = np.concatenate([has_count, np.ones(found.sum(), dtype=bool)])
+
+    key_codes = {
+        col: np.concatenate([codes[col][0][sys_rep], codes[col][1][probe.rows[found]]]) for col in columns
+    }
+    diff = count_qty - system_qty
+    value = diff * unit_cost[key_codes[sku]]
+    on_book = np.arange(len(diff)) < len(build)
+    cause = _classify(key_codes, cards, columns, diff, on_book, has_count)
+
+    return {
+        "key_codes": key_codes,
+        "system_qty": system_qty,
+        "count_qty": count_qty,
+        "diff": diff,
+        "value": value,
+        "system_value": system_qty * unit_cost[key_codes[sku]],
+        "cause": cause,
+        "band": np.searchsorted([lower for lower, _ in VALUE_BANDS], np.abs(value), side="right") - 1,
+        "locations": int(counted.sum()),
+    }
+
+
+def _classify(key_codes, cards, columns, diff, on_book, counted):
+    """差異の原因を分類（CAUSES の番号）
+
+    片側だけにあるキーは、反対側だけにあるキーと SKU×ロットが一致すればロケーション相違、
+    SKU×ロケーションが一致すればロット相違（両方該当すればロット相違）、
+    どちらもなければ未登録在庫・所在不明とする。
+    """
+    sku, location, lot = columns
+    cause = np.full(len(diff), CAUSES.index(CAUSE_MATCH), dtype=np.int8)
+    cause[(diff != 0) & on_book & counted] = CAUSES.index(CAUSE_QUANTITY)
+    found = (diff != 0) & ~on_book
+    missing = (diff != 0) & ~counted
+    cause[found] = CAUSES.index(CAUSE_FOUND)
+    cause[missing] = CAUSES.index(CAUSE_MISSING)
+
+    for cols, label in (((sku, lot), CAUSE_LOCATION), ((sku, location), CAUSE_LOT)):
+        keys = combine_codes([key_codes[c] for c in cols], [cards[columns.index(c)] for c in cols])
+        for a, b in ((found, missing), (missing, found)):
+            if a.any() and b.any():
+                rows = np.flatnonzero(a)
+                cause[rows[HashIndex(keys[b]).lookup(keys[a]) >= 0]] = CAUSES.index(label)
+    return cause
+
+
+def load_inventory(store, date, sites=None):
+    """データストアから棚卸日の帳簿在庫（stock）と棚卸結果（counts）を読み出し、reconcile の引数を返す
+
+    ロケーションは拠点をまたいで重ならないよう「拠点/ロケーション」とし、棚卸結果に行がある
+    ロケーション（帳簿のSKU・ロットを数量0と記録した行を含む）を棚卸対象とする。
+    """
+    date = np.datetime64(date, "D")
+    month = date.astype("datetime64[M]")
+    where = [("date", "==", date)]
+    system = store.scan("stock", ["site", "sku", "location", "lot", "qty", "unit_cost"],
+                        sites=sites, months=month, where=where)
+    counts = store.scan("counts", ["site", "sku", "location", "lot", "qty"], sites=sites, months=month, where=where)
+    for data in (system, counts):
+        data["location"] = np.char.add(np.char.add(data.pop("site"), "/"), data["location"])
+    return system, counts, np.unique(counts["location"])
+
+
+def summarize(result):
+    """突合結果を集計（キー数・差異率・差異額、原因別・金額区分別の件数と差異額）"""
+    cause, value = result["cause"], np.abs(result["value"])
+    discrepant = cause != CAUSES.index(CAUSE_MATCH)
+    system_value = float(result["system_value"].sum())
+    abs_value = float(value[discrepant].sum())
+    return {
+        "locations": result["locations"],
+        "keys": len(cause),
+        "discrepancies": int(discrepant.sum()),
+        "rate": float(discrepant.mean()) if len(cause) else 0.0,
+        "system_value": system_value,
+        "abs_value": abs_value,
+        "net_value": float(result["value"].sum()),
+        "value_rate": abs_value / system_value if system_value else 0.0,
+        "by_cause": {
+            name: (int((cause == i).sum()), float(value[cause == i].sum()))
+            for i, name in enumerate(CAUSES) if name != CAUSE_MATCH
+        },
+        "by_band": {
+            name: (int((discrepant & (result["band"] == i)).sum()),
+                   float(value[discrepant & (result["band"] == i)].sum()))
+            for i, (_, name) in enumerate(VALUE_BANDS)
+        },
+    }
+
+
+def format_accuracy(summary, stock_value=STOCK_VALUE, basis=None):
+    """差異率と、差異額率を在庫総額に当てはめた推計差異額（百万円）の表示用文字列
+
+    basis を指定すると括弧内の先頭に数値の根拠（「試算」など）を添える。
+    """
+    estimate = summary["value_rate"] * stock_value / 1e6
+    note = f"{basis}、" if basis else ""
+    return f"棚卸差異率{summary['rate'] * 100:.1f}%（{note}差異額推計{estimate:,.0f}百万円）"
+
+
+# ---------------------------------------------------------------------------
+# 合成データとベンチマーク
+# ---------------------------------------------------------------------------
+
+def sample_inventory(locations=200_000, coverage=0.25, error_rate=0.015, stock_value=STOCK_VALUE, seed=0):
+    """検証・計測用の帳簿在庫・循環棚卸の結果・棚卸対象ロケーション（キーは整数コード）
+
+    帳簿はロケーションあたり1-2ロット、総額は stock_value。棚卸は coverage の割合の
+    ロケーションを数え、error_rate の割合の行に数量・ロット・ロケーションの誤り、
+    欠品、帳簿にない在庫のいずれかを入れる。
+    """
+    rng = np.random.default_rng(seed)
+    skus = max(1, locations // 10)
+    rows = int(locations * 1.2)
+    location = np.concatenate([np.arange(locations), rng.integers(0, locations, rows - locations)])
+    sku = rng.integers(0, skus, rows)
+    lot = rng.integers(0, 50, rows)
+    qty = rng.integers(1, 200, rows)
+    sku_cost = rng.lognormal(7, 1, skus)
+    sku_cost *= stock_value / float((qty * sku_cost[sku]).sum())
+    # 同じキーの重複行を除く（帳簿は1キー1行、行の並びはキー順にしない）
+    _, first = np.unique((sku * locations + location) * 50 + lot, return_index=True)
+    first = rng.permutation(first)
+    system = {"sku": sku[first], "location": location[first], "lot": lot[first],
+              "qty": qty[first], "unit_cost": sku_cost[sku[first]]}
+
+    counted = np.flatnonzero(rng.random(locations) < coverage)
+    rows = np.flatnonzero(np.isin(system["location"], counted))
+    counts = {col: system[col][rows].copy() for col in KEY_COLUMNS + ("qty",)}
+
+    errors = rng.random(len(rows)) < error_rate
+    kind = rng.integers(0, 5, len(rows))
+    shift = rng.integers(1, 6, len(rows)) * rng.choice([-1, 1], len(rows))
+    counts["qty"] = np.where(errors & (kind == 0), np.maximum(counts["qty"] + shift, 0), counts["qty"])
+    counts["lot"] = np.where(errors & (kind == 1), (counts["lot"] + shift) % 50, counts["lot"])
+    counts["location"] = np.where(errors & (kind == 2), rng.choice(counted, len(rows)), counts["location"])
+    keep = ~(errors & (kind == 3))
+    extra = errors & (kind == 4)
+    counts = {col: np.concatenate([counts[col][keep], {
+        "sku": rng.integers(0, skus, extra.sum()),
+        "location": counts["location"][extra],
+        "lot": rng.integers(0, 50, extra.sum()),
+        "qty": rng.integers(1, 50, extra.sum()),
+    }[col]]) for col in counts}
+    return system, counts, counted
+
+
+def _sorted_join(build_keys, probe_keys):
+    """比較用：整列による重複集約（np.unique）と二分探索による結合（一致した一意キー、なければ -1）"""
+    uniques, inverse = np.unique(build_keys, return_inverse=True)
+    pos = np.minimum(np.searchsorted(uniques, probe_keys), len(uniques) - 1)
+    return np.where(uniques[pos] == probe_keys, uniques[pos], -1)
+
+
+def benchmark(locations=4_000_000):
+    """重複集約＋結合をハッシュ表と整列で比較（所要時間・結果の一致）し、突合全体の所要時間を計測"""
+    system, counts, counted = sample_inventory(locations, coverage=0.5)
+    _, _, (sys_keys, cnt_keys) = encode_keys(system, counts)
+
+    start = time.perf_counter()
+    index = HashIndex(sys_keys)
+    group = index.lookup(cnt_keys)
+    hashed = np.where(group >= 0, index.keys[group], -1)
+    hash_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    merged = _sorted_join(sys_keys, cnt_keys)
+    sort_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summary = summarize(reconcile(system, counts, counted))
+    total_time = time.perf_counter() - start
+    return {
+        "system_rows": len(sys_keys),
+        "count_rows": len(cnt_keys),
+        "hash_join": hash_time,
+        "sort_join": sort_time,
+        "equivalent": bool(np.array_equal(hashed, merged)),
+        "reconcile": total_time,
+        "summary": summary,
+    }
+
+
+if __name__ == "__main__":
+    r = benchmark()
+    s = r["summary"]
+    print(f"帳簿 {r['system_rows']:,}行 / 棚卸 {r['count_rows']:,}行")
+    print(f"結合　ハッシュ {r['hash_join']:.2f}秒  整列 {r['sort_join']:.2f}秒  結果一致: {r['equivalent']}")
+    print(f"突合全体 {r['reconcile']:.2f}秒  ロケーション {s['locations']:,}  キー {s['keys']:,}")
+    print(f"差異 {s['discrepancies']:,}件（{s['rate'] * 100:.2f}%）  差異額 {s['abs_value'] / 1e6:,.1f}百万円"
+          f"（{s['value_rate'] * 100:.2f}%）")
+    for name, (count, value) in s["by_cause"].items():
+        print(f"  {name:<10} {count:>8,}件  {value / 1e6:>10,.1f}百万円")
+    for name, (count, value) in s["by_band"].items():
+        print(f"  {name:<10} {count:>8,}件  {value / 1e6:>10,.1f}百万円")
+    print(format_accuracy(s))
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+プロジェクトスケジュール計算（クリティカルパス・資源平準化）
+10テーマの活動（期間・先行関係・必要要員）からCPMで最早/最遅日程と余裕を求め、
+共有要員の上限内に収まるようヒープによるリストスケジューリングで日程を平準化する。
+時間単位は月（0始まりの月インデックス、Month表記は+1）
+"""
+
+import heapq
+
+import numpy as np
+
+# 共有要員の上限（人）
+STAFF_CAPACITY = {
+    "PMO": 2,
+    "データ分析": 3,
+    "現場改善": 4,
+    "IT": 2,
+}
+
+# 10テーマの活動（協業プロジェクト計画 3-1 タイムラインより）
+# release は着手可能な最早月（予算・体制上の制約）
+THEME_ACTIVITIES = [
+    {"id": "kickoff", "name": "体制構築・キックオフ", "phase": 0, "duration": 1, "depends": [],
+     "staff": {"PMO": 2}},
+    {"id": "t1", "name": "テーマ1：在庫可視化", "phase": 1, "duration": 3, "depends": ["kickoff"],
+     "staff": {"データ分析": 2, "PMO": 1}},
+    {"id": "t6", "name": "テーマ6：物流コスト可視化", "phase": 1, "duration": 3, "depends": ["kickoff"],
+     "staff": {"データ分析": 1}},
+    {"id": "t5", "name": "テーマ5：倉庫改善（1拠点）", "phase": 1, "duration": 4, "depends": ["kickoff"],
+     "staff": {"現場改善": 2}},
+    {"id": "t9", "name": "テーマ9：人材育成", "phase": 1, "duration": 34, "depends": ["kickoff"],
+     "staff": {"現場改善": 1}},
+    {"id": "review1", "name": "現状分析報告会", "phase": 1, "duration": 1, "depends": ["t1", "t6"],
+     "staff": {"PMO": 1}},
+    {"id": "t2", "name": "テーマ2：需要予測", "phase": 2, "duration": 4, "depends": ["t1", "review1"],
+     "staff": {"データ分析": 2}},
+    {"id": "t3", "name": "テーマ3：適正在庫基準", "phase": 2, "duration": 3, "depends": ["t1", "review1"],
+     "staff": {"データ分析": 1, "PMO": 1}},
+    {"id": "t7", "name": "テーマ7：VMIパイロット", "phase": 2, "duration": 7, "depends": ["t3"],
+     "staff": {"PMO": 1, "現場改善": 1}},
+    {"id": "t4", "name": "テーマ4：配送最適化", "phase": 2, "duration": 4, "depends": ["t6", "t2"],
+     "staff": {"データ分析": 1, "現場改善": 1}},
+    {"id": "t8", "name": "テーマ8：IoTパイロット", "phase": 2, "duration": 6, "depends": ["t5"], "release": 10,
+     "staff": {"IT": 1, "現場改善": 1}},
+    {"id": "t10", "name": "テーマ10：KPIダッシュボード", "phase": 2, "duration": 4, "depends": ["t2", "t6"],
+     "release": 12, "staff": {"IT": 1, "データ分析": 1}},
+    {"id": "select", "name": "システム選定・要件定義", "phase": 2, "duration": 4, "depends": ["t4", "t10"],
+     "staff": {"IT": 2, "PMO": 1}},
+    {"id": "review2", "name": "中間報告会・効果検証", "phase": 2, "duration": 1,
+     "depends": ["t7", "t8", "select"], "staff": {"PMO": 1}},
+    {"id": "system", "name": "システム導入（WMS・TMS等）", "phase": 3, "duration": 12, "depends": ["select"],
+     "staff": {"IT": 1, "PMO": 1}},
+    {"id": "rollout", "name": "全拠点展開（倉庫・配送）", "phase": 3, "duration": 14, "depends": ["review2", "t4"],
+     "staff": {"現場改善": 2}},
+    {"id": "vmi", "name": "VMI拡大展開", "phase": 3, "duration": 8, "depends": ["t7", "review2"], "release": 23,
+     "staff": {"PMO": 1}},
+    {"id": "iot", "name": "IoT本格展開", "phase": 3, "duration": 7, "depends": ["t8", "review2"], "release": 23,
+     "staff": {"IT": 1}},
+    {"id": "final", "name": "最終報告会・自走体制確立", "phase": 3, "duration": 1,
+     "depends": ["system", "rollout", "vmi", "iot", "t9"], "staff": {"PMO": 1}},
+]
+
+
+def critical_path(tasks):
+    """CPM計算：最早開始・最早終了・最遅開始・余裕・クリティカル活動
+
+    資源制約は考慮しない。戻り値の配列は tasks と同じ並び。
+    """
+    order, index, preds, succs = _topology(tasks)
+    n = len(tasks)
+    duration = np.array([t["duration"] for t in tasks], dtype=float)
+    release = np.array([t.get("release", 0) for t in tasks], dtype=float)
+
+    es = np.zeros(n)
+    for i in order:
+        es[i] = max([release[i]] + [es[p] + duration[p] for p in preds[i]])
+    ef = es + duration
+    makespan = float(ef.max()) if n else 0.0
+
+    lf = np.full(n, makespan)
+    for i in reversed(order):
+        if succs[i]:
+            lf[i] = min(lf[s] - duration[s] for s in succs[i])
+    ls = lf - duration
+    slack = ls - es
+
+    return {
+        "start": es,
+        "finish": ef,
+        "latest_start": ls,
+        "slack": slack,
+        "critical": [tasks[i]["id"] for i in order if slack[i] < 1e-9],
+        "makespan": makespan,
+    }
+
+
+def level_resources(tasks, capacity=STAFF_CAPACITY, priority=None):
+    """資源制約付きリストスケジューリング（シリアル方式）
+
+    先行活動がすべて確定した活動をヒープに積み、優先度（既定は最遅開始が早い順）の
+    高いものから、要員の上限を超えない最早の月に割り付ける。
+    """
+    order, index, preds, succs = _topology(tasks)
+    n = len(tasks)
+    duration = np.array([t["duration"] for t in tasks], dtype=int)
+    release = np.array([t.get("release", 0) for t in tasks], dtype=int)
+    if priority is None:
+        priority = critical_path(tasks)["latest_start"]
+
+    resources = list(capacity)
+    limit = np.array([capacity[r] for r in resources], dtype=int)
+    need = np.zeros((n, len(resources)), dtype=int)
+    for i, task in enumerate(tasks):
+        for name, count in task.get("staff", {}).items():
+            if name not in capacity:
+                raise KeyError(f"未定義の要員区分です: {name}")
+            if count > capacity[name]:
+                raise ValueError(f"{task['id']} の必要要員（{name}: {count}人）が上限を超えています")
+            need[i, resources.index(name)] = count
+
+    # 要員の月別使用量（全活動を直列に並べても収まる長さを確保）
+    horizon = max(int(duration.sum() + release.max(initial=0)), 1)
+    usage = np.zeros((horizon, len(resources)), dtype=int)
+
+    start = np.zeros(n, dtype=int)
+    finish = np.zeros(n, dtype=int)
+    end = 0
+    remaining = np.array([len(p) for p in preds])
+    ready = [(priority[i], i) for i in range(n) if remaining[i] == 0]
+    heapq.heapify(ready)
+
+    while ready:
+        _, i = heapq.heappop(ready)
+        earliest = max([release[i]] + [finish[p] for p in preds[i]])
+        t = _first_fit(usage, limit - need[i], earliest, duration[i], end)
+        start[i], finish[i] = t, t + duration[i]
+        usage[t:finish[i]] += need[i]
+        end = max(end, finish[i])
+
+        for s in succs[i]:
+            remaining[s] -= 1
+            if remaining[s] == 0:
+                heapq.heappush(ready, (priority[s], s))
+
+    return {
+        "start": start,
+        "finish": finish,
+        "makespan": int(finish.max(initial=0)),
+        "usage": dict(zip(resources, usage[:int(finish.max(initial=0))].T)),
+    }
+
+
+def plan(tasks=THEME_ACTIVITIES, capacity=STAFF_CAPACITY):
+    """CPMと資源平準化をまとめて計算し、活動別の日程表を返す"""
+    cpm = critical_path(tasks)
+    leveled = level_resources(tasks, capacity, cpm["latest_start"])
+    critical = set(cpm["critical"])
+
+    rows = []
+    for i, task in enumerate(tasks):
+        rows.append({
+            "id": task["id"],
+            "name": task["name"],
+            "phase": task.get("phase"),
+            "start": int(leveled["start"][i]),
+            "finish": int(leveled["finish"][i]),
+            "slack": float(cpm["slack"][i]),
+            "critical": task["id"] in critical,
+            "delay": int(leveled["start"][i] - cpm["start"][i]),
+        })
+
+    return {
+        "rows": rows,
+        "critical": cpm["critical"],
+        "makespan": leveled["makespan"],
+        "unconstrained_makespan": cpm["makespan"],
+        "usage": leveled["usage"],
+    }
+
+
+def format_period(start, finish):
+    """月インデックスの区間を「Month 2-4」の表記に整形"""
+    if finish - start <= 1:
+        return f"Month {start + 1}"
+    return f"Month {start + 1}-{finish}"
+
+
+def _first_fit(usage, room, earliest, duration, end):
+    """使用量が余力（room）以内に収まる長さdurationの区間の最早開始月
+
+    end 以降は未使用のため、earliest から end までの区間だけを調べる。
+    """
+    if duration <= 0 or earliest >= end:
+        return earliest
+    fits = (usage[earliest:end] <= room).all(axis=1)
+    fits = np.concatenate([fits, np.ones(duration, dtype=bool)])
+    # 連続して空いている月数を累積和で判定
+    window = np.concatenate([[0], np.cumsum(fits)])
+    counts = window[duration:] - window[:-duration]
+    return earliest + int(np.argmax(counts == duration))
+
+
+def _topology(tasks):
+    """活動の依存関係を解決してトポロジカル順を返す（循環・未定義はエラー）"""
+    index = {}
+    for i, task in enumerate(tasks):
+        if task["id"] in index:
+            raise ValueError(f"活動IDが重複しています: {task['id']}")
+        index[task["id"]] = i
+
+    preds = [[] for _ in tasks]
+    succs = [[] for _ in tasks]
+    for i, task in enumerate(tasks):
+        for dep in task.get("depends", []):
+            if dep not in index:
+                raise KeyError(f"未定義の先行活動です: {dep}")
+            preds[i].append(index[dep])
+            succs[index[dep]].append(i)
+
+    remaining = [len(p) for p in preds]
+    queue = [i for i, r in enumerate(remaining) if r == 0]
+    order = []
+    while queue:
+        i = queue.pop()
+        order.append(i)
+        for s in succs[i]:
+            remaining[s] -= 1
+            if remaining[s] == 0:
+                queue.append(s)
+    if len(order) != len(tasks):
+        cyclic = sorted(tasks[i]["id"] for i, r in enumerate(remaining) if r > 0)
+        raise ValueError(f"循環する依存関係があります: {', '.join(cyclic)}")
+
+    return order, index, preds, succs
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+感度分析（トルネード・Sobol指数）
+財務モデルの各前提値を1つずつ（OAT）および同時に（Sobol）振り、
+どの前提が経常利益率などの出力を最も動かすかを定量化する。
+評価はチャンクに分割し、必要に応じてプロセスプールで並列に実行する（既定は逐次）
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from financial_model import build_default_model, logistics_cut_rate, margin_component
+
+# 改善後経常利益率を動かす前提値の変動幅（下限, 上限）。改善要因は経常利益率ブリッジのレンジ
+# 現状の経常利益率（1.73%）は実績値で前提ではないため振らない（出力の起点としてモデルの値に固定）
+DEFAULT_RANGES = {
+    "物流コスト削減率": logistics_cut_rate(),
+    "総利益率改善効果": margin_component("総利益率改善効果"),
+    "オペレーション効率化": margin_component("オペレーション効率化"),
+    "物流コスト": (33000, 37000),
+    "売上高": (456209, 504629),
+}
+
+CHUNK_SIZE = 16384
+
+
+def tornado(output, ranges=DEFAULT_RANGES, model_factory=build_default_model):
+    """各前提を下限・上限に振った時の出力（影響幅の大きい順）"""
+    model = model_factory()
+    base = float(model.value(output))
+
+    names = list(ranges)
+    k = len(names)
+    # 2k通りのケースを1回のバッチ評価で計算
+    assignments = {}
+    for i, name in enumerate(names):
+        current = model.value(name)
+        column = np.full(2 * k, current, dtype=float)
+        column[2 * i] = ranges[name][0]
+        column[2 * i + 1] = ranges[name][1]
+        assignments[name] = column
+    y = np.asarray(model.evaluate_batch(assignments)[output], dtype=float)
+
+    rows = [(name, float(y[2 * i]), float(y[2 * i + 1])) for i, name in enumerate(names)]
+    rows.sort(key=lambda r: abs(r[2] - r[1]), reverse=True)
+    return {"output": output, "base": base, "rows": rows}
+
+
+def sobol_indices(output, ranges=DEFAULT_RANGES, n=10000, seed=0, workers=1,
+                  model_factory=build_default_model):
+    """Saltelli法のサンプリングで1次・全次のSobol指数を推定"""
+    names = list(ranges)
+    k = len(names)
+    lo = np.array([ranges[name][0] for name in names], dtype=float)
+    hi = np.array([ranges[name][1] for name in names], dtype=float)
+
+    rng = np.random.default_rng(seed)
+    a = lo + rng.random((n, k)) * (hi - lo)
+    b = lo + rng.random((n, k)) * (hi - lo)
+
+    # [A, B, AB_1, ..., AB_k] を縦に連結（AB_i はAのi列目をBで置換）
+    blocks = [a, b]
+    for i in range(k):
+        ab = a.copy()
+        ab[:, i] = b[:, i]
+        blocks.append(ab)
+    samples = np.vstack(blocks)
+
+    y = evaluate_parallel(output, names, samples, workers, model_factory)
+    # 出力を中心化して推定量の分散を抑える（指数の期待値は不変）
+    y = y - y[:2 * n].mean()
+    y_a, y_b = y[:n], y[n:2 * n]
+    y_ab = y[2 * n:].reshape(k, n)
+
+    variance = np.var(np.concatenate([y_a, y_b]))
+    if variance == 0:
+        first = total = np.zeros(k)
+    else:
+        first = np.mean(y_b * (y_ab - y_a), axis=1) / variance
+        total = 0.5 * np.mean((y_a - y_ab) ** 2, axis=1) / variance
+
+    return {
+        "output": output,
+        "names": names,
+        "first_order": first,
+        "total_order": total,
+        "evaluations": len(samples),
+    }
+
+
+def evaluate_parallel(output, names, samples, workers=1, model_factory=build_default_model):
+    """サンプル行列をチャンクに分割して並列評価し、出力を連結して返す
+
+    1チャンクのベクトル評価は数ミリ秒で終わり、プロセス起動の方が高くつくため既定は逐次
+    （workers=None で CPU 数）。
+    """
+    chunks = [samples[i:i + CHUNK_SIZE] for i in range(0, len(samples), CHUNK_SIZE)]
+    tasks = [(model_factory, output, names, chunk) for chunk in chunks]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) == 1:
+        results = [_evaluate_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            results = list(executor.map(_evaluate_chunk, tasks))
+    return np.concatenate(results)
+
+
+def _evaluate_chunk(task):
+    """ワーカー側でモデルを構築し、1チャンク分をベクトル評価"""
+    model_factory, output, names, chunk = task
+    model = model_factory()
+    assignments = {name: chunk[:, i] for i, name in enumerate(names)}
+    return np.broadcast_to(model.evaluate_batch(assignments)[output], (len(chunk),)).astype(float)
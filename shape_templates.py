@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+XMLテンプレートによる図形の高速生成
+テーマカード・成功要因・次のステップで繰り返し使う「角丸四角形＋複数段落」の図形を、
+python-pptx のオブジェクトモデルで一度だけ生成してXMLテンプレート化し、
+以後は文字列の差し込みと一括パースで spTree へまとめて追加する。
+テンプレートはオブジェクトモデルの出力そのものから作るため、生成結果は従来の手順と一致する
+"""
+
+import re
+import time
+from collections import namedtuple
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from lxml import etree
+from pptx import Presentation
+from pptx.dml.color import RGBColor
+from pptx.enum.shapes import MSO_SHAPE
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls, qn
+from pptx.shapes.autoshape import AutoShapeType
+from pptx.util import Inches, Pt
+
+# 図形の書式（None の項目は設定しない。fill が None なら既定の塗り、line が None なら枠線なし）
+CardStyle = namedtuple(
+    "CardStyle",
+    ["shape", "fill", "line", "line_width", "word_wrap", "margin_left", "margin_top"],
+)
+CardStyle.__new__.__defaults__ = (None,) * 6
+
+# 段落の書式（None の項目は設定しない）
+ParagraphStyle = namedtuple(
+    "ParagraphStyle",
+    ["size", "bold", "color", "alignment", "space_before", "space_after"],
+)
+ParagraphStyle.__new__.__defaults__ = (None,) * 6
+
+# テンプレート生成時の仮の値（生成後に差し込み枠へ置換）
+SENTINEL_TEXT = "@@TEXT@@"
+SENTINEL_RECT = (9111111, 9222222, 9333333, 9444444)
+
+NSDECLS = nsdecls("a", "p", "r")
+
+
+# ---------------------------------------------------------------------------
+# オブジェクトモデルによる生成（テンプレートの元・等価性検証の基準）
+# ---------------------------------------------------------------------------
+
+def add_card_object_model(slide, rect, paragraphs, style):
+    """python-pptx の図形APIで1枚のカードを追加（paragraphs は (本文, ParagraphStyle) のリスト）"""
+    left, top, width, height = rect
+    shape = slide.shapes.add_shape(style.shape, left, top, width, height)
+    if style.fill is not None:
+        shape.fill.solid()
+        shape.fill.fore_color.rgb = style.fill
+    if style.line is None:
+        shape.line.fill.background()
+    else:
+        shape.line.color.rgb = style.line
+        if style.line_width is not None:
+            shape.line.width = style.line_width
+
+    tf = shape.text_frame
+    if style.word_wrap is not None:
+        tf.word_wrap = style.word_wrap
+    if style.margin_left is not None:
+        tf.margin_left = style.margin_left
+    if style.margin_top is not None:
+        tf.margin_top = style.margin_top
+
+    for i, (text, pstyle) in enumerate(paragraphs):
+        p = tf.paragraphs[0] if i == 0 else tf.add_paragraph()
+        p.text = text
+        if pstyle.alignment is not None:
+            p.alignment = pstyle.alignment
+        if pstyle.size is not None:
+            p.font.size = pstyle.size
+        if pstyle.bold is not None:
+            p.font.bold = pstyle.bold
+        if pstyle.color is not None:
+            p.font.color.rgb = pstyle.color
+        if pstyle.space_before is not None:
+            p.space_before = pstyle.space_before
+        if pstyle.space_after is not None:
+            p.space_after = pstyle.space_after
+    return shape
+
+
+# ---------------------------------------------------------------------------
+# テンプレートのコンパイル
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def _scratch_slide():
+    """テンプレート生成用の作業スライド"""
+    prs = Presentation()
+    return prs.slides.add_slide(prs.slide_layouts[6])
+
+
+def _render(style, paragraphs):
+    """作業スライドにカードを生成し、名前空間宣言を除いた p:sp のXML文字列を返す"""
+    slide = _scratch_slide()
+    shape = add_card_object_model(slide, SENTINEL_RECT, paragraphs, style)
+    sp = shape._element
+    xml = etree.tostring(sp, encoding="unicode")
+    sp.getparent().remove(sp)
+    return re.sub(r' xmlns:\w+="[^"]*"', "", xml)
+
+
+def _slot(xml):
+    """XML中の波括弧をエスケープし、仮の値を差し込み枠に置換"""
+    xml = xml.replace("{", "{{").replace("}", "}}")
+    for name, value in zip(("x", "y", "cx", "cy"), SENTINEL_RECT):
+        xml = xml.replace(f'{name}="{value}"', f'{name}="{{{name}}}"')
+    xml = re.sub(r'<p:cNvPr id="\d+" name="[^"]*"', '<p:cNvPr id="{id}" name="{name}"', xml, count=1)
+    return xml.replace(SENTINEL_TEXT, "{text}")
+
+
+def _paragraph_xml(xml, index):
+    """p:txBody 内の index 番目の a:p 要素の文字列"""
+    return re.findall(r"<a:p>.*?</a:p>|<a:p/>", xml.split("<p:txBody>", 1)[1])[index]
+
+
+@lru_cache(maxsize=None)
+def shape_template(style):
+    """図形部分のテンプレート（段落は {paragraphs} に差し込む）"""
+    xml = _slot(_render(style, [(SENTINEL_TEXT, ParagraphStyle())]))
+    head, tail = xml.split("<a:p>", 1)
+    return head + "{paragraphs}" + tail[tail.index("</a:p>") + len("</a:p>"):]
+
+
+@lru_cache(maxsize=None)
+def paragraph_template(pstyle, first):
+    """段落のテンプレート（先頭段落は図形の既定段落を使うため書式が異なる）"""
+    if first:
+        xml = _render(CardStyle(MSO_SHAPE.RECTANGLE), [(SENTINEL_TEXT, pstyle)])
+        return _slot(_paragraph_xml(xml, 0))
+    xml = _render(CardStyle(MSO_SHAPE.RECTANGLE), [("", ParagraphStyle()), (SENTINEL_TEXT, pstyle)])
+    return _slot(_paragraph_xml(xml, 1))
+
+
+@lru_cache(maxsize=None)
+def _basename(shape):
+    return AutoShapeType(shape).basename
+
+
+# ---------------------------------------------------------------------------
+# 一括追加
+# ---------------------------------------------------------------------------
+
+def add_cards(slide, cards):
+    """カード（(CardStyle, (left, top, width, height), 段落リスト) のリスト）をまとめて追加
+
+    図形IDは python-pptx と同じ規則（使用済みIDの最大値＋1、途中の欠番は使わない）で採番し、全カードのXMLを
+    1回のパースで要素化して spTree へ順に挿入する。追加した図形のIDのリストを返す。
+    本文の改行（\\n・\\v）には対応しない。
+    """
+    spTree = slide.shapes._spTree
+    next_id = max((int(i) for i in spTree.xpath("//@id") if i.isdigit()), default=0)
+
+    fragments, ids = [], []
+    for style, (left, top, width, height), paragraphs in cards:
+        next_id += 1
+        ids.append(next_id)
+
+        body = []
+        for i, (text, pstyle) in enumerate(paragraphs):
+            if "\n" in text or "\v" in text:
+                raise ValueError(f"改行を含む本文はテンプレートで生成できません: {text!r}")
+            body.append(paragraph_template(pstyle, i == 0).format(text=escape(text)))
+        fragments.append(shape_template(style).format(
+            id=next_id,
+            name=escape(f"{_basename(style.shape)} {next_id - 1}", {'"': "&quot;"}),
+            x=int(left), y=int(top), cx=int(width), cy=int(height),
+            paragraphs="".join(body),
+        ))
+
+    container = parse_xml(f"<p:spTree {NSDECLS}>{''.join(fragments)}</p:spTree>")
+    extLst = spTree.find(qn("p:extLst"))
+    if extLst is None:
+        spTree.extend(container)
+    else:
+        for sp in list(container):
+            extLst.addprevious(sp)
+    return ids
+
+
+# ---------------------------------------------------------------------------
+# 等価性検証とベンチマーク
+# ---------------------------------------------------------------------------
+
+SAMPLE_STYLE = CardStyle(
+    MSO_SHAPE.ROUNDED_RECTANGLE, fill=RGBColor(245, 248, 252), line=RGBColor(26, 84, 144),
+    line_width=Pt(1.5), word_wrap=True, margin_left=Inches(0.15), margin_top=Inches(0.08),
+)
+
+
+def sample_cards(count, style=SAMPLE_STYLE):
+    """検証・計測用の合成カード（見出し＋本文2段落）"""
+    title = ParagraphStyle(size=Pt(16), bold=True, color=RGBColor(192, 57, 43), space_after=Pt(6))
+    body = ParagraphStyle(size=Pt(13), space_before=Pt(3))
+    cards = []
+    for i in range(count):
+        rect = (Inches(0.5), Inches(0.1 + (i % 6) * 1.2), Inches(9), Inches(1.1))
+        cards.append((style, rect, [
+            (f"テーマ{i + 1}：在庫 & 物流 <改善>", title),
+            (f"効果：在庫削減{(i * 37) % 900 + 100}百万円", body),
+        ]))
+    return cards
+
+
+def shapes_equivalent(cards):
+    """オブジェクトモデルとテンプレートで生成したスライドXMLが一致するかを比較（正規化XML）"""
+    prs = Presentation()
+    expected, actual = (prs.slides.add_slide(prs.slide_layouts[6]) for _ in range(2))
+    # 既存図形のIDに欠番がある場合も同じIDになるか確認する
+    for slide in (expected, actual):
+        first, _ = (slide.shapes.add_textbox(0, 0, Inches(1), Inches(1)) for _ in range(2))
+        slide.shapes._spTree.remove(first._element)
+    for style, rect, paragraphs in cards:
+        add_card_object_model(expected, rect, paragraphs, style)
+    add_cards(actual, cards)
+
+    def canonical(slide):
+        return etree.tostring(slide.shapes._spTree, method="c14n")
+
+    return canonical(expected) == canonical(actual)
+
+
+def benchmark(slides=200, cards_per_slide=5):
+    """図形生成の所要時間をオブジェクトモデルとテンプレートで比較"""
+    cards = sample_cards(cards_per_slide)
+    add_cards(_scratch_slide(), cards)  # テンプレートのコンパイルは計測から除く
+
+    def timed(build):
+        prs = Presentation()
+        blank = prs.slide_layouts[6]
+        start = time.perf_counter()
+        for _ in range(slides):
+            build(prs.slides.add_slide(blank))
+        return time.perf_counter() - start
+
+    def object_model(slide):
+        for style, rect, paragraphs in cards:
+            add_card_object_model(slide, rect, paragraphs, style)
+
+    # スライド追加の時間は両方に共通のため差し引く
+    baseline = timed(lambda slide: None)
+    om = timed(object_model) - baseline
+    tpl = timed(lambda slide: add_cards(slide, cards)) - baseline
+    return {
+        "shapes": slides * cards_per_slide,
+        "object_model": om,
+        "template": tpl,
+        "speedup": om / tpl,
+        "equivalent": shapes_equivalent(sample_cards(12)),
+    }
+
+
+if __name__ == "__main__":
+    r = benchmark()
+    print(f"図形数: {r['shapes']:,}")
+    print(f"オブジェクトモデル: {r['object_model'] * 1000:.1f} ms")
+    print(f"テンプレート　　　: {r['template'] * 1000:.1f} ms  x{r['speedup']:.1f}")
+    print(f"出力一致: {r['equivalent']}")
@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+テキスト自動フィットエンジン
+フォント別の字幅テーブル（キャッシュ）で和文・欧文の行幅を計測し、
+折り返し・フォント縮小・ボックス拡張でテキストをボックス内に収める
+"""
+
+import unicodedata
+from functools import lru_cache
+
+from pptx.enum.shapes import PP_PLACEHOLDER
+from pptx.oxml.ns import qn
+from pptx.util import Emu, Inches, Pt
+
+EMU_PER_PT = 12700
+
+DEFAULT_FONT = "Yu Gothic"
+DEFAULT_SIZE = Pt(18)
+LINE_SPACING = 1.2  # 行送り（フォントサイズ比）
+BOLD_FACTOR = 1.04  # 太字時の字幅増分
+
+# 既定の内部余白（python-pptxのテキストフレーム既定値）
+DEFAULT_MARGIN_LR = Inches(0.1)
+DEFAULT_MARGIN_TB = Inches(0.05)
+
+# フォント別の字幅プロファイル（em比）
+FONT_PROFILES = {
+    "Yu Gothic": {"latin_scale": 1.00, "wide": 1.0, "ambiguous": 1.0},
+    "Meiryo": {"latin_scale": 1.08, "wide": 1.0, "ambiguous": 1.0},
+    "MS PGothic": {"latin_scale": 0.95, "wide": 1.0, "ambiguous": 1.0},
+    "Calibri": {"latin_scale": 0.90, "wide": 1.0, "ambiguous": 0.6},
+}
+
+# 欧文の字幅（em比、Yu Gothic相当）
+NARROW_CHARS = set("il.,:;'|!jtf()[]`")
+WIDE_LATIN_CHARS = set("mwMW@%")
+
+# プレースホルダー種別 → 既定書式を持つマスターの txStyles 要素（その他の種別は bodyStyle）
+MASTER_TEXT_STYLES = {
+    PP_PLACEHOLDER.TITLE: "p:titleStyle",
+    PP_PLACEHOLDER.CENTER_TITLE: "p:titleStyle",
+    PP_PLACEHOLDER.DATE: "p:otherStyle",
+    PP_PLACEHOLDER.FOOTER: "p:otherStyle",
+    PP_PLACEHOLDER.SLIDE_NUMBER: "p:otherStyle",
+}
+
+# 行頭禁則文字
+KINSOKU_HEAD = set("、。，．・：；？！ー）」』】〕〉》）］｝%％")
+
+# 登録済みフォントファイル（Pillowがあれば実測）
+_font_files = {}
+
+
+def register_font(name, path):
+    """フォントファイルを登録し、以降の計測を実測値に切り替える"""
+    _font_files[name] = path
+    _advance_table.cache_clear()
+    _text_width_em.cache_clear()
+    _wrap_segment.cache_clear()
+
+
+def measure_text(text, size=DEFAULT_SIZE, font=DEFAULT_FONT, bold=False):
+    """テキストの描画幅（EMU）を返す"""
+    return Emu(int(_text_width_em(text, font, bold) * size))
+
+
+def wrap_text(text, width, size=DEFAULT_SIZE, font=DEFAULT_FONT, bold=False):
+    """指定幅（EMU）で折り返した行リストを返す（和文は文字単位、欧文は単語単位）"""
+    lines = []
+    for segment in text.replace("\v", "\n").split("\n"):
+        lines.extend(_wrap_segment(segment, width / size, font, bold))
+    return lines
+
+
+def paragraph_height(p, width, font=DEFAULT_FONT, size=None, bold=None, wrap=True):
+    """段落の必要高さ（EMU）を返す（size・bold 未指定時は段落・ランの明示値、wrap=False は改行のみで行分割）"""
+    size = size or _paragraph_size(p)
+    if bold is None:
+        bold = bool(p.font.bold) or any(r.font.bold for r in p.runs)
+    if wrap:
+        n_lines = max(1, len(wrap_text(p.text, width, size, font, bold)))
+    else:
+        n_lines = p.text.replace("\v", "\n").count("\n") + 1
+
+    height = n_lines * size * LINE_SPACING
+    height += _length(p.space_before) + _length(p.space_after)
+    return int(height)
+
+
+def text_frame_height(tf, width, font=DEFAULT_FONT, styles=None, wrap=True):
+    """テキストフレーム全体の必要高さ（EMU）を返す（styles は段落ごとの (サイズ, 太字)、shape_styles の戻り値）"""
+    inner = width - _margin(tf.margin_left, DEFAULT_MARGIN_LR) - _margin(tf.margin_right, DEFAULT_MARGIN_LR)
+    styles = styles or [(None, None)] * len(tf.paragraphs)
+    height = sum(paragraph_height(p, inner, font, size, bold, wrap) for p, (size, bold) in zip(tf.paragraphs, styles))
+    height += _margin(tf.margin_top, DEFAULT_MARGIN_TB) + _margin(tf.margin_bottom, DEFAULT_MARGIN_TB)
+    return height
+
+
+def text_frame_width(tf, font=DEFAULT_FONT, styles=None):
+    """折り返し無しのテキストフレームの必要幅（最長行＋左右余白、EMU）を返す"""
+    styles = styles or [(None, None)] * len(tf.paragraphs)
+    widest = 0
+    for p, (size, bold) in zip(tf.paragraphs, styles):
+        size = size or _paragraph_size(p)
+        if bold is None:
+            bold = bool(p.font.bold) or any(r.font.bold for r in p.runs)
+        for line in p.text.replace("\v", "\n").split("\n"):
+            widest = max(widest, measure_text(line, size, font, bold))
+    return widest + _margin(tf.margin_left, DEFAULT_MARGIN_LR) + _margin(tf.margin_right, DEFAULT_MARGIN_LR)
+
+
+def shape_styles(shape):
+    """段落ごとの実効 (フォントサイズ, 太字)
+
+    明示値が無い段落はプレースホルダーの継承元（スライド→レイアウト→マスターの lstStyle、
+    マスターの txStyles）から解決する。プレースホルダーでサイズが解決できない段落は None
+    """
+    chain = _inheritance_chain(shape)
+    styles = []
+    for p in shape.text_frame.paragraphs:
+        size = _paragraph_size(p, default=None)
+        bold = True if p.font.bold or any(r.font.bold for r in p.runs) else p.font.bold
+        level = p.level + 1
+        if size is None:
+            value = _inherited_attr(chain, level, "sz")
+            size = Pt(int(value) / 100) if value is not None else (None if chain else DEFAULT_SIZE)
+        if bold is None:
+            bold = _inherited_attr(chain, level, "b") in ("1", "true")
+        styles.append((size, bold))
+    return styles
+
+
+def shape_word_wrap(shape):
+    """実効の折り返し設定（シェイプ→継承元の bodyPr@wrap、未指定は折り返す）"""
+    if shape.text_frame.word_wrap is not None:
+        return shape.text_frame.word_wrap
+    for element in _inheritance_chain(shape)[1:-1]:
+        body_pr = element.find(f"{qn('p:txBody')}/{qn('a:bodyPr')}")
+        if body_pr is not None and body_pr.get("wrap") is not None:
+            return body_pr.get("wrap") != "none"
+    return True
+
+
+def fit_shape(shape, min_size=Pt(9), step=Pt(0.5), reflow=False, max_height=None, font=DEFAULT_FONT):
+    """シェイプのテキストをボックスに収める（縮小→必要ならボックス拡張）
+
+    フォントサイズ・折り返しはプレースホルダーの継承元から解決する。
+    継承サイズが解決できないプレースホルダーは変更せず None を返す
+    """
+    tf = shape.text_frame
+    styles = shape_styles(shape)
+    if any(size is None for size, _ in styles):
+        return None
+    wrap = shape_word_wrap(shape)
+
+    def overflows(styles):
+        required = text_frame_height(tf, shape.width, font, styles, wrap)
+        too_wide = not wrap and text_frame_width(tf, font, styles) > shape.width
+        return required, required > shape.height or too_wide
+
+    required, overflow = overflows(styles)
+    result = {"shape": shape.name, "required": required, "height": shape.height, "scale": 1.0, "overflow": False}
+
+    if not overflow:
+        return result
+
+    # 全段落のフォントを同比率で縮小（最小サイズに達した段落はそこで止める）
+    sizes = [size for size, _ in styles]
+    largest = max(sizes)
+    scale = 1.0
+    while overflow and largest * scale - step >= min_size:
+        scale -= step / largest
+        _apply_sizes(tf, sizes, scale, min_size)
+        required, overflow = overflows(shape_styles(shape))
+    result["scale"] = round(scale, 3)
+
+    if required > shape.height and reflow:
+        limit = max_height if max_height is not None else required
+        shape.height = Emu(min(required, limit))
+
+    result["required"] = required
+    result["height"] = shape.height
+    result["overflow"] = overflows(shape_styles(shape))[1]
+    return result
+
+
+def fit_slide(slide, include_unwrapped=False, **kwargs):
+    """スライド内の全テキストフレームをフィットさせ、調整結果を返す"""
+    results = []
+    for shape in slide.shapes:
+        if not shape.has_text_frame or not shape.text_frame.text:
+            continue
+        # 折り返し無しのテキストボックス・プレースホルダー（タイトル等、レイアウトからの継承を含む）は既定では対象外
+        if not include_unwrapped and not shape_word_wrap(shape):
+            continue
+        result = fit_shape(shape, **kwargs)
+        if result is not None and (result["scale"] < 1.0 or result["overflow"]):
+            results.append(result)
+    return results
+
+
+def fit_presentation(prs, **kwargs):
+    """全スライドのテキストをフィットさせ、{スライド番号: 調整結果} を返す"""
+    report = {}
+    for i, slide in enumerate(prs.slides, start=1):
+        results = fit_slide(slide, **kwargs)
+        if results:
+            report[i] = results
+    return report
+
+
+@lru_cache(maxsize=65536)
+def _wrap_segment(segment, width_em, font, bold):
+    """1行分のテキストを幅（em換算）で折り返す"""
+    if not segment:
+        return ("",)
+    if _text_width_em(segment, font, bold) <= width_em:
+        return (segment,)
+
+    lines = []
+    line = ""
+    line_width = 0.0
+
+    for token in _fit_tokens(_tokens(segment), width_em, font, bold):
+        token_width = _text_width_em(token, font, bold)
+        if line and line_width + token_width > width_em:
+            # 禁則文字は前の行へ追い込む
+            if token[0] in KINSOKU_HEAD:
+                line += token
+                token = ""
+            lines.append(line.rstrip())
+            line = token.lstrip()
+            line_width = _text_width_em(line, font, bold)
+            continue
+        line += token
+        line_width += token_width
+
+    if line:
+        lines.append(line)
+    return tuple(lines)
+
+
+def _tokens(text):
+    """折り返し単位に分割（欧文は単語＋後続空白、和文は1文字）"""
+    token = ""
+    for c in text:
+        if _is_wide(c):
+            if token:
+                yield token
+                token = ""
+            yield c
+        elif c == " ":
+            token += c
+            yield token
+            token = ""
+        else:
+            token += c
+    if token:
+        yield token
+
+
+def _fit_tokens(tokens, width_em, font, bold):
+    """ボックス幅を超える欧文の単語（URL・型番等）を幅に収まる文字列に分割"""
+    for token in tokens:
+        if len(token) == 1 or _text_width_em(token, font, bold) <= width_em:
+            yield token
+            continue
+        piece = ""
+        for c in token:
+            if piece and _text_width_em(piece + c, font, bold) > width_em:
+                yield piece
+                piece = ""
+            piece += c
+        if piece:
+            yield piece
+
+
+def _is_wide(c):
+    """全角文字かどうか"""
+    return unicodedata.east_asian_width(c) in ("W", "F")
+
+
+@lru_cache(maxsize=None)
+def _advance_table(font, bold):
+    """フォント別の字幅関数（em比、文字単位でキャッシュ）を返す"""
+    measure = _file_measure(font)
+    profile = FONT_PROFILES.get(font, FONT_PROFILES[DEFAULT_FONT])
+    factor = BOLD_FACTOR if bold else 1.0
+    cache = {}
+
+    def advance(c):
+        value = cache.get(c)
+        if value is None:
+            if measure is not None:
+                value = measure(c)
+            else:
+                value = _model_advance(c, profile)
+            value *= factor
+            cache[c] = value
+        return value
+
+    return advance
+
+
+def _model_advance(c, profile):
+    """字幅モデルによる推定値（em比）"""
+    eaw = unicodedata.east_asian_width(c)
+    if eaw in ("W", "F"):
+        return profile["wide"]
+    if eaw == "A":
+        return profile["ambiguous"]
+    if eaw == "H":
+        return 0.5
+    if c == " ":
+        return 0.3
+    if c in NARROW_CHARS:
+        return 0.3 * profile["latin_scale"]
+    if c in WIDE_LATIN_CHARS:
+        return 0.85 * profile["latin_scale"]
+    if c.isdigit():
+        return 0.55 * profile["latin_scale"]
+    if c.isupper():
+        return 0.65 * profile["latin_scale"]
+    return 0.52 * profile["latin_scale"]
+
+
+def _file_measure(font):
+    """登録フォントファイルからの字幅計測関数（Pillowが無ければNone）"""
+    path = _font_files.get(font)
+    if path is None:
+        return None
+    try:
+        from PIL import ImageFont
+    except ImportError:
+        return None
+
+    units = 1000
+    face = ImageFont.truetype(path, units)
+    return lambda c: face.getlength(c) / units
+
+
+@lru_cache(maxsize=65536)
+def _text_width_em(text, font, bold):
+    """テキスト幅（em比）、同一文字列の再計測はキャッシュから返す"""
+    table = _advance_table(font, bold)
+    return sum(table(c) for c in text)
+
+
+def _paragraph_size(p, default=DEFAULT_SIZE):
+    """段落の明示フォントサイズ（段落→先頭ラン→既定値の順）"""
+    if p.font.size is not None:
+        return p.font.size
+    for r in p.runs:
+        if r.font.size is not None:
+            return r.font.size
+    return default
+
+
+def _inheritance_chain(shape):
+    """書式の継承元要素（シェイプ→レイアウト→マスターのプレースホルダー→マスターの txStyles）
+
+    プレースホルダー以外は空リスト
+    """
+    if not shape.is_placeholder:
+        return []
+    chain = [shape._element]
+    base = shape
+    while True:
+        base = getattr(base, "_base_placeholder", None)
+        if base is None:
+            break
+        chain.append(base._element)
+
+    style = MASTER_TEXT_STYLES.get(shape._element.ph_type, "p:bodyStyle")
+    chain.append(_slide_master(shape.part).element.find(f"{qn('p:txStyles')}/{qn(style)}"))
+    return [element for element in chain if element is not None]
+
+
+def _slide_master(part):
+    """スライド・レイアウト・マスターのパーツが属するマスター"""
+    if hasattr(part, "slide_master"):
+        return part.slide_master
+    return part.slide_layout.slide_master
+
+
+def _inherited_attr(chain, level, attr):
+    """継承元の lstStyle（txStyles は直下）の lvlNpPr/defRPr の属性値（無ければ None）"""
+    for element in chain:
+        if element.tag == qn("p:sp"):
+            style = element.find(f"{qn('p:txBody')}/{qn('a:lstStyle')}")
+        else:
+            style = element
+        if style is None:
+            continue
+        def_rpr = style.find(f"{qn(f'a:lvl{level}pPr')}/{qn('a:defRPr')}")
+        if def_rpr is not None and def_rpr.get(attr) is not None:
+            return def_rpr.get(attr)
+    return None
+
+
+def _apply_sizes(tf, sizes, scale, min_size):
+    """元サイズに倍率を掛けて段落・ランのフォントサイズを更新"""
+    for p, size in zip(tf.paragraphs, sizes):
+        new_size = Pt(max(round(size * scale / EMU_PER_PT * 2) / 2, min_size / EMU_PER_PT))
+        p.font.size = new_size
+        for r in p.runs:
+            if r.font.size is not None:
+                r.font.size = new_size
+
+
+def _length(value):
+    """Noneを0として長さ（EMU）を返す"""
+    return 0 if value is None else int(value)
+
+
+def _margin(value, default):
+    """内部余白（未設定時は既定値）"""
+    return default if value is None else value
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+出荷ウェーブ計画・ピッキングのバッチ編成
+1日分の注文明細を、締め時刻（便の出発）の早い順に作業量が均等になるようウェーブへ割り付け、
+ウェーブ内では通路の重なりが大きい注文同士を同じカート（バッチ）にまとめて歩行距離を減らす。
+注文の類似度は訪問通路集合のMinHash署名で推定し、LSHバケットとロケーションの格子索引
+（重心セル）で候補を絞り込む。歩行距離はS字ルーティングで見積もり、
+到着順にカートへ詰める現状のバッチとの比較から生産性の向上率を求める
+"""
+
+import time
+
+import numpy as np
+
+# 倉庫レイアウト：通路数・通路長（m）・通路間隔（m）、出発点は通路0の手前
+AISLES = 40
+AISLE_LENGTH = 50.0
+AISLE_PITCH = 3.0
+
+# ロケーション格子索引のセル（通路方向の本数 × 奥行き方向の長さ m）
+CELL_AISLES = 4
+CELL_DEPTH = 12.5
+
+# カート1台あたりの上限（注文数・明細数）
+CART_ORDERS = 8
+CART_LINES = 120
+
+# 作業標準：歩行速度（m/秒）、1明細あたりのピッキング時間・1バッチあたりの段取り時間（秒）
+WALK_SPEED = 1.0
+SECONDS_PER_LINE = 10
+SECONDS_PER_BATCH = 120
+
+# 出荷作業の開始時刻と便の締め時刻（時）、ウェーブ数（1時間単位）
+SHIFT_START = 8
+CUTOFFS = (11, 13, 15, 17)
+WAVES = 9
+
+# MinHash署名の長さとLSHの1バンドあたりの行数
+SIGNATURE = 8
+BAND_ROWS = 2
+
+# 候補に加える空間順の前後の注文数
+NEIGHBOR_WINDOW = 4 * CART_ORDERS
+
+# 合成データ：SKU数、商品カテゴリ数（カテゴリごとに隣接する通路へ配置）、1注文の平均明細数、
+# 締め時刻別の注文の割合、1注文が含むカテゴリ数の上限
+SKU_COUNT = 20_000
+CATEGORIES = 10
+LINES_PER_ORDER = 12
+CUTOFF_SHARE = (0.2, 0.3, 0.25, 0.25)
+ORDER_CATEGORIES = 5
+
+_PRIME = (1 << 31) - 1
+
+
+class OrderIndex:
+    """ウェーブ内の注文を LSH バケットと重心セルから引く索引（キーの整列配列と二分探索）"""
+
+    def __init__(self, wave, signature, cell, spatial_rank, bands=SIGNATURE // BAND_ROWS):
+        n = len(wave)
+        self.bands = bands
+        self.band_keys = np.stack([_band_key(wave, b, signature) for b in range(bands)], axis=1)
+        keys = self.band_keys.ravel()
+        self._band_order = np.argsort(keys, kind="stable")
+        self._band_sorted = keys[self._band_order]
+        self._band_members = np.repeat(np.arange(n), bands)[self._band_order]
+
+        self.cell_keys = wave.astype(np.int64) * (1 << 32) + cell
+        self._cell_order = np.argsort(self.cell_keys, kind="stable")
+        self._cell_sorted = self.cell_keys[self._cell_order]
+
+        # ウェーブ内の空間順（重心の通路・奥行き順）の並びと各注文の位置
+        self.spatial = np.lexsort((spatial_rank, wave))
+        self.spatial_pos = np.empty(n, dtype=np.int64)
+        self.spatial_pos[self.spatial] = np.arange(n)
+
+    def bucket_members(self, order):
+        """order と同じ LSH バケットに入る注文"""
+        keys = self.band_keys[order]
+        lo = np.searchsorted(self._band_sorted, keys, side="left")
+        hi = np.searchsorted(self._band_sorted, keys, side="right")
+        return np.concatenate([self._band_members[a:b] for a, b in zip(lo, hi)])
+
+    def cell_members(self, cell_keys):
+        """指定セル（ウェーブ込みのキー）に重心がある注文"""
+        lo = np.searchsorted(self._cell_sorted, cell_keys, side="left")
+        hi = np.searchsorted(self._cell_sorted, cell_keys, side="right")
+        return np.concatenate([self._cell_order[a:b] for a, b in zip(lo, hi)])
+
+    def spatial_neighbors(self, order, window=NEIGHBOR_WINDOW):
+        """空間順で前後 window 件の注文"""
+        p = self.spatial_pos[order]
+        return self.spatial[max(p - window, 0):p + window + 1]
+
+
+def _band_key(wave, band, signature):
+    """ウェーブ・バンド番号・署名の行から64bitのバケットキーを作る"""
+    rows = signature[:, band * BAND_ROWS:(band + 1) * BAND_ROWS].astype(np.int64)
+    key = wave.astype(np.int64) * SIGNATURE + band
+    for r in range(rows.shape[1]):
+        key = key * (1 << 24) + (rows[:, r] & 0xFFFFFF)
+    return key
+
+
+def minhash(order, item, n_orders, size=SIGNATURE, seed=0):
+    """注文ごとの訪問通路集合のMinHash署名（注文×size）"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, size, dtype=np.int64)
+    b = rng.integers(0, _PRIME, size, dtype=np.int64)
+    hashed = (item[:, None].astype(np.int64) * a + b) % _PRIME
+    signature = np.full((n_orders, size), _PRIME, dtype=np.int64)
+    np.minimum.at(signature, order, hashed)
+    return signature
+
+
+def wave_end(wave, waves=WAVES):
+    """ウェーブの作業完了時刻（時）"""
+    length = (max(CUTOFFS) - SHIFT_START) / waves
+    return SHIFT_START + (np.asarray(wave) + 1) * length
+
+
+def assign_waves(cutoff, lines, waves=WAVES):
+    """締め時刻までに終わるウェーブのうち、明細数が均等になるよう注文を割り付け
+
+    締めの遅い注文から後ろのウェーブに詰め、ウェーブの明細数が平均に達したら一つ前へ移る。
+    """
+    latest = np.searchsorted(wave_end(np.arange(waves), waves), cutoff, side="right") - 1
+    if latest.min() < 0:
+        raise ValueError("最初のウェーブでも締め時刻に間に合わない注文があります")
+    target = lines.sum() / waves
+    filled = np.zeros(waves)
+    wave = np.empty(len(cutoff), dtype=np.int64)
+    w = waves - 1
+    for o in np.argsort(-cutoff, kind="stable"):
+        w = min(w, latest[o])
+        while w > 0 and filled[w] + lines[o] > target:
+            w -= 1
+        wave[o] = w
+        filled[w] += lines[o]
+    return wave
+
+
+def plan_batches(order_wave, signature, cell, spatial_rank, lines, cutoff):
+    """ウェーブごとに、類似度の高い注文をカート上限までまとめてバッチ番号を返す
+
+    似た注文は明細数も近いため、大口同士は明細上限、小口同士は注文数上限で締まり、
+    大小を混ぜる到着順よりバッチ数は数%増える。増えた段取り時間は生産性の比較に含める。
+    """
+    n = len(order_wave)
+    index = OrderIndex(order_wave, signature, cell, spatial_rank)
+    assigned = np.zeros(n, dtype=bool)
+    batch = np.empty(n, dtype=np.int64)
+    cell_aisle, cell_depth = cell // 1024, cell % 1024
+    neighbors = np.array([(da, dd) for da in (-1, 0, 1) for dd in (-1, 0, 1)])
+
+    # 種の順序：ウェーブ順、締めの早い順、明細の多い順
+    seeds = np.lexsort((-lines, cutoff, order_wave))
+    count = 0
+    for seed in seeds:
+        if assigned[seed]:
+            continue
+        near = (cell_aisle[seed] + neighbors[:, 0]) * 1024 + (cell_depth[seed] + neighbors[:, 1])
+        candidates = np.concatenate([
+            index.bucket_members(seed),
+            index.cell_members(order_wave[seed] * (1 << 32) + near),
+            index.spatial_neighbors(seed),
+        ])
+        candidates = np.unique(candidates)
+        candidates = candidates[~assigned[candidates] & (order_wave[candidates] == order_wave[seed])
+                                & (candidates != seed)]
+
+        members = [seed]
+        if len(candidates):
+            # 推定ジャカード係数（署名の一致率）の高い順、同率なら重心の近い順
+            similarity = (signature[candidates] == signature[seed]).mean(axis=1)
+            distance = np.abs(spatial_rank[candidates] - spatial_rank[seed])
+            ranked = candidates[np.lexsort((distance, -similarity))]
+            room = CART_LINES - lines[seed]
+            for c in ranked:
+                if len(members) == CART_ORDERS:
+                    break
+                if lines[c] <= room:
+                    members.append(c)
+                    room -= lines[c]
+        assigned[members] = True
+        batch[members] = count
+        count += 1
+    return batch
+
+
+def sequential_batches(order_wave, lines):
+    """現状：ウェーブ内で到着順（注文番号順）にカート上限まで詰める"""
+    batch = np.empty(len(lines), dtype=np.int64)
+    count, orders, load, current = -1, CART_ORDERS, CART_LINES, -1
+    for o in np.lexsort((np.arange(len(lines)), order_wave)):
+        if order_wave[o] != current or orders == CART_ORDERS or load + lines[o] > CART_LINES:
+            count += 1
+            orders, load, current = 0, 0, order_wave[o]
+        batch[o] = count
+        orders += 1
+        load += lines[o]
+    return batch
+
+
+def travel_distance(batch_of_line, aisle, depth):
+    """S字ルーティングによるバッチ別の歩行距離（m）
+
+    訪問する通路は奥まで通り抜け、通路数が奇数のときは最後の通路だけ最も奥のロケーションで折り返す。
+    """
+    n_batches = int(batch_of_line.max()) + 1
+    key = batch_of_line * AISLES + aisle
+    unique = np.unique(key)
+    deepest = np.zeros(len(unique))
+    np.maximum.at(deepest, np.searchsorted(unique, key), depth)
+    visit_batch, visit_aisle = unique // AISLES, unique % AISLES
+
+    visits = np.bincount(visit_batch, minlength=n_batches)
+    farthest = np.zeros(n_batches, dtype=np.int64)
+    np.maximum.at(farthest, visit_batch, visit_aisle)
+    # 奇数回のときの最後の通路（最も遠い通路）での折り返し
+    last = np.zeros(n_batches)
+    is_last = visit_aisle == farthest[visit_batch]
+    last[visit_batch[is_last]] = deepest[is_last]
+    odd = visits % 2 == 1
+    inside = np.where(odd, (visits - 1) * AISLE_LENGTH + 2 * last, visits * AISLE_LENGTH)
+    return inside + 2 * farthest * AISLE_PITCH
+
+
+def pick_seconds(distance, lines, batches):
+    """歩行・ピッキング・段取りの合計作業時間（秒）"""
+    return distance.sum() / WALK_SPEED + lines * SECONDS_PER_LINE + batches * SECONDS_PER_BATCH
+
+
+def plan_day(day, waves=WAVES):
+    """1日分の注文明細（order, sku, cutoff）からウェーブ・バッチを計画し、現状のバッチと比較"""
+    order, sku = day["order"], day["sku"]
+    aisle, depth = day["slot_aisle"][sku], day["slot_depth"][sku]
+    n_orders = int(order.max()) + 1
+    lines = np.bincount(order, minlength=n_orders)
+    if lines.max() > CART_LINES:
+        raise ValueError(f"カートの明細上限（{CART_LINES}）を超える注文があります")
+    cutoff = day["cutoff"]
+
+    wave = assign_waves(cutoff, lines, waves)
+    signature = minhash(order, aisle, n_orders)
+
+    # 注文の重心（平均の通路・奥行き）と格子索引のセル・空間順
+    mean_aisle = np.bincount(order, aisle, n_orders) / lines
+    mean_depth = np.bincount(order, depth, n_orders) / lines
+    cell = (mean_aisle // CELL_AISLES).astype(np.int64) * 1024 + (mean_depth // CELL_DEPTH).astype(np.int64)
+    spatial_rank = mean_aisle * AISLE_PITCH * 4 + mean_depth
+
+    planned = plan_batches(wave, signature, cell, spatial_rank, lines, cutoff)
+    current = sequential_batches(wave, lines)
+
+    total = len(order)
+    results = {}
+    for name, batch in (("planned", planned), ("current", current)):
+        distance = travel_distance(batch[order], aisle, depth)
+        results[name] = {
+            "batches": len(distance),
+            "distance": float(distance.sum()),
+            "seconds": float(pick_seconds(distance, total, len(distance))),
+        }
+
+    wave_lines = np.bincount(wave, lines, waves)
+    on_time = wave_end(wave, waves) <= cutoff
+    return {
+        "orders": n_orders,
+        "lines": total,
+        "wave": wave,
+        "batch": planned,
+        "planned": results["planned"],
+        "current": results["current"],
+        "wave_balance": float(wave_lines.max() / wave_lines.mean()),
+        "on_time": float(on_time.mean()),
+    }
+
+
+def summarize(result):
+    """歩行距離の削減率と生産性（明細/時間）の向上率"""
+    planned, current = result["planned"], result["current"]
+    return {
+        "distance_reduction": 1 - planned["distance"] / current["distance"],
+        "productivity_uplift": current["seconds"] / planned["seconds"] - 1,
+        "lines_per_hour": result["lines"] / planned["seconds"] * 3600,
+        "wave_balance": result["wave_balance"],
+        "on_time": result["on_time"],
+    }
+
+
+def format_uplift(summary, claim=None):
+    """テーマ5の根拠表示（歩行距離・生産性）。claim=(下限, 上限) を渡すと想定の向上率と突き合わせる"""
+    distance = f"ウェーブ・バッチ計画で歩行距離{summary['distance_reduction'] * 100:.0f}%減"
+    if claim is None:
+        return f"{distance}（ピッキング生産性+{summary['productivity_uplift'] * 100:.0f}%、試算）"
+    return f"{distance}、ピッキング生産性の試算{format_claim_check(summary, claim)}"
+
+
+def format_claim_check(summary, claim):
+    """試算の生産性向上率と想定 claim=(下限, 上限) の比較（例：「+40%は想定20-30%を上回る」）"""
+    uplift = round(summary["productivity_uplift"] * 100)
+    lo, hi = (round(c * 100) for c in claim)
+    if uplift > hi:
+        verdict = "を上回る"
+    elif uplift < lo:
+        verdict = "を下回る"
+    else:
+        verdict = "の範囲内"
+    return f"+{uplift}%は想定{lo}-{hi}%{verdict}"
+
+
+def sample_day(lines=500_000, skus=SKU_COUNT, seed=0):
+    """合成データの1日分（SKUのロケーション、注文明細、注文ごとの締め時刻）
+
+    SKUはカテゴリごとに隣接する通路へ配置し、店舗の注文は一部のカテゴリに偏る。
+    """
+    rng = np.random.default_rng(seed)
+    category = np.sort(rng.integers(0, CATEGORIES, skus))
+    per_category = AISLES // CATEGORIES
+    slot_aisle = category * per_category + rng.integers(0, per_category, skus)
+    slot_depth = rng.uniform(0, AISLE_LENGTH, skus)
+
+    n_orders = lines // LINES_PER_ORDER
+    size = np.minimum(rng.geometric(1 / LINES_PER_ORDER, n_orders), CART_LINES)
+    size = np.maximum(np.round(size * lines / size.sum()).astype(np.int64), 1)
+    order = np.repeat(np.arange(n_orders), size)
+
+    # 注文ごとに1-ORDER_CATEGORIESのカテゴリを選び、明細のカテゴリはその中から選ぶ
+    mix = rng.integers(0, CATEGORIES, (n_orders, ORDER_CATEGORIES))
+    width = rng.integers(1, ORDER_CATEGORIES + 1, n_orders)
+    pick = mix[order, rng.integers(0, width[order])]
+    starts = np.searchsorted(category, np.arange(CATEGORIES + 1))
+    span = starts[pick + 1] - starts[pick]
+    # カテゴリ内の人気の偏り（べき分布）
+    rank = np.floor(span * rng.uniform(0, 1, len(order)) ** 2).astype(np.int64)
+    sku = starts[pick] + rank
+
+    cutoff = rng.choice(CUTOFFS, n_orders, p=CUTOFF_SHARE)
+    return {
+        "order": order,
+        "sku": sku,
+        "cutoff": cutoff,
+        "slot_aisle": slot_aisle,
+        "slot_depth": slot_depth,
+    }
+
+
+def estimate(lines=500_000, seed=0):
+    """合成データの1日分で生産性の向上率を推計（バッチの効果は1日の注文数に依存するため縮小しない）"""
+    return summarize(plan_day(sample_day(lines, seed=seed)))
+
+
+def benchmark(lines=500_000):
+    """1日50万明細の計画所要時間と現状比の効果"""
+    day = sample_day(lines)
+    start = time.perf_counter()
+    result = plan_day(day)
+    elapsed = time.perf_counter() - start
+    return {"lines": result["lines"], "orders": result["orders"], "seconds": elapsed,
+            "result": result, "summary": summarize(result)}
+
+
+if __name__ == "__main__":
+    r = benchmark()
+    s, p, c = r["summary"], r["result"]["planned"], r["result"]["current"]
+    print(f"明細 {r['lines']:,}  注文 {r['orders']:,}  所要時間 {r['seconds']:.1f}秒")
+    print(f"バッチ数 現状 {c['batches']:,} → 計画 {p['batches']:,}（類似注文の同梱による増、段取り時間は生産性に含む）  "
+          f"歩行距離 {c['distance'] / 1000:,.0f}km → {p['distance'] / 1000:,.0f}km")
+    print(f"ウェーブ負荷 最大/平均 {s['wave_balance']:.2f}  締め時刻遵守 {s['on_time'] * 100:.1f}%  "
+          f"生産性 {s['lines_per_hour']:.0f}明細/時間")
+    print(format_uplift(s))
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+運転資金・キャッシュコンバージョンサイクル（CCC）シミュレーション
+売上債権・仕入債務・在庫の元帳から日次残高を求めて DIO・DSO・DPO と CCC を算出し、
+在庫日数・回収日数・支払日数と利益率の改善シナリオについて3年間の貸借対照表
+（現金・売上債権・棚卸資産・仕入債務）と流動比率を予測する。
+前提は配列で与え、シナリオの組み合わせ（グリッド）を一括で評価する
+"""
+
+import time
+
+import numpy as np
+
+from cash_timeline import SCENARIOS, annual_totals, simulate
+from profit_bridge import GROSS_MARGIN, ORDINARY_MARGIN
+
+DAYS = 365
+YEARS = 3
+
+# 直近期（令和7年度）の決算値（百万円）
+# 売上債権・仕入債務は流動資産・流動負債の内訳が未入手のため仮定した値
+STATEMENT = {
+    "sales": 480_599,
+    "gross_margin": GROSS_MARGIN["start"] / 100,
+    "ordinary_margin": ORDINARY_MARGIN["start"] / 100,
+    "cash": 2_767,
+    "inventory": 14_000,
+    "receivables": 58_000,
+    "payables": 66_000,
+    "current_assets": 86_368,
+    "current_liabilities": 94_847,
+}
+
+# 売上債権・仕入債務が仮定値のため、決算値から求めると仮定に依存する日数
+ASSUMED_DAYS = ("dso", "dpo", "ccc")
+
+# 元帳から日数を求める期間（直近期）
+LEDGER_PERIOD = ("2025-04-01", "2026-03-31")
+
+# 法人税等の実効税率・配当性向
+TAX_RATE = 0.30
+PAYOUT_RATIO = 0.30
+
+# シナリオ別の前提：(保守, 楽観)、基準は中間値
+# 在庫削減額（百万円）は現状の売上原価での在庫日数の短縮に換算する
+ASSUMPTIONS = {
+    "sales_growth": (0.03, 0.03),
+    "inventory_reduction": (1_000, 2_000),
+    "dso_reduction": (0.5, 2.0),
+    "dpo_change": (0.0, 1.0),
+    "gross_margin": tuple((GROSS_MARGIN["start"] + np.array(GROSS_MARGIN["headline"])) / 100),
+    "ordinary_margin": tuple((ORDINARY_MARGIN["start"] + np.array(ORDINARY_MARGIN["headline"])) / 100),
+}
+
+
+# ---------------------------------------------------------------------------
+# 元帳からの日数計算
+# ---------------------------------------------------------------------------
+
+def daily_balance(issued, settled, amounts, start, end):
+    """債権・債務元帳の日次残高（start〜end の各日末、未決済は settled を NaT）
+
+    start より前に計上され期間内に残っている明細は期首残高として扱う。
+    """
+    start, end = np.datetime64(start, "D"), np.datetime64(end, "D")
+    days = int((end - start).astype(int)) + 1
+    amounts = np.asarray(amounts, dtype=float)
+    issued = np.asarray(issued, dtype="datetime64[D]")
+    settled = np.asarray(settled, dtype="datetime64[D]")
+    open_ = ~(settled <= start - 1)  # NaT との比較は False
+    delta = np.zeros(days + 1)
+    first = np.clip((issued - start).astype(int), 0, days)
+    np.add.at(delta, first[open_ & (issued <= end)], amounts[open_ & (issued <= end)])
+    closed = open_ & (settled <= end) & (issued <= end)
+    np.add.at(delta, np.clip((settled - start).astype(int), 0, days)[closed], -amounts[closed])
+    return np.cumsum(delta)[:days]
+
+
+def inventory_balance(dates, amounts, opening, start, end):
+    """在庫元帳（受入はプラス、払出はマイナスの原価金額）の日次残高と期間中の払出額"""
+    start = np.datetime64(start, "D")
+    days = int((np.datetime64(end, "D") - start).astype(int)) + 1
+    offset = (np.asarray(dates, dtype="datetime64[D]") - start).astype(int)
+    amounts = np.asarray(amounts, dtype=float)
+    inside = (offset >= 0) & (offset < days)
+    movement = np.bincount(offset[inside], weights=amounts[inside], minlength=days)
+    issues = -amounts[inside & (amounts < 0)].sum()
+    return opening + np.cumsum(movement), issues
+
+
+def ledger_days(receivables, payables, inventory, start, end):
+    """元帳から DIO・DSO・DPO・CCC（日）を算出
+
+    receivables・payables は {"issued", "settled", "amount"}、inventory は
+    {"date", "amount", "opening"} の列。各日数は期間の平均残高 ÷ 1日あたりの
+    売上（債権計上額）・売上原価（在庫払出額）・仕入（債務計上額）。
+    """
+    days = int((np.datetime64(end, "D") - np.datetime64(start, "D")).astype(int)) + 1
+
+    def per_day(ledger):
+        issued = np.asarray(ledger["issued"], dtype="datetime64[D]")
+        inside = (issued >= np.datetime64(start, "D")) & (issued <= np.datetime64(end, "D"))
+        return np.asarray(ledger["amount"], dtype=float)[inside].sum() / days
+
+    ar = daily_balance(receivables["issued"], receivables["settled"], receivables["amount"], start, end)
+    ap = daily_balance(payables["issued"], payables["settled"], payables["amount"], start, end)
+    stock, issues = inventory_balance(inventory["date"], inventory["amount"], inventory["opening"], start, end)
+
+    dio = stock.mean() / (issues / days)
+    dso = ar.mean() / per_day(receivables)
+    dpo = ap.mean() / per_day(payables)
+    return {"dio": dio, "dso": dso, "dpo": dpo, "ccc": dio + dso - dpo}
+
+
+def statement_days(statement=STATEMENT):
+    """決算値（期末残高）からの DIO・DSO・DPO・CCC（日）"""
+    cogs = statement["sales"] * (1 - statement["gross_margin"])
+    dio = statement["inventory"] / cogs * DAYS
+    dso = statement["receivables"] / statement["sales"] * DAYS
+    dpo = statement["payables"] / cogs * DAYS
+    return {"dio": dio, "dso": dso, "dpo": dpo, "ccc": dio + dso - dpo}
+
+
+# ---------------------------------------------------------------------------
+# 貸借対照表の予測
+# ---------------------------------------------------------------------------
+
+def project(params, capex=0.0, statement=STATEMENT, days=None, years=YEARS):
+    """前提（各値は同じ形にブロードキャストできる配列）から年次の貸借対照表を予測
+
+    利益率・日数の改善は years 年で直線的に立ち上がるものとし、現金は税引後利益の内部留保と
+    運転資金の増減・投資（capex：…×年 の配列、百万円）で増減する。流動資産・流動負債の
+    その他の項目は一定とする。戻り値の各配列は 前提の形×(years+1)（0年目が現状）。
+    days を省略すると決算値から日数を求める（元帳から求めた日数を渡してもよい）。
+    """
+    days = days or statement_days(statement)
+    p = {key: np.asarray(params[key], dtype=float)[..., None] for key in ASSUMPTIONS}
+    t = np.arange(years + 1, dtype=float)
+    ramp = t / years
+
+    sales0 = statement["sales"]
+    cogs0 = sales0 * (1 - statement["gross_margin"])
+    sales = sales0 * (1 + p["sales_growth"]) ** t
+    gross = statement["gross_margin"] + (p["gross_margin"] - statement["gross_margin"]) * ramp
+    ordinary = statement["ordinary_margin"] + (p["ordinary_margin"] - statement["ordinary_margin"]) * ramp
+    cogs = sales * (1 - gross)
+
+    dio = days["dio"] - p["inventory_reduction"] / cogs0 * DAYS * ramp
+    dso = days["dso"] - p["dso_reduction"] * ramp
+    dpo = days["dpo"] + p["dpo_change"] * ramp
+    inventory = cogs * dio / DAYS
+    receivables = sales * dso / DAYS
+    payables = cogs * dpo / DAYS
+
+    # 0年目は決算値そのもの（日数の算出元と一致させる）
+    inventory[..., 0] = statement["inventory"]
+    receivables[..., 0] = statement["receivables"]
+    payables[..., 0] = statement["payables"]
+
+    retained = sales * ordinary * (1 - TAX_RATE) * (1 - PAYOUT_RATIO)
+    working = inventory + receivables - payables
+    capex = np.broadcast_to(np.asarray(capex, dtype=float), retained.shape[:-1] + (years,))
+    flow = retained[..., 1:] - np.diff(working, axis=-1) - capex
+    cash = statement["cash"] + np.concatenate([np.zeros(flow.shape[:-1] + (1,)), np.cumsum(flow, axis=-1)], -1)
+
+    other_assets = statement["current_assets"] - statement["cash"] - statement["inventory"] - statement["receivables"]
+    other_liabilities = statement["current_liabilities"] - statement["payables"]
+    current_assets = cash + receivables + inventory + other_assets
+    current_liabilities = payables + other_liabilities
+    return {
+        "sales": sales,
+        "cash": cash,
+        "inventory": inventory,
+        "receivables": receivables,
+        "payables": payables,
+        "dio": dio,
+        "dso": dso,
+        "dpo": dpo,
+        "ccc": dio + dso - dpo,
+        "current_assets": current_assets,
+        "current_liabilities": current_liabilities,
+        "current_ratio": current_assets / current_liabilities,
+    }
+
+
+def scenario_params():
+    """保守・基準・楽観の前提（各値は長さ3の配列、SCENARIOS の順）"""
+    return {key: np.array([low, (low + high) / 2, high]) for key, (low, high) in ASSUMPTIONS.items()}
+
+
+def scenario_capex():
+    """段階投資計画（cash_timeline の標準案）のシナリオ別・年次の投資額（百万円、シナリオ×年）"""
+    return annual_totals(simulate()["capex"][0])[:, :YEARS]
+
+
+def grid(axes):
+    """前提ごとの候補値 {名前: 値のリスト} の全組み合わせを、同じ長さの配列の辞書に展開
+
+    axes にない前提は基準シナリオの値で埋める。
+    """
+    base = {key: (low + high) / 2 for key, (low, high) in ASSUMPTIONS.items()}
+    names = list(axes)
+    mesh = np.meshgrid(*[np.asarray(axes[name], dtype=float) for name in names], indexing="ij")
+    params = {name: m.ravel() for name, m in zip(names, mesh)}
+    size = mesh[0].size if mesh else 1
+    for key, value in base.items():
+        params.setdefault(key, np.full(size, value))
+    return params
+
+
+def liquidity_summary(statement=STATEMENT, days=None, ledgers=None, period=LEDGER_PERIOD):
+    """現状と3年後（保守〜楽観）の流動比率・CCC・在庫日数などの集計
+
+    ledgers（売上債権・仕入債務・在庫の元帳、ledger_days の引数）を渡すと現状の日数を period の
+    元帳から求める。assumed は仮定値に依存する日数の名前（元帳・日数を渡した場合は空）。
+    """
+    if ledgers is not None:
+        days = ledger_days(*ledgers, *period)
+    current = statement_days(statement) if days is None else days
+    result = project(scenario_params(), scenario_capex(), statement, current)
+    conservative, optimistic = SCENARIOS.index("conservative"), SCENARIOS.index("optimistic")
+    end = result["current_ratio"][:, -1]
+    return {
+        "current_ratio": statement["current_assets"] / statement["current_liabilities"],
+        "target_ratio": (end[conservative], end[optimistic]),
+        "ccc": current["ccc"],
+        "target_ccc": (result["ccc"][optimistic, -1], result["ccc"][conservative, -1]),
+        "days": current,
+        "assumed": ASSUMED_DAYS if days is None else (),
+        "projection": result,
+    }
+
+
+def current_ratio_path(summary, months, scenario="base"):
+    """指定シナリオの流動比率（%）を任意の経過月に補間（年次の予測を直線でつなぐ）"""
+    ratio = summary["projection"]["current_ratio"][SCENARIOS.index(scenario)]
+    years = np.arange(len(ratio)) * 12
+    return [round(float(v) * 100) for v in np.interp(months, years, ratio)]
+
+
+def format_ratio(value, decimals=2):
+    """比率を百分率の文字列に整形"""
+    return f"{value * 100:.{decimals}f}%"
+
+
+def format_ratio_range(low, high):
+    """比率のレンジを「120-130%」の形式に整形（整数に丸める）"""
+    low, high = round(low * 100), round(high * 100)
+    return f"{low}%" if low == high else f"{low}-{high}%"
+
+
+def format_point_change(start, low, high, unit="pt"):
+    """比率の変化幅を「+29-39pt」の形式に整形"""
+    lo, hi = round((low - start) * 100), round((high - start) * 100)
+    return f"{lo:+d}{unit}" if lo == hi else f"{lo:+d}-{hi}{unit}"
+
+
+def format_days_change(start, low, high):
+    """日数の変化幅を「-4.6〜-1.3日」の形式に整形"""
+    lo, hi = low - start, high - start
+    return f"{lo:+.1f}日" if round(lo, 1) == round(hi, 1) else f"{lo:+.1f}〜{hi:+.1f}日"
+
+
+def format_days(low, high=None):
+    """日数（またはそのレンジ）を「1.4日」「-3.2〜0.1日」の形式に整形"""
+    if high is None or round(low, 1) == round(high, 1):
+        return f"{low:.1f}日"
+    return f"{low:.1f}〜{high:.1f}日"
+
+
+# ---------------------------------------------------------------------------
+# 合成元帳・ベンチマーク
+# ---------------------------------------------------------------------------
+
+def sample_ledgers(statement=STATEMENT, start=LEDGER_PERIOD[0], end=LEDGER_PERIOD[1], invoices=200_000, seed=0):
+    """決算値の日数に合うように作った合成の売上債権・仕入債務・在庫元帳"""
+    rng = np.random.default_rng(seed)
+    target = statement_days(statement)
+    start, end = np.datetime64(start, "D"), np.datetime64(end, "D")
+    days = int((end - start).astype(int)) + 1
+    cogs = statement["sales"] * (1 - statement["gross_margin"])
+
+    def ledger(total, mean_days):
+        # 期首前から計上しておき、期首時点でも残高がある状態にする
+        lead = int(mean_days * 3)
+        issued = start - lead + rng.integers(0, days + lead, invoices)
+        amount = rng.lognormal(0, 1, invoices)
+        amount *= total * (days + lead) / days / amount.sum()
+        settled = issued + rng.gamma(4, mean_days / 4, invoices).round().astype(int)
+        settled = np.where(settled > end, np.datetime64("NaT"), settled)
+        return {"issued": issued, "settled": settled, "amount": amount}
+
+    # 在庫：毎日の払出は売上原価の日割り、受入は在庫日数ぶん先行して補充
+    dates = np.repeat(np.arange(start, end + 1), 2)
+    daily = cogs / DAYS * rng.uniform(0.7, 1.3, days)
+    amounts = np.column_stack([daily, -daily]).ravel()
+    return (
+        ledger(statement["sales"], target["dso"]),
+        ledger(cogs, target["dpo"]),
+        {"date": dates, "amount": amounts, "opening": statement["inventory"]},
+    )
+
+
+def benchmark(points=12):
+    """元帳からの日数算出と、前提グリッド（各前提 points 段階の全組み合わせ）の一括予測"""
+    receivables, payables, inventory = sample_ledgers()
+    start = time.perf_counter()
+    days = ledger_days(receivables, payables, inventory, *LEDGER_PERIOD)
+    ledger_time = time.perf_counter() - start
+
+    axes = {key: np.linspace(low, high, points) for key, (low, high) in ASSUMPTIONS.items() if low != high}
+    params = grid(axes)
+    capex = scenario_capex()[SCENARIOS.index("base")]
+    start = time.perf_counter()
+    result = project(params, capex)
+    grid_time = time.perf_counter() - start
+
+    # 1シナリオずつ評価した場合との一致と所要時間（先頭 sample 件）
+    sample = min(2000, len(params["sales_growth"]))
+    start = time.perf_counter()
+    loop = [project({k: v[i] for k, v in params.items()}, capex)["current_ratio"] for i in range(sample)]
+    loop_time = (time.perf_counter() - start) * len(params["sales_growth"]) / sample
+
+    ratio = result["current_ratio"][:, -1]
+    return {
+        "ledger_days": days,
+        "statement_days": statement_days(),
+        "ledger_seconds": ledger_time,
+        "scenarios": len(ratio),
+        "grid_seconds": grid_time,
+        "loop_seconds": loop_time,
+        "equivalent": bool(np.allclose(np.array(loop), result["current_ratio"][:sample])),
+        "ratio_range": (ratio.min(), ratio.max()),
+        "summary": liquidity_summary(),
+    }
+
+
+if __name__ == "__main__":
+    r = benchmark()
+    s = r["summary"]
+    print("日数（元帳 / 決算値）")
+    for key in ("dio", "dso", "dpo", "ccc"):
+        print(f"  {key.upper():<4} {r['ledger_days'][key]:6.1f} / {r['statement_days'][key]:6.1f}")
+    print(f"元帳の集計 {r['ledger_seconds'] * 1000:.0f} ms")
+    print(f"グリッド {r['scenarios']:,}通り  一括 {r['grid_seconds']:.2f}秒  "
+          f"1件ずつ（推計）{r['loop_seconds']:.1f}秒  一致: {r['equivalent']}")
+    print(f"3年後の流動比率（グリッド全体）{format_ratio(r['ratio_range'][0], 1)}〜{format_ratio(r['ratio_range'][1], 1)}")
+    print(f"流動比率 {format_ratio(s['current_ratio'])} → {format_ratio_range(*s['target_ratio'])}"
+          f"（{format_point_change(s['current_ratio'], *s['target_ratio'])}）")
+    print(f"CCC {format_days(s['ccc'])} → {format_days(*s['target_ccc'])}")
+    for name, row in zip(SCENARIOS, s["projection"]["current_ratio"]):
+        print(f"  {name:<12} " + "  ".join(format_ratio(v, 1) for v in row))